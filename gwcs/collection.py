@@ -0,0 +1,709 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+Collections of WCS objects, e.g. for the detectors of an instrument.
+"""
+
+import copy
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from astropy import coordinates as coord
+from astropy import units as u
+from astropy.modeling import CompoundModel
+from astropy.modeling.models import (
+    EulerAngleRotation,
+    Multiply,
+    Polynomial1D,
+    Polynomial2D,
+    RotateNative2Celestial,
+    Rotation2D,
+    Scale,
+    Shift,
+)
+
+from .utils import _compute_lon_pole, _model_state
+from .wcs import _SKY_ROTATIONS, _sky_rotation_matrix
+from .wcstools import _unit_vectors, _vector_to_lonlat, wcs_from_fiducial
+
+__all__ = ["StackedWCS", "WCSCollection"]
+
+# Models which evaluate with arrays of parameters, one value per point.
+_BROADCAST_MODELS = (Multiply, Polynomial1D, Polynomial2D, Scale, Shift)
+
+
+class WCSCollection:
+    """
+    A collection of WCS objects, evaluated on points routed by a detector ID.
+
+    The points of all detectors are grouped by detector in one pass, each
+    WCS is evaluated once on the contiguous block of its points, and the
+    results are scattered back to the order of the points.
+
+    Parameters
+    ----------
+    wcs_objects : dict or sequence of `~gwcs.wcs.WCS`
+        The WCS of each detector, by detector ID. The IDs of a sequence are
+        the positions in the sequence. All WCS objects must have the same
+        numbers of pixel and world axes.
+    max_workers : int, optional
+        If given, the WCS objects are evaluated in parallel, in a thread pool
+        of at most this many threads.
+    """
+
+    def __init__(self, wcs_objects, max_workers=None):
+        if not isinstance(wcs_objects, Mapping):
+            wcs_objects = dict(enumerate(wcs_objects))
+        if not wcs_objects:
+            msg = "A WCSCollection needs at least one WCS."
+            raise ValueError(msg)
+        self._ids = np.array(sorted(wcs_objects))
+        self._wcs = [wcs_objects[det_id] for det_id in self._ids.tolist()]
+        n_axes = {
+            (w.forward_transform.n_inputs, w.forward_transform.n_outputs)
+            for w in self._wcs
+        }
+        if len(n_axes) > 1:
+            msg = "All WCS objects must have the same numbers of pixel and world axes."
+            raise ValueError(msg)
+        self.pixel_n_dim, self.world_n_dim = n_axes.pop()
+        self.max_workers = max_workers
+
+    def __len__(self):
+        return len(self._wcs)
+
+    def __iter__(self):
+        return iter(self._ids.tolist())
+
+    def __getitem__(self, det_id):
+        index = self._index(np.atleast_1d(det_id))[0]
+        return self._wcs[index]
+
+    @property
+    def detector_ids(self):
+        """
+        The detector IDs, sorted.
+        """
+        return self._ids.tolist()
+
+    def _index(self, det_ids):
+        """
+        Return the positions of detector IDs in the collection.
+        """
+        index = np.searchsorted(self._ids, det_ids)
+        valid = index < len(self._ids)
+        valid[valid] = self._ids[index[valid]] == det_ids[valid]
+        if not valid.all():
+            msg = f"Unknown detector IDs: {np.unique(det_ids[~valid]).tolist()}."
+            raise KeyError(msg)
+        return index
+
+    def pixel_to_world(
+        self, det_id, *pixel_arrays, with_bounding_box=True, fill_value=np.nan
+    ):
+        """
+        Transform pixel coordinates of several detectors to world coordinates.
+
+        Each point is transformed with the WCS of its detector, as with
+        `~gwcs.wcs.WCS.__call__`.
+
+        Parameters
+        ----------
+        det_id : int, str or array-like
+            The detector ID of each point.
+        pixel_arrays : float or array-like
+            The pixel coordinates, one argument per pixel axis. They are
+            broadcast with ``det_id``.
+        with_bounding_box : bool, optional
+             If True (default) values in the result which correspond to
+             any of the inputs being outside the bounding_box of the WCS
+             are set to ``fill_value``.
+        fill_value : float, optional
+            Output value for inputs outside the bounding_box
+            (default is np.nan).
+
+        Returns
+        -------
+        result : ndarray or tuple of ndarray
+            The world coordinates, one array per world axis.
+        """
+        return self._evaluate(
+            "__call__",
+            det_id,
+            pixel_arrays,
+            self.pixel_n_dim,
+            self.world_n_dim,
+            with_bounding_box=with_bounding_box,
+            fill_value=fill_value,
+        )
+
+    def world_to_pixel(
+        self, det_id, *world_arrays, with_bounding_box=True, fill_value=np.nan
+    ):
+        """
+        Transform world coordinates to pixel coordinates of several detectors.
+
+        Each point is transformed with the WCS of its detector, as with
+        `~gwcs.wcs.WCS.invert`.
+
+        Parameters
+        ----------
+        det_id : int, str or array-like
+            The detector ID of each point.
+        world_arrays : float or array-like
+            The world coordinates, one argument per world axis. They are
+            broadcast with ``det_id``.
+        with_bounding_box : bool, optional
+             If True (default) values in the result which correspond to
+             any of the inputs being outside the bounding_box of the WCS
+             are set to ``fill_value``.
+        fill_value : float, optional
+            Output value for inputs outside the bounding_box
+            (default is np.nan).
+
+        Returns
+        -------
+        result : ndarray or tuple of ndarray
+            The pixel coordinates, one array per pixel axis.
+        """
+        return self._evaluate(
+            "invert",
+            det_id,
+            world_arrays,
+            self.world_n_dim,
+            self.pixel_n_dim,
+            with_bounding_box=with_bounding_box,
+            fill_value=fill_value,
+        )
+
+    def _evaluate(self, method, det_id, arrays, n_inputs, n_outputs, **kwargs):
+        if len(arrays) != n_inputs:
+            msg = f"Expected {n_inputs} coordinate arrays, got {len(arrays)}."
+            raise ValueError(msg)
+        det_id, *arrays = np.broadcast_arrays(det_id, *arrays, subok=True)
+        shape = det_id.shape
+        index = self._index(det_id.ravel())
+
+        # group the points by detector
+        order = np.argsort(index, kind="stable")
+        bounds = np.cumsum(np.bincount(index, minlength=len(self._wcs)))
+        arrays = [np.ravel(array)[order] for array in arrays]
+        groups = [
+            (self._wcs[k], slice(start, stop))
+            for k, (start, stop) in enumerate(
+                zip(np.r_[0, bounds[:-1]], bounds, strict=True)
+            )
+            if stop > start
+        ]
+
+        def _group(group):
+            wcs, slc = group
+            result = getattr(wcs, method)(*(array[slc] for array in arrays), **kwargs)
+            return result if n_outputs > 1 else (result,)
+
+        if self.max_workers is None or len(groups) < 2:
+            results = [_group(group) for group in groups]
+        else:
+            with ThreadPoolExecutor(self.max_workers) as executor:
+                results = list(executor.map(_group, groups))
+
+        outputs = []
+        for axis in range(n_outputs):
+            output = np.empty(len(order))
+            unit = None
+            for (_, slc), result in zip(groups, results, strict=True):
+                value = result[axis]
+                if isinstance(value, u.Quantity):
+                    unit = unit or value.unit
+                    value = value.to_value(unit)
+                output[order[slc]] = value
+            output = output.reshape(shape)
+            outputs.append(output if unit is None else output << unit)
+        return outputs[0] if n_outputs == 1 else tuple(outputs)
+
+
+class StackedWCS:
+    """
+    Structurally identical WCS objects, evaluated in vectorized calls.
+
+    The WCS objects, e.g. of many exposures of one detector, must have
+    forward transforms made of the same models, which only differ in their
+    parameter values. The parameters of all WCS objects are stacked in one
+    array and each point is transformed with the parameters of its exposure:
+
+    - submodels with the same parameters in all exposures are evaluated once,
+      on all points,
+    - shifts, scales, polynomials and rotations are evaluated once, with
+      per-point parameters,
+    - other submodels are evaluated once per exposure.
+
+    Models are compared by their type and parameters. Models which differ
+    in other attributes, such as the domains of polynomials, can not be
+    stacked, and models which are defined by other attributes, such as
+    lookup tables, must be the same in all exposures.
+
+    Parameters
+    ----------
+    wcs_objects : sequence of `~gwcs.wcs.WCS`
+        The WCS of each exposure. Exposures are identified by their position
+        in the sequence.
+    """
+
+    def __init__(self, wcs_objects):
+        wcs_objects = tuple(wcs_objects)
+        if not wcs_objects:
+            msg = "A StackedWCS needs at least one WCS."
+            raise ValueError(msg)
+        transforms = [w.forward_transform for w in wcs_objects]
+        structure = _structure(transforms[0])
+        if any(_structure(transform) != structure for transform in transforms[1:]):
+            msg = (
+                "All WCS objects must have forward transforms made of the same models."
+            )
+            raise ValueError(msg)
+        self._setup(
+            wcs_objects[0],
+            np.array([transform.parameters for transform in transforms]),
+            np.array([_bounds(w) for w in wcs_objects]),
+        )
+        self._wcs_objects = wcs_objects
+
+        # user-supplied inverses are not stacked, WCS objects which differ in
+        # them are inverted one exposure at a time
+        inverses = [_user_inverse_parameters(t) for t in transforms]
+        if any(not np.array_equal(values, inverses[0]) for values in inverses[1:]):
+            self._collection = WCSCollection(wcs_objects)
+
+    def _setup(self, wcs, parameters, bounds):
+        self._wcs = wcs
+        self._transform = wcs.forward_transform
+        self._parameters = parameters
+        self._bounds = bounds
+        self._cache = {}
+        self._wcs_objects = None
+        self._collection = None
+        self.pixel_n_dim = self._transform.n_inputs
+        self.world_n_dim = self._transform.n_outputs
+
+    @classmethod
+    def from_fiducials(
+        cls,
+        fiducials,
+        projection,
+        transform=None,
+        bounding_box=None,
+        input_frame=None,
+    ):
+        """
+        Create the stacked WCS of many pointings on the sky.
+
+        The WCS of each exposure is the one created by
+        `~gwcs.wcstools.wcs_from_fiducial` with its fiducial, but the WCS
+        objects are not created.
+
+        Parameters
+        ----------
+        fiducials : `~astropy.coordinates.SkyCoord`
+            The fiducial of each exposure.
+        projection : `~astropy.modeling.projections.Projection`
+            The projection, common to all exposures.
+        transform : `~astropy.modeling.Model`, optional
+            A transform, common to all exposures, prepended to the
+            projection.
+        bounding_box : tuple, optional
+            The bounding box, common to all exposures, as in
+            `~gwcs.wcstools.wcs_from_fiducial`.
+        input_frame : `~gwcs.coordinate_frames.CoordinateFrame`, optional
+            The input coordinate frame.
+
+        Returns
+        -------
+        stacked : `StackedWCS`
+            The stacked WCS, with one exposure per fiducial.
+        """
+        if not isinstance(fiducials, coord.SkyCoord):
+            msg = "Expected the fiducials to be a SkyCoord."
+            raise TypeError(msg)
+        fiducials = fiducials.reshape(-1)
+        if not len(fiducials):
+            msg = "A StackedWCS needs at least one WCS."
+            raise ValueError(msg)
+        wcs = wcs_from_fiducial(
+            fiducials[0],
+            projection=projection,
+            transform=transform,
+            bounding_box=bounding_box,
+            input_frame=input_frame,
+        )
+        forward_transform = wcs.forward_transform
+        rotation = (
+            forward_transform[-1]
+            if isinstance(forward_transform, CompoundModel)
+            else forward_transform
+        )
+        if not isinstance(rotation, RotateNative2Celestial):
+            msg = "Expected the forward transform to end with a sky rotation."
+            raise TypeError(msg)
+        # the parameters of the last model come last
+        index = len(forward_transform.parameters) - len(rotation.parameters)
+        lon, lat, lon_pole = (
+            index + rotation.param_names.index(name)
+            for name in ("lon", "lat", "lon_pole")
+        )
+        parameters = np.tile(forward_transform.parameters, (len(fiducials), 1))
+        parameters[:, lon] = fiducials.spherical.lon.to_value(u.deg)
+        parameters[:, lat] = fiducials.spherical.lat.to_value(u.deg)
+        parameters[:, lon_pole] = [
+            u.Quantity(_compute_lon_pole(fiducial, projection), u.deg).value
+            for fiducial in fiducials
+        ]
+        stacked = cls.__new__(cls)
+        stacked._setup(
+            wcs, parameters, np.array([_bounds(wcs)] * len(fiducials), dtype=float)
+        )
+        return stacked
+
+    def __len__(self):
+        return len(self._parameters)
+
+    def __getitem__(self, exposure):
+        """
+        Return the WCS of an exposure.
+        """
+        index = self._index(exposure)
+        if np.ndim(index):
+            msg = "Expected a single exposure index."
+            raise TypeError(msg)
+        if self._wcs_objects is not None:
+            return self._wcs_objects[index]
+        wcs = copy.deepcopy(self._wcs)
+        wcs.forward_transform.parameters = self._parameters[index]
+        return wcs
+
+    def _index(self, exposure):
+        """
+        Return exposure indices as an integer array, checking their range.
+        """
+        index = np.asarray(exposure)
+        if index.dtype.kind not in "iu":
+            msg = "Exposure indices must be integers."
+            raise TypeError(msg)
+        if np.any((index < 0) | (index >= len(self))):
+            msg = f"Exposure indices must be in the range [0, {len(self)})."
+            raise IndexError(msg)
+        return index
+
+    def pixel_to_world(
+        self, exposure, *pixel_arrays, with_bounding_box=True, fill_value=np.nan
+    ):
+        """
+        Transform pixel coordinates of many exposures to world coordinates.
+
+        Each point is transformed with the WCS of its exposure, as with
+        `~gwcs.wcs.WCS.__call__`.
+
+        Parameters
+        ----------
+        exposure : int or array-like
+            The exposure index of each point.
+        pixel_arrays : float or array-like
+            The pixel coordinates, one argument per pixel axis. They are
+            broadcast with ``exposure``.
+        with_bounding_box : bool, optional
+             If True (default) values in the result which correspond to
+             any of the inputs being outside the bounding_box of the WCS
+             are set to ``fill_value``.
+        fill_value : float, optional
+            Output value for inputs outside the bounding_box
+            (default is np.nan).
+
+        Returns
+        -------
+        result : ndarray or tuple of ndarray
+            The world coordinates, one array per world axis.
+        """
+        return self._evaluate(
+            exposure,
+            pixel_arrays,
+            inverse=False,
+            with_bounding_box=with_bounding_box,
+            fill_value=fill_value,
+        )
+
+    def world_to_pixel(
+        self, exposure, *world_arrays, with_bounding_box=True, fill_value=np.nan
+    ):
+        """
+        Transform world coordinates to pixel coordinates of many exposures.
+
+        Each point is transformed with the inverse transform of its exposure,
+        as with `~gwcs.wcs.WCS.invert`. The forward transform must have an
+        analytical or user-supplied inverse.
+
+        Parameters
+        ----------
+        exposure : int or array-like
+            The exposure index of each point.
+        world_arrays : float or array-like
+            The world coordinates, one argument per world axis. They are
+            broadcast with ``exposure``.
+        with_bounding_box : bool, optional
+             If True (default) values in the result which are outside the
+             bounding_box of the WCS are set to ``fill_value``.
+        fill_value : float, optional
+            Output value for results outside the bounding_box
+            (default is np.nan).
+
+        Returns
+        -------
+        result : ndarray or tuple of ndarray
+            The pixel coordinates, one array per pixel axis.
+        """
+        if self._collection is not None:
+            return self._collection.world_to_pixel(
+                exposure,
+                *world_arrays,
+                with_bounding_box=with_bounding_box,
+                fill_value=fill_value,
+            )
+        return self._evaluate(
+            exposure,
+            world_arrays,
+            inverse=True,
+            with_bounding_box=with_bounding_box,
+            fill_value=fill_value,
+        )
+
+    def _evaluate(self, exposure, arrays, inverse, with_bounding_box, fill_value):
+        n_inputs, frame = (
+            (self.world_n_dim, self._wcs.output_frame)
+            if inverse
+            else (self.pixel_n_dim, self._wcs.input_frame)
+        )
+        if len(arrays) != n_inputs:
+            msg = f"Expected {n_inputs} coordinate arrays, got {len(arrays)}."
+            raise ValueError(msg)
+        exposure, *arrays = np.broadcast_arrays(exposure, *arrays, subok=True)
+        shape = exposure.shape
+        index = self._index(exposure).ravel()
+        arrays = [np.ravel(array) for array in arrays]
+
+        # the same handling of units as in WCS.__call__ and WCS.invert
+        input_is_quantity = any(isinstance(array, u.Quantity) for array in arrays)
+        if not input_is_quantity and self._transform.uses_quantity:
+            arrays = self._wcs._add_units_input(arrays, frame)
+        if not self._transform.uses_quantity and input_is_quantity:
+            arrays = self._wcs._remove_units_input(arrays, frame)
+
+        results = self._evaluate_model(
+            self._transform, self._parameters, index, list(arrays), inverse
+        )
+        if with_bounding_box:
+            pixel = results if inverse else arrays
+            outside = np.zeros(len(index), dtype=bool)
+            for axis, array in enumerate(pixel):
+                values = getattr(array, "value", array)
+                bounds = self._bounds[index, axis]
+                outside |= (values < bounds[:, 0]) | (values > bounds[:, 1])
+            if outside.any():
+                results = [_fill(result, outside, fill_value) for result in results]
+        results = [np.reshape(result, shape) for result in results]
+        return results[0] if len(results) == 1 else tuple(results)
+
+    def _evaluate_model(self, model, parameters, index, inputs, inverse):
+        """
+        Evaluate a model, or its inverse, with the parameters of each point.
+        """
+        if not np.any(parameters != parameters[:1]):
+            transform = model.inverse if inverse else model
+            return _as_tuple(transform(*inputs, with_bounding_box=False))
+        if (
+            isinstance(model, CompoundModel)
+            and model.op in ("|", "&")
+            and not (inverse and model.has_user_inverse)
+        ):
+            n_left = len(model.left.parameters)
+            left = (model.left, parameters[:, :n_left])
+            right = (model.right, parameters[:, n_left:])
+            if model.op == "|":
+                for operand, operand_parameters in (
+                    (right, left) if inverse else (left, right)
+                ):
+                    inputs = self._evaluate_model(
+                        operand, operand_parameters, index, inputs, inverse
+                    )
+                return inputs
+            n_inputs = model.left.n_outputs if inverse else model.left.n_inputs
+            return self._evaluate_model(
+                *left, index, inputs[:n_inputs], inverse
+            ) + self._evaluate_model(*right, index, inputs[n_inputs:], inverse)
+        if (inverse and model.has_user_inverse) or not _vectorized(model, inputs):
+            return _evaluate_by_group(model, parameters, index, inputs, inverse)
+        if isinstance(model, (*_SKY_ROTATIONS, Rotation2D)):
+            return self._evaluate_rotation(model, parameters, index, inputs, inverse)
+        return self._evaluate_per_point(model, parameters, index, inputs, inverse)
+
+    def _evaluate_per_point(self, model, parameters, index, inputs, inverse):
+        """
+        Evaluate a model, or its inverse, with arrays of parameters.
+        """
+        transform = model.copy()
+        if inverse:
+            # the parameters of the inverse model in each exposure
+            parameters = self._per_exposure(_inverse_parameters, model, parameters)
+            transform = transform.inverse
+            if not _vectorized(transform, inputs):
+                return _evaluate_by_group(model, parameters, index, inputs, inverse)
+        for name, values in zip(
+            transform.param_names, parameters[index].T, strict=True
+        ):
+            getattr(transform, name).value = values
+        return _as_tuple(transform(*inputs, with_bounding_box=False))
+
+    def _evaluate_rotation(self, model, parameters, index, inputs, inverse):
+        """
+        Evaluate a rotation, or its inverse, with the rotation of each point.
+        """
+        if isinstance(model, Rotation2D):
+            angle = np.deg2rad(parameters[index, 0])
+            if inverse:
+                angle = -angle
+            x, y = inputs
+            cos, sin = np.cos(angle), np.sin(angle)
+            return (x * cos - y * sin, x * sin + y * cos)
+        matrices = self._per_exposure(_sky_rotation_matrix, model, parameters)[index]
+        if inverse:
+            matrices = matrices.transpose(0, 2, 1)
+        vectors = np.einsum("pij,jp->ip", matrices, _unit_vectors(*inputs))
+        lon, lat = _vector_to_lonlat(vectors)
+        if isinstance(model, EulerAngleRotation):
+            lon = (lon + 180) % 360 - 180
+        return (lon, lat)
+
+    def _per_exposure(self, function, model, parameters):
+        """
+        Return ``function`` of a model with the parameters of each exposure.
+
+        The results are cached, by model of the stacked forward transform.
+        """
+        key = (function, id(model))
+        if key not in self._cache:
+            transform = model.copy()
+            values = []
+            for exposure_parameters in parameters:
+                transform.parameters = exposure_parameters
+                values.append(function(transform))
+            self._cache[key] = np.array(values)
+        return self._cache[key]
+
+
+def _structure(model):
+    """
+    Return a description of the models in a transform, without parameter
+    values.
+    """
+    if isinstance(model, CompoundModel):
+        right = (
+            tuple(model.right.items())
+            if model.op == "fix_inputs"
+            else _structure(model.right)
+        )
+        return (model.op, _structure(model.left), right)
+    return (
+        type(model),
+        model.n_inputs,
+        model.n_outputs,
+        getattr(model, "mapping", None),
+        len(model.parameters),
+        _model_state(model),
+    )
+
+
+def _user_inverse_parameters(model):
+    """
+    Return the parameters of the models with a user-supplied inverse, and of
+    their inverses, in a transform.
+    """
+    parameters = []
+    if model.has_user_inverse:
+        parameters += [model.parameters, model.inverse.parameters]
+    if isinstance(model, CompoundModel) and model.op != "fix_inputs":
+        parameters += [
+            _user_inverse_parameters(model.left),
+            _user_inverse_parameters(model.right),
+        ]
+    return np.concatenate([[], *parameters])
+
+
+def _vectorized(model, inputs):
+    """
+    Return whether a model is evaluated with per-point parameters.
+    """
+    if isinstance(model, _SKY_ROTATIONS):
+        # the rotation matrices are computed without units
+        return not any(isinstance(value, u.Quantity) for value in inputs)
+    if isinstance(model, Rotation2D):
+        return model.angle.unit is None
+    return isinstance(model, _BROADCAST_MODELS) and len(model.parameters) == len(
+        model.param_names
+    )
+
+
+def _inverse_parameters(model):
+    return model.inverse.parameters
+
+
+def _bounds(wcs):
+    """
+    Return the bounding box of a WCS as an array of intervals.
+    """
+    bbox = wcs.bounding_box
+    n_pixel = wcs.forward_transform.n_inputs
+    if bbox is None:
+        return np.array([[-np.inf, np.inf]] * n_pixel)
+    return np.array([tuple(bbox[axis]) for axis in range(n_pixel)], dtype=float)
+
+
+def _as_tuple(result):
+    return result if isinstance(result, tuple) else (result,)
+
+
+def _fill(values, mask, fill_value):
+    """
+    Return values with ``fill_value`` where ``mask`` is set.
+    """
+    if isinstance(values, u.Quantity):
+        return _fill(values.value, mask, fill_value) << values.unit
+    values = np.array(values, dtype=float)
+    values[mask] = fill_value
+    return values
+
+
+def _evaluate_by_group(model, parameters, index, inputs, inverse):
+    """
+    Evaluate a model, or its inverse, once per exposure.
+    """
+    order = np.argsort(index, kind="stable")
+    exposures, starts = np.unique(index[order], return_index=True)
+    transform = model.copy()
+    outputs = None
+    for exposure, start, stop in zip(
+        exposures, starts, [*starts[1:], len(order)], strict=True
+    ):
+        points = order[start:stop]
+        transform.parameters = parameters[exposure]
+        result = _as_tuple(
+            (transform.inverse if inverse else transform)(
+                *(value[points] for value in inputs), with_bounding_box=False
+            )
+        )
+        if outputs is None:
+            outputs = [
+                np.empty(len(index)) << value.unit
+                if isinstance(value, u.Quantity)
+                else np.empty(len(index))
+                for value in result
+            ]
+        for output, value in zip(outputs, result, strict=True):
+            output[points] = value
+    return tuple(outputs)
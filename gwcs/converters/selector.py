@@ -9,7 +9,12 @@ from astropy.modeling import models
 from astropy.modeling.core import Model
 from astropy.utils.misc import isiterable
 
-__all__ = ["LabelMapperConverter", "RegionsSelectorConverter"]
+__all__ = [
+    "CompactLabelMapperConverter",
+    "CompactRegionsSelectorConverter",
+    "LabelMapperConverter",
+    "RegionsSelectorConverter",
+]
 
 
 class LabelMapperConverter(TransformConverterBase):
@@ -42,7 +47,7 @@ class LabelMapperConverter(TransformConverterBase):
         atol = node.get("atol", 1e-8)
         no_label = node.get("no_label", np.nan)
 
-        if isinstance(mapper, NDArrayType):
+        if isinstance(mapper, NDArrayType | np.ndarray):
             if mapper.ndim != 2:
                 msg = "GWCS currently only supports 2D masks."
                 raise NotImplementedError(msg)
@@ -102,10 +107,70 @@ class LabelMapperConverter(TransformConverterBase):
         return node
 
 
+# Label mappers which are not described by the label_mapper schemas in
+# asdf_wcs_schemas. Their tags and schemas are owned by gwcs, shipped in
+# gwcs/resources and registered by the gwcs "label_mappers" extension.
+class CompactLabelMapperConverter(TransformConverterBase):
+    tags = ("asdf://stsci.edu/gwcs/tags/compact_label_mapper-*",)
+    types = (
+        "gwcs.selector.LabelMapperPolygons",
+        "gwcs.selector.LabelMapperRunLength",
+    )
+
+    def from_yaml_tree_transform(self, node, tag, ctx):
+        from gwcs.selector import LabelMapperPolygons, LabelMapperRunLength
+
+        mapper = node["mapper"]
+        if "polygons" in mapper:
+            regions = dict(
+                zip(mapper["polygon_labels"], mapper["polygons"], strict=True)
+            )
+            return LabelMapperPolygons(regions, node.get("inputs_mapping", None))
+        return LabelMapperRunLength(
+            mapper["shape"],
+            mapper["run_starts"],
+            mapper["run_lengths"],
+            mapper["run_labels"],
+            inputs_mapping=node.get("inputs_mapping", None),
+        )
+
+    def to_yaml_tree_transform(self, model, tag, ctx):
+        from gwcs.selector import LabelMapperPolygons
+
+        node = OrderedDict()
+        node["no_label"] = model.no_label
+        if model.inputs_mapping is not None:
+            node["inputs_mapping"] = model.inputs_mapping
+        mapper = OrderedDict()
+        if isinstance(model, LabelMapperPolygons):
+            mapper["polygon_labels"] = model.labels.tolist()
+            mapper["polygons"] = list(model.mapper.values())
+        else:
+            mapper["shape"] = list(model.shape)
+            mapper["run_starts"] = model.starts
+            mapper["run_lengths"] = model.lengths
+            mapper["run_labels"] = model.labels
+        node["mapper"] = mapper
+        return node
+
+
 class RegionsSelectorConverter(TransformConverterBase):
     tags = ("tag:stsci.edu:gwcs/regions_selector-*",)
     types = ("gwcs.selector.RegionsSelector",)
 
+    def select_tag(self, obj, tags, ctx):
+        # The regions_selector schemas require a label_mapper tag, the
+        # conversion is deferred to CompactRegionsSelectorConverter.
+        cls = type(obj.label_mapper)
+        if f"{cls.__module__}.{cls.__name__}" in CompactLabelMapperConverter.types:
+            return None
+        return tags[0]
+
+    def to_yaml_tree(self, model, tag, ctx):
+        if tag is None:
+            return _CompactRegionsSelector(model)
+        return super().to_yaml_tree(model, tag, ctx)
+
     def from_yaml_tree_transform(self, node, tag, ctx):
         from gwcs.selector import RegionsSelector
 
@@ -132,3 +197,24 @@ class RegionsSelectorConverter(TransformConverterBase):
         node["label_mapper"] = model.label_mapper
         node["undefined_transform_value"] = model.undefined_transform_value
         return node
+
+
+class _CompactRegionsSelector:
+    """
+    A RegionsSelector whose label mapper is written with a compact_label_mapper
+    tag.
+    """
+
+    def __init__(self, model):
+        self.model = model
+
+
+class CompactRegionsSelectorConverter(RegionsSelectorConverter):
+    tags = ("asdf://stsci.edu/gwcs/tags/compact_regions_selector-*",)
+    types = ("gwcs.converters.selector._CompactRegionsSelector",)
+
+    def select_tag(self, obj, tags, ctx):
+        return tags[0]
+
+    def to_yaml_tree(self, obj, tag, ctx):
+        return super().to_yaml_tree(obj.model, tag, ctx)
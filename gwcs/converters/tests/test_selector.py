@@ -1,6 +1,9 @@
 # Licensed under a 3-clause BSD style license - see LICENSE.rst
 import asdf
+import asdf.schema
+import asdf.util
 import numpy as np
+import pytest
 from astropy.modeling.models import Mapping, Polynomial2D, Scale, Shift
 from numpy.testing import assert_array_equal
 
@@ -16,7 +19,14 @@ def _assert_mapper_equal(a, b):
 
     assert type(a) is type(b)
 
-    if isinstance(a.mapper, dict):
+    if isinstance(a, selector.LabelMapperRunLength):
+        assert a.shape == b.shape
+        assert_array_equal(a.to_array(), b.to_array())
+    elif isinstance(a, selector.LabelMapperPolygons):
+        assert_array_equal(a.labels, b.labels)
+        for k in a.mapper:
+            assert_array_equal(a.mapper[k], b.mapper[k])
+    elif isinstance(a.mapper, dict):
         assert a.mapper.__class__ == b.mapper.__class__  # nosec
         assert np.isin(list(a.mapper), list(b.mapper)).all()  # nosec
         for k in a.mapper:
@@ -94,6 +104,126 @@ def test_labelMapperArray_int(tmp_path):
     assert_selector_roundtrip(mask, tmp_path)
 
 
+@pytest.mark.parametrize("open_kwargs", [{}, {"memmap": True}, {"lazy_load": False}])
+def test_LabelMapperArray_lazy(tmp_path, open_kwargs):
+    a = np.zeros((50, 60), dtype=np.int64)
+    a[:, 10:20] = 3
+    path = tmp_path / "test.asdf"
+    asdf.AsdfFile({"mapper": selector.LabelMapperArray(a)}).write_to(path)
+
+    with asdf.open(path, **open_kwargs) as af:
+        mapper = af["mapper"]
+        assert mapper(15, 4) == 3
+        assert mapper.mapper.dtype == np.uint8
+        assert_array_equal(mapper.mapper, a)
+
+
+def test_LabelMapperRunLength(tmp_path):
+    a = np.zeros((30, 40), dtype=np.int32)
+    a[2:10, 5:30] = 1
+    a[12:20, 8:35] = 2
+    mapper = selector.LabelMapperRunLength.from_array(a)
+    assert_selector_roundtrip(mapper, tmp_path)
+
+    sel = {1: Shift(1) & Shift(2), 2: Scale(2) & Scale(3)}
+    rs = selector.RegionsSelector(
+        inputs=("x", "y"), outputs=("x", "y"), selector=sel, label_mapper=mapper
+    )
+    assert_selector_roundtrip(rs, tmp_path)
+
+
+def test_LabelMapperRunLength_str(tmp_path):
+    a = np.array(
+        [["label1", "", "label2"], ["label1", "", ""], ["label1", "label2", "label2"]]
+    )
+    mapper = selector.LabelMapperRunLength.from_array(a)
+    assert_selector_roundtrip(mapper, tmp_path)
+
+
+def test_LabelMapperRunLength_schema(tmp_path):
+    a = np.zeros((30, 40), dtype=np.int32)
+    a[2:10, 5:30] = 1
+    mapper = selector.LabelMapperRunLength.from_array(a)
+    sel = {1: Shift(1) & Shift(2)}
+    rs = selector.RegionsSelector(
+        inputs=("x", "y"), outputs=("x", "y"), selector=sel, label_mapper=mapper
+    )
+    array_rs = selector.RegionsSelector(
+        inputs=("x", "y"),
+        outputs=("x", "y"),
+        selector=sel,
+        label_mapper=selector.LabelMapperArray(a),
+    )
+    path = tmp_path / "test.asdf"
+    asdf.AsdfFile({"mapper": mapper, "rs": rs, "array_rs": array_rs}).write_to(path)
+
+    tree = asdf.util.load_yaml(path, tagged=True)
+    assert tree["mapper"]._tag == (
+        "asdf://stsci.edu/gwcs/tags/compact_label_mapper-1.0.0"
+    )
+    assert tree["rs"]._tag == (
+        "asdf://stsci.edu/gwcs/tags/compact_regions_selector-1.0.0"
+    )
+    assert tree["rs"]["label_mapper"]._tag == tree["mapper"]._tag
+    assert tree["array_rs"]._tag.startswith("tag:stsci.edu:gwcs/regions_selector-")
+    asdf.schema.validate(tree)
+
+    del tree["mapper"]["mapper"]["run_labels"]
+    with pytest.raises(asdf.ValidationError):
+        asdf.schema.validate(tree)
+
+
+@pytest.mark.parametrize("labels", [[1, 2], ["S200A1", "S400A1"]])
+def test_LabelMapperPolygons(tmp_path, labels):
+    regions = dict(
+        zip(
+            labels,
+            [
+                [[0.5, 0.5], [10.2, 0.5], [10.2, 4.7], [0.5, 4.7], [0.5, 0.5]],
+                [[2, 6], [12, 6], [7, 15], [2, 6]],
+            ],
+            strict=True,
+        )
+    )
+    mapper = selector.LabelMapperPolygons(regions)
+    assert_selector_roundtrip(mapper, tmp_path)
+
+    sel = {labels[0]: Shift(1) & Shift(2), labels[1]: Scale(2) & Scale(3)}
+    rs = selector.RegionsSelector(
+        inputs=("x", "y"), outputs=("x", "y"), selector=sel, label_mapper=mapper
+    )
+    assert_selector_roundtrip(rs, tmp_path)
+
+
+def test_LabelMapperPolygons_schema(tmp_path):
+    regions = {
+        "S200A1": [[0.5, 0.5], [10.2, 0.5], [10.2, 4.7], [0.5, 4.7], [0.5, 0.5]],
+        "S400A1": [[2, 6], [12, 6], [7, 15], [2, 6]],
+    }
+    mapper = selector.LabelMapperPolygons(regions)
+    rs = selector.RegionsSelector(
+        inputs=("x", "y"),
+        outputs=("x", "y"),
+        selector={"S200A1": Shift(1) & Shift(2), "S400A1": Scale(2) & Scale(3)},
+        label_mapper=mapper,
+    )
+    path = tmp_path / "test.asdf"
+    asdf.AsdfFile({"mapper": mapper, "rs": rs}).write_to(path)
+
+    tree = asdf.util.load_yaml(path, tagged=True)
+    assert tree["mapper"]._tag == (
+        "asdf://stsci.edu/gwcs/tags/compact_label_mapper-1.0.0"
+    )
+    assert tree["rs"]._tag == (
+        "asdf://stsci.edu/gwcs/tags/compact_regions_selector-1.0.0"
+    )
+    asdf.schema.validate(tree)
+
+    del tree["mapper"]["mapper"]["polygon_labels"]
+    with pytest.raises(asdf.ValidationError):
+        asdf.schema.validate(tree)
+
+
 def test_LabelMapperDict(tmp_path):
     dmapper = create_scalar_mapper()
     sel = selector.LabelMapperDict(
@@ -4,7 +4,12 @@ import importlib.resources
 from asdf.extension import Extension, ManifestExtension
 
 from .converters.geometry import DirectionCosinesConverter, SphericalCartesianConverter
-from .converters.selector import LabelMapperConverter, RegionsSelectorConverter
+from .converters.selector import (
+    CompactLabelMapperConverter,
+    CompactRegionsSelectorConverter,
+    LabelMapperConverter,
+    RegionsSelectorConverter,
+)
 from .converters.spectroscopy import (
     GratingEquationConverter,
     SellmeierGlassConverter,
@@ -83,6 +88,16 @@ if len(TRANSFORM_EXTENSIONS) > 1:
     TRANSFORM_EXTENSIONS.append(_EmptyExtension())
 
 
+# Tags which are defined by the schemas shipped with gwcs itself
+# (see gwcs.integration).
+TRANSFORM_EXTENSIONS.append(
+    ManifestExtension.from_uri(
+        "asdf://stsci.edu/gwcs/manifests/label_mappers-1.0.0",
+        converters=[CompactLabelMapperConverter(), CompactRegionsSelectorConverter()],
+    )
+)
+
+
 def get_extensions():
     """
     Get the gwcs.converters extension.
@@ -0,0 +1,311 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+"""
+A spatial index over the celestial footprints of many WCS objects.
+"""
+
+import numpy as np
+from astropy import units as u
+
+from .wcstools import _unit_vectors
+
+__all__ = ["WCSFootprintIndex"]
+
+# The faces of the cube which tiles the sphere, as the axis through the center
+# of the face followed by the directions of its two face coordinates.
+_FACES = np.array(
+    [
+        [[1, 0, 0], [0, 1, 0], [0, 0, 1]],
+        [[-1, 0, 0], [0, -1, 0], [0, 0, 1]],
+        [[0, 1, 0], [-1, 0, 0], [0, 0, 1]],
+        [[0, -1, 0], [1, 0, 0], [0, 0, 1]],
+        [[0, 0, 1], [0, 1, 0], [-1, 0, 0]],
+        [[0, 0, -1], [0, 1, 0], [1, 0, 0]],
+    ],
+    dtype=float,
+)
+
+_MAX_LEVEL = 16
+
+
+class WCSFootprintIndex:
+    """
+    A spatial index over the celestial footprints of many WCS objects.
+
+    The footprint of each WCS is computed once, as a spherical polygon with
+    the corners of the bounding box as vertices (see
+    `~gwcs.wcs.WCS.footprint`). The polygons are registered in the cells of a
+    tiling of the sphere (the six faces of a cube, each divided in
+    ``2**level`` by ``2**level`` cells) which their bounding caps overlap.
+
+    Queries only use the cached polygons, no transform is evaluated. The
+    edges of the polygons are great circle arcs and the polygons are assumed
+    to be convex, so the results are approximate for footprints with edges
+    which are curved on the sky.
+
+    Parameters
+    ----------
+    wcs_objects : iterable of `~gwcs.wcs.WCS`
+        WCS objects with celestial world coordinates and a bounding box. All
+        footprints must be in the same celestial frame.
+    level : int, optional
+        The level of the tiling. Defaults to a level where the cells are
+        about the size of the footprints.
+
+    Attributes
+    ----------
+    wcs_objects : tuple of `~gwcs.wcs.WCS`
+        The indexed WCS objects. Queries return indices into this tuple.
+    footprints : tuple of ndarray
+        The footprint of each WCS, as an array of shape ``(n_vertices, 2)``
+        with the longitude and latitude of the vertices in degrees.
+    level : int
+        The level of the tiling.
+    """
+
+    def __init__(self, wcs_objects, level=None):
+        self.wcs_objects = tuple(wcs_objects)
+        footprints = []
+        for i, wcs in enumerate(self.wcs_objects):
+            footprint = np.asarray(wcs.footprint(axis_type="spatial"), dtype=float)
+            if (
+                footprint.ndim != 2
+                or footprint.shape[1] != 2
+                or not np.isfinite(footprint).all()
+            ):
+                msg = f"The footprint of WCS {i} is not a valid celestial polygon."
+                raise ValueError(msg)
+            footprints.append(footprint)
+        self.footprints = tuple(footprints)
+
+        # polygons with fewer vertices repeat their last vertex, which adds
+        # edges of zero length
+        n_vertices = max((len(footprint) for footprint in footprints), default=3)
+        vertices = np.zeros((len(footprints), n_vertices, 3))
+        for vertex, footprint in zip(vertices, footprints, strict=True):
+            padded = np.concatenate(
+                [footprint, np.repeat(footprint[-1:], n_vertices - len(footprint), 0)]
+            )
+            vertex[:] = _unit_vectors(*padded.T).T
+        self._vertices = vertices
+
+        self._centers, self._radii = _bounding_caps(vertices)
+        # the normals of the edges point to the inside of the polygons
+        normals = np.cross(vertices, np.roll(vertices, -1, axis=1))
+        orientation = np.sign(np.einsum("mkd,md->m", normals, self._centers))
+        normals *= orientation[:, None, None]
+        length = np.linalg.norm(normals, axis=-1, keepdims=True)
+        self._normals = np.divide(
+            normals, length, out=np.zeros_like(normals), where=length > 0
+        )
+
+        if level is None:
+            radius = np.median(self._radii) if len(self._radii) else np.pi / 2
+            level = int(np.floor(np.log2(np.pi / (4 * max(radius, 1e-12)))))
+        self.level = int(np.clip(level, 0, _MAX_LEVEL))
+        self._cells, self._members = self._register()
+
+    def __len__(self):
+        return len(self.wcs_objects)
+
+    def _register(self):
+        """
+        Return the sorted cell numbers and the polygons registered in them.
+        """
+        members = np.repeat(np.arange(len(self)), 6)
+        face = np.tile(np.arange(6), len(self))
+        i = j = np.zeros_like(members)
+        for level in range(self.level + 1):
+            if level:
+                members = np.repeat(members, 4)
+                face = np.repeat(face, 4)
+                i = 2 * np.repeat(i, 4) + np.tile([0, 0, 1, 1], len(i))
+                j = 2 * np.repeat(j, 4) + np.tile([0, 1, 0, 1], len(j))
+            centers, radii = _cell_caps(face, i, j, 2**level)
+            distance = _angle(centers, self._centers[members])
+            keep = distance <= radii + self._radii[members]
+            members, face, i, j = members[keep], face[keep], i[keep], j[keep]
+        n = 2**self.level
+        cells = (face * n + i) * n + j
+        order = np.argsort(cells, kind="stable")
+        return cells[order], members[order]
+
+    def _candidates(self, cells):
+        """
+        Return the pairs of query and polygon indices which share a cell.
+        """
+        start = np.searchsorted(self._cells, cells, side="left")
+        counts = np.searchsorted(self._cells, cells, side="right") - start
+        queries = np.repeat(np.arange(len(cells)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(
+            np.cumsum(counts) - counts, counts
+        )
+        return queries, self._members[np.repeat(start, counts) + offsets]
+
+    def query_points(self, lon, lat):
+        """
+        Find the footprints which contain positions on the sky.
+
+        Parameters
+        ----------
+        lon, lat : float, array-like or `~astropy.units.Quantity`
+            The coordinates of the positions, in degrees if not a quantity.
+
+        Returns
+        -------
+        points, indices : ndarray
+            The pairs of a position (an index into the flattened ``lon`` and
+            ``lat``) and a WCS (an index into `wcs_objects`) which contains it,
+            ordered by position.
+        """
+        points = _unit_vectors(*_to_degrees(lon, lat)).T
+        queries, members = self._candidates(_point_cells(points, 2**self.level))
+        inside = np.all(
+            np.einsum("pkd,pd->pk", self._normals[members], points[queries]) >= 0,
+            axis=1,
+        )
+        return queries[inside], members[inside]
+
+    def query_cone(self, lon, lat, radius):
+        """
+        Find the footprints which overlap a cone on the sky.
+
+        Parameters
+        ----------
+        lon, lat : float or `~astropy.units.Quantity`
+            The center of the cone, in degrees if not a quantity.
+        radius : float or `~astropy.units.Quantity`
+            The radius of the cone, in degrees if not a quantity.
+
+        Returns
+        -------
+        indices : ndarray
+            The indices into `wcs_objects` of the WCSs which overlap the cone.
+        """
+        lon, lat, radius = _to_degrees(lon, lat, radius)
+        center = _unit_vectors(lon, lat).T[0]
+        radius = np.deg2rad(radius.item())
+        candidates = np.flatnonzero(
+            _angle(self._centers, center) <= self._radii + radius
+        )
+        vertices = self._vertices[candidates]
+        normals = self._normals[candidates]
+        inside = np.all(normals @ center >= 0, axis=1)
+
+        # the distance from the center to the edges, which is the distance to
+        # the great circle of the edge if its closest point is on the edge, or
+        # the distance to the nearest vertex otherwise
+        ends = np.roll(vertices, -1, axis=1)
+        sine = normals @ center
+        closest = center - sine[..., None] * normals
+        edges = np.cross(vertices, ends)
+        on_edge = (
+            (np.einsum("mkd,mkd->mk", np.cross(vertices, closest), edges) >= 0)
+            & (np.einsum("mkd,mkd->mk", np.cross(closest, ends), edges) >= 0)
+            & np.any(normals != 0, axis=-1)
+        )
+        distance = np.where(
+            on_edge, np.arcsin(np.clip(np.abs(sine), 0, 1)), _angle(vertices, center)
+        )
+        return candidates[inside | np.any(distance <= radius, axis=1)]
+
+    def overlaps(self):
+        """
+        Find all pairs of overlapping footprints.
+
+        Returns
+        -------
+        first, second : ndarray
+            The indices into `wcs_objects` of the pairs of overlapping WCSs,
+            with ``first < second``, in lexicographic order.
+        """
+        boundaries = np.flatnonzero(np.diff(self._cells)) + 1
+        first, second = [], []
+        for members in np.split(self._members, boundaries):
+            if len(members) > 1:
+                i, j = np.triu_indices(len(members), 1)
+                first.append(members[i])
+                second.append(members[j])
+        if not first:
+            return np.array([], dtype=int), np.array([], dtype=int)
+        first, second = np.concatenate(first), np.concatenate(second)
+        first, second = np.minimum(first, second), np.maximum(first, second)
+        pairs = np.unique(first * len(self) + second)
+        first, second = np.divmod(pairs, len(self))
+
+        near = (
+            _angle(self._centers[first], self._centers[second])
+            <= self._radii[first] + self._radii[second]
+        )
+        first, second = first[near], second[near]
+        # convex polygons are disjoint if all vertices of one are outside an
+        # edge of the other
+        separated = _separated(
+            self._normals[first], self._vertices[second]
+        ) | _separated(self._normals[second], self._vertices[first])
+        return first[~separated], second[~separated]
+
+
+def _to_degrees(*values):
+    """
+    Return angles in degrees, as broadcast flat arrays.
+    """
+    values = [
+        u.Quantity(value, u.deg).value if isinstance(value, u.Quantity) else value
+        for value in values
+    ]
+    return [np.ravel(value).astype(float) for value in np.broadcast_arrays(*values)]
+
+
+def _angle(vectors, other):
+    """
+    Return the angle in radians between unit vectors.
+    """
+    cross = np.linalg.norm(np.cross(vectors, other), axis=-1)
+    return np.arctan2(cross, np.sum(vectors * other, axis=-1))
+
+
+def _bounding_caps(vertices):
+    """
+    Return the centers and the radii of caps which contain spherical polygons.
+    """
+    centers = vertices.sum(axis=1)
+    centers /= np.linalg.norm(centers, axis=-1, keepdims=True)
+    radii = _angle(vertices, centers[:, None]).max(axis=1, initial=0)
+    return centers, radii
+
+
+def _cell_caps(face, i, j, n):
+    """
+    Return the centers and the radii of caps which contain cells of the tiling.
+    """
+    corners = []
+    for di, dj in ((0, 0), (0, 1), (1, 1), (1, 0)):
+        fu = 2 * (i + di) / n - 1
+        fv = 2 * (j + dj) / n - 1
+        axes = _FACES[face]
+        corner = axes[:, 0] + fu[:, None] * axes[:, 1] + fv[:, None] * axes[:, 2]
+        corners.append(corner / np.linalg.norm(corner, axis=-1, keepdims=True))
+    return _bounding_caps(np.stack(corners, axis=1))
+
+
+def _point_cells(points, n):
+    """
+    Return the numbers of the cells of the tiling which contain points.
+    """
+    axis = np.argmax(np.abs(points), axis=-1)
+    major = np.take_along_axis(points, axis[:, None], axis=-1)[:, 0]
+    face = 2 * axis + (major < 0)
+    axes = _FACES[face]
+    fu = np.einsum("pd,pd->p", points, axes[:, 1]) / np.abs(major)
+    fv = np.einsum("pd,pd->p", points, axes[:, 2]) / np.abs(major)
+    i = np.clip(np.floor((fu + 1) / 2 * n).astype(int), 0, n - 1)
+    j = np.clip(np.floor((fv + 1) / 2 * n).astype(int), 0, n - 1)
+    return (face * n + i) * n + j
+
+
+def _separated(normals, vertices):
+    """
+    Return whether all ``vertices`` are outside one of the edges with ``normals``.
+    """
+    outside = np.einsum("mkd,mld->mkl", normals, vertices) < 0
+    return np.any(np.all(outside, axis=2), axis=1)
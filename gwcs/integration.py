@@ -0,0 +1,23 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import importlib.resources
+
+from asdf.resource import DirectoryResourceMapping
+
+
+def get_resource_mappings():
+    """
+    Get the resource mappings for the schemas and manifests shipped with gwcs.
+    This method is registered with the asdf.resource_mappings entry point.
+    Returns
+    -------
+    list of collections.abc.Mapping
+    """
+    resources_root = importlib.resources.files("gwcs") / "resources"
+    return [
+        DirectoryResourceMapping(
+            resources_root / "schemas", "asdf://stsci.edu/gwcs/schemas/"
+        ),
+        DirectoryResourceMapping(
+            resources_root / "manifests", "asdf://stsci.edu/gwcs/manifests/"
+        ),
+    ]
@@ -9,6 +9,7 @@ Polygon filling algorithm.
 #    http://www.cs.uic.edu/~jbell/CourseNotes/ComputerGraphics/PolygonFilling.html
 
 import abc
+import itertools
 from collections import OrderedDict
 
 import numpy as np
@@ -51,6 +52,25 @@ class Region:
         Subclasses must define this method.
         """
 
+    def contains(self, x, y):
+        """
+        Determines which points are within a region.
+
+        Parameters
+        ----------
+        x, y : float or ndarray
+            Point coordinates.
+
+        Returns
+        -------
+        inside : bool or ndarray
+            A boolean mask with the broadcast shape of the inputs.
+
+        Subclasses should define this method.
+        """
+        msg = f"{type(self).__name__} does not implement contains."
+        raise NotImplementedError(msg)
+
     @abc.abstractmethod
     def scan(self, mask):
         """
@@ -102,25 +122,29 @@ class Polygon(Region):
         # polygon must be completely contained in the image. It seems that the
         # code works fine if we make sure that the bottom-left corner of the
         # polygon's bounding box has non-negative coordinates.
-        self._shiftx = 0
-        self._shifty = 0
-        for vertex in vertices:
-            x, y = vertex
-            self._shiftx = min(x, self._shiftx)
-            self._shifty = min(y, self._shifty)
-        v = [(i - self._shiftx, j - self._shifty) for i, j in vertices]
+        v = np.asarray(vertices, dtype=float)
+        self._exact_vertices = v
+        self._exact_edges = None
+        shift = np.minimum(v.min(axis=0), 0)
 
         # convert to integer coordinates:
-        self._vertices = np.asarray(list(map(_round_vertex, v)))
-        self._shiftx = int(round(self._shiftx))
-        self._shifty = int(round(self._shifty))
+        self._vertices = np.round(v - shift).astype(int)
+        self._shiftx = int(round(shift[0]))
+        self._shifty = int(round(shift[1]))
 
         self._bbox = self._get_bounding_box()
         self._scan_line_range = list(
             range(self._bbox[1], self._bbox[3] + self._bbox[1] + 1)
         )
-        # constructs a Global Edge Table (GET) in bbox coordinates
-        self._GET = self._construct_ordered_GET()
+        # the Global Edge Table (GET) in bbox coordinates is constructed
+        # on first use, scan does not need it
+        self._global_edge_table = None
+
+    @property
+    def _GET(self):
+        if self._global_edge_table is None:
+            self._global_edge_table = self._construct_ordered_GET()
+        return self._global_edge_table
 
     def _get_bounding_box(self):
         x = self._vertices[:, 0].min()
@@ -180,69 +204,70 @@ class Polygon(Region):
             the region's ID
 
         Algorithm:
-        - Set the Global Edge Table (GET)
-        - Set y to be the smallest y coordinate that has an entry in GET
-        - Initialize the Active Edge Table (AET) to be empty
-        - For each scan line:
-          1. Add edges from GET to AET for which ymin==y
-          2. Remove edges from AET for which ymax==y
-          3. Compute the intersection of the current scan line with all edges in the AET
-          4. Sort on X of intersection point
-          5. Set elements between pairs of X in the AET to the Edge's ID
+        - Compute the intersections of all scan lines with all edges
+          which are active on them, as arrays
+        - Sort the intersections on scan line and X
+        - Pair consecutive intersections on each scan line into spans
+        - Set elements of all spans to the region's ID at once
 
         """
-        # TODO:
-        # 1. This algorithm does not mark pixels in the top row and left most
-        #    column. Pad the initial pixel description on top and left with 1 px
-        #    to prevent this.
-        # 2. Currently it uses # intersection of the scan line with edges. If
-        #    this is too slow it should use the 1/m increment (replace 3 above)
-        #    (or the increment should be removed from the GET entry).
-
         # see comments in the __init__ function for the reason of introducing
         # polygon shifts (self._shiftx & self._shifty). Here we need to shift
         # it back.
+        y, xstart, xend = self._spans()
+        _fill_spans(
+            data,
+            y + self._shifty,
+            xstart + self._shiftx,
+            xend + self._shiftx,
+            self._rid,
+        )
+        return data
 
-        (ny, nx) = data.shape
-
-        y = np.min(list(self._GET.keys()))
-
-        AET = []
-        scline = self._scan_line_range[-1]
-
-        while y <= scline:
-            if y < scline:
-                AET = self.update_AET(y, AET)
-
-            if self._bbox[2] <= 0:
-                y += 1
-                continue
+    def _spans(self):
+        """
+        Compute the spans of pixels within the polygon on each scan line.
 
-            scan_line = Edge(
-                "scan_line",
-                start=[self._bbox[0], y],
-                stop=[self._bbox[0] + self._bbox[2], y],
-            )
-            x = [
-                int(np.ceil(e.compute_AET_entry(scan_line)[1]))
-                for e in AET
-                if e is not None
-            ]
-            xnew = np.sort(x)
-            ysh = y + self._shifty
+        Returns
+        -------
+        y, xstart, xend : ndarray
+            Scan line and first and last (inclusive) X of each span,
+            in polygon coordinates.
+        """
+        _, y, xstart, xend = _edge_spans(*self._edge_table())
+        return y, xstart, xend
 
-            if ysh < 0 or ysh >= ny:
-                y += 1
-                continue
+    def _edge_table(self, index=0):
+        """
+        Return the edges of the polygon as arrays.
 
-            for i, j in zip(xnew[::2], xnew[1::2], strict=False):
-                xstart = max(0, i + self._shiftx)
-                xend = min(j + self._shiftx, nx - 1)
-                data[ysh][xstart : xend + 1] = self._rid
+        Horizontal edges and edges of polygons with a zero width
+        bounding box are left out since they never cross a scan line.
 
-            y += 1
+        Parameters
+        ----------
+        index : int
+            Polygon index stored with each edge.
 
-        return data
+        Returns
+        -------
+        start, stop : ndarray
+            Vertices of the edges, shape ``(n, 2)``.
+        top : ndarray
+            The top scan line of the polygon for each edge.
+        index : ndarray
+            The polygon index for each edge.
+        """
+        start = self._vertices[:-1]
+        stop = self._vertices[1:]
+        sloped = start[:, 1] != stop[:, 1]
+        if self._bbox[2] <= 0:
+            sloped[:] = False
+        start = start[sloped]
+        stop = stop[sloped]
+        n = start.shape[0]
+        top = np.full(n, self._bbox[1] + self._bbox[3])
+        return start, stop, top, np.full(n, index)
 
     def update_AET(self, y, AET):
         """
@@ -264,14 +289,55 @@ class Polygon(Region):
                 AET.remove(edge)
         return AET
 
-    def __contains__(self, px):
-        """even-odd algorithm or something else better should be used"""
-        return (
-            px[0] >= self._bbox[0]
-            and px[0] <= self._bbox[0] + self._bbox[2]
-            and px[1] >= self._bbox[1]
-            and px[1] <= self._bbox[1] + self._bbox[3]
+    @property
+    def _edges(self):
+        """
+        The edges of the polygon, as given, in an array of shape ``(n, 4)``.
+
+        Each row is ``(x1, y1, x2, y2)``. Horizontal edges are left out,
+        they do not change the even-odd count.
+        """
+        if self._exact_edges is None:
+            v = self._exact_vertices
+            edges = np.hstack([v[:-1], v[1:]])
+            self._exact_edges = edges[edges[:, 1] != edges[:, 3]]
+        return self._exact_edges
+
+    def contains(self, x, y):
+        """
+        Determines which points are within the polygon.
+
+        This is an exact even-odd test using the vertices as given,
+        without rounding them to pixels. Points on the left and bottom
+        boundaries are inside, points on the right and top boundaries
+        are outside, so polygons sharing an edge do not overlap.
+
+        Parameters
+        ----------
+        x, y : float or ndarray
+            Point coordinates.
+
+        Returns
+        -------
+        inside : bool or ndarray
+            A boolean mask with the broadcast shape of the inputs.
+        """
+        x, y = np.broadcast_arrays(
+            np.asarray(x, dtype=float), np.asarray(y, dtype=float)
         )
+        shape = x.shape
+        xmin, ymin = self._exact_vertices.min(axis=0)
+        xmax, ymax = self._exact_vertices.max(axis=0)
+        x = x.ravel()
+        y = y.ravel()
+        inside = np.zeros(x.shape, dtype=bool)
+        ind = np.flatnonzero((x >= xmin) & (x < xmax) & (y >= ymin) & (y < ymax))
+        inside[ind] = _even_odd(x[ind], y[ind], self._edges)
+        inside = inside.reshape(shape)
+        return inside if inside.ndim else inside.item()
+
+    def __contains__(self, px):
+        return self.contains(px[0], px[1])
 
 
 class Edge:
@@ -417,6 +483,202 @@ def _det(u, v):
     return u[0] * v[1] - u[1] * v[0]
 
 
-def _round_vertex(v):
-    x, y = v
-    return (int(round(x)), int(round(y)))
+def _edge_spans(start, stop, top, index):
+    """
+    Compute the spans of pixels within polygons from a combined edge table.
+
+    This is a vectorized version of the scan line algorithm using
+    the Global and Active Edge Tables (see `Polygon.update_AET`):
+    on a scan line ``y`` below the top of its polygon an edge is
+    active if ``ymin <= y < ymax``. On the top scan line the
+    edges active on the previous scan line which end on it are used.
+
+    Parameters
+    ----------
+    start, stop : ndarray
+        Vertices of the (not horizontal) edges, shape ``(n, 2)``.
+    top : ndarray
+        The top scan line of the polygon of each edge.
+    index : ndarray
+        The polygon index of each edge.
+
+    Returns
+    -------
+    index, y, xstart, xend : ndarray
+        Polygon index, scan line and first and last (inclusive) X of
+        each span, sorted on polygon index and scan line.
+    """
+    ymin = np.minimum(start[:, 1], stop[:, 1])
+    ymax = np.maximum(start[:, 1], stop[:, 1])
+    # edges are active on the contiguous range of scan lines [ymin, last]
+    last = ymax - 1 + (ymax == top)
+    counts = np.maximum(last - ymin + 1, 0)
+    edge = np.repeat(np.arange(ymin.size), counts)
+    offsets = np.arange(edge.size) - np.repeat(np.cumsum(counts) - counts, counts)
+    y = ymin[edge] + offsets
+    index = index[edge]
+
+    # intersection of the scan lines with the edges, computed the same
+    # way as in `Edge.intersection`
+    u = stop[edge] - start[edge]
+    t = (y - start[edge, 1]) / u[:, 1]
+    x = np.ceil(t * u[:, 0] + start[edge, 0]).astype(int)
+
+    order = np.lexsort((x, y, index))
+    index = index[order]
+    y = y[order]
+    x = x[order]
+    # pair consecutive intersections on each scan line of each polygon
+    first = np.ones(y.shape, dtype=bool)
+    first[1:] = (y[1:] != y[:-1]) | (index[1:] != index[:-1])
+    line_start = np.maximum.accumulate(np.where(first, np.arange(y.size), 0))
+    rank = np.arange(y.size) - line_start
+    pair = (rank % 2 == 0)[:-1] & ~first[1:]
+    ind = np.flatnonzero(pair)
+    return index[ind], y[ind], x[ind], x[ind + 1]
+
+
+def _scan_polygons(polygons, data, executor=None, band_rows=256):
+    """
+    Scan several polygons into a mask at once.
+
+    The edges of all polygons are combined in one edge table and all
+    spans are computed together. Where polygons overlap the later
+    polygon in ``polygons`` takes precedence, as when scanning them
+    one after the other.
+
+    Parameters
+    ----------
+    polygons : list of `Polygon`
+        The polygons to scan.
+    data : ndarray
+        The mask array, modified in place.
+    executor : `concurrent.futures.Executor`, optional
+        If given, bands of ``band_rows`` rows of the mask are filled
+        in parallel tasks submitted to it. Each task fills a copy of
+        its band, which is written back into ``data``, so process pools
+        can be used. Filling the spans holds the GIL, so thread pools
+        give little gain.
+    band_rows : int
+        Number of rows in a band.
+
+    Returns
+    -------
+    data : ndarray
+        The mask.
+    """
+    if not polygons:
+        return data
+    tables = [pol._edge_table(i) for i, pol in enumerate(polygons)]
+    index, y, xstart, xend = _edge_spans(
+        *(np.concatenate(arrays) for arrays in zip(*tables, strict=True))
+    )
+    shiftx = np.array([pol._shiftx for pol in polygons], dtype=int)
+    shifty = np.array([pol._shifty for pol in polygons], dtype=int)
+    rid = np.array([pol._rid for pol in polygons])
+    y = y + shifty[index]
+    xstart = xstart + shiftx[index]
+    xend = xend + shiftx[index]
+    values = rid[index]
+    if executor is None or not y.size:
+        _fill_spans(data, y, xstart, xend, values)
+        return data
+
+    # bands of rows are disjoint so they can be filled concurrently,
+    # the stable sort keeps the polygon order within a band
+    band = np.clip(y, 0, data.shape[0] - 1) // band_rows
+    order = np.argsort(band, kind="stable")
+    bounds = np.searchsorted(band[order], np.arange(band.max() + 2))
+    tasks = []
+    for number, (lo, hi) in enumerate(itertools.pairwise(bounds)):
+        if lo == hi:
+            continue
+        ind = order[lo:hi]
+        rows = slice(number * band_rows, (number + 1) * band_rows)
+        future = executor.submit(
+            _fill_band,
+            data[rows].copy(),
+            y[ind] - rows.start,
+            xstart[ind],
+            xend[ind],
+            values[ind],
+        )
+        tasks.append((rows, future))
+    for rows, future in tasks:
+        data[rows] = future.result()
+    return data
+
+
+def _fill_band(band, y, xstart, xend, value):
+    """
+    Fill spans in a band of rows of a mask and return the band.
+    """
+    _fill_spans(band, y, xstart, xend, value)
+    return band
+
+
+def _even_odd(x, y, edges):
+    """
+    Even-odd test of points against polygon edges.
+
+    Parameters
+    ----------
+    x, y : ndarray
+        1D arrays of point coordinates.
+    edges : ndarray
+        Not horizontal edges ``(x1, y1, x2, y2)``, shape ``(n, 4)``.
+
+    Returns
+    -------
+    inside : ndarray
+        True where a ray from a point towards +X crosses an odd
+        number of edges.
+    """
+    inside = np.zeros(x.shape, dtype=bool)
+    for x1, y1, x2, y2 in edges.tolist():
+        crosses = (y1 > y) != (y2 > y)
+        xcross = x1 + (y - y1) * ((x2 - x1) / (y2 - y1))
+        inside ^= crosses & (x < xcross)
+    return inside
+
+
+def _fill_spans(data, y, xstart, xend, value):
+    """
+    Set the elements of horizontal spans of a 2D array to a value.
+
+    Parameters
+    ----------
+    data : ndarray
+        2D array to be modified in place.
+    y, xstart, xend : ndarray
+        Row and first and last (inclusive) column of each span.
+        Spans may extend outside ``data``.
+    value : int, str or ndarray
+        The value to set, or an array with a value for each span.
+        Spans are filled in order.
+
+    Notes
+    -----
+    All spans are filled at once, by their flat pixel indices. The copies
+    of this module in JWST and Romancal fill each span in a loop, with the
+    same result. This helper is private, so the API of the module stays the
+    same as in the copies.
+    """
+    ny, nx = data.shape
+    xstart = np.maximum(xstart, 0)
+    xend = np.minimum(xend, nx - 1)
+    keep = (y >= 0) & (y < ny) & (xstart <= xend)
+    value = np.broadcast_to(value, y.shape)[keep]
+    y, xstart = y[keep], xstart[keep]
+    lengths = xend[keep] - xstart + 1
+    # the flat index of every pixel of every span
+    span = np.repeat(np.arange(lengths.size), lengths)
+    offset = np.arange(span.size) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    index = y[span] * nx + xstart[span] + offset
+    if np.unique(value).size > 1:
+        # the order of assignments to repeated indices is not defined,
+        # keep the last span which covers each pixel
+        _, last = np.unique(index[::-1], return_index=True)
+        covered = index.size - 1 - last
+        index, span = index[covered], span[covered]
+    data[np.divmod(index, nx)] = value[span]
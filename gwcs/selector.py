@@ -68,6 +68,8 @@ label mappers.
 """
 
 import contextlib
+import copy
+import mmap
 import warnings
 
 import numpy as np
@@ -75,13 +77,15 @@ from astropy.modeling import models as astmodels
 from astropy.modeling.core import Model
 
 from . import region
-from .utils import RegionError, _toindex
+from .utils import RegionError, _model_state, _toindex
 
 __all__ = [
     "LabelMapper",
     "LabelMapperArray",
     "LabelMapperDict",
+    "LabelMapperPolygons",
     "LabelMapperRange",
+    "LabelMapperRunLength",
     "RegionsSelector",
 ]
 
@@ -108,6 +112,104 @@ def get_unique_regions(regions):
     return unique_regions
 
 
+def _group_by_index(index, nbins):
+    """
+    Group array positions by an integer bin index in a single pass.
+
+    Parameters
+    ----------
+    index : ndarray
+        1D array of integer bin indices in the range [0, nbins).
+        Negative values mark positions which do not belong to any bin.
+    nbins : int
+        The number of bins.
+
+    Returns
+    -------
+    order : ndarray
+        Positions in ``index`` sorted by bin.
+    bounds : ndarray
+        Array of length ``nbins + 1``. The positions in bin ``k`` are
+        ``order[bounds[k]:bounds[k + 1]]``.
+    """
+    order = np.argsort(index, kind="stable")
+    valid = index >= 0
+    counts = np.bincount(index[valid], minlength=nbins)
+    bounds = np.empty(nbins + 1, dtype=np.intp)
+    bounds[0] = index.size - counts.sum()
+    np.cumsum(counts, out=bounds[1:])
+    bounds[1:] += bounds[0]
+    return order, bounds
+
+
+def _min_int_dtype(labels):
+    """
+    Return the smallest integer dtype which can hold all values in ``labels``.
+    """
+    labels = np.asarray(labels)
+    if labels.size == 0:
+        return np.dtype(np.uint8)
+    lmin = int(labels.min())
+    lmax = int(labels.max())
+    return np.result_type(np.min_scalar_type(lmin), np.min_scalar_type(lmax))
+
+
+def _label_dtype(dtype):
+    """
+    Return the dtype of the labels returned by a label mapper which stores
+    its labels with ``dtype``.
+
+    Integer labels, which may be stored with the smallest integer type which
+    holds them, are returned with the default integer type.
+    """
+    return np.dtype(int) if np.can_cast(dtype, int) else dtype
+
+
+def _is_memory_mapped(array):
+    """
+    Return `True` if ``array`` is memory mapped or not loaded yet,
+    for example an array which is lazily loaded from an ASDF file.
+    """
+    if not isinstance(array, np.ndarray):
+        return True
+    while array is not None:
+        if isinstance(array, np.memmap | mmap.mmap):
+            return True
+        array = getattr(array, "base", None)
+    return False
+
+
+def _group_by_label(labels):
+    """
+    Group array positions by label using a single stable sort.
+
+    Parameters
+    ----------
+    labels : ndarray
+        1D array of labels (numbers or strings).
+
+    Returns
+    -------
+    unique_labels : ndarray
+        The sorted unique labels. All NaN labels are grouped together.
+    order : ndarray
+        Positions in ``labels`` sorted by label.
+    bounds : ndarray
+        Array of length ``len(unique_labels) + 1``. The positions with label
+        ``unique_labels[k]`` are ``order[bounds[k]:bounds[k + 1]]``.
+    """
+    order = np.argsort(labels, kind="stable")
+    sorted_labels = labels[order]
+    flag = np.ones(sorted_labels.shape, dtype=bool)
+    flag[1:] = sorted_labels[1:] != sorted_labels[:-1]
+    if sorted_labels.dtype.kind in "fc":
+        nan = np.isnan(sorted_labels)
+        flag[1:] &= ~(nan[1:] & nan[:-1])
+    starts = np.flatnonzero(flag)
+    bounds = np.append(starts, labels.size)
+    return sorted_labels[starts], order, bounds
+
+
 class LabelMapperArrayIndexingError(Exception):
     def __init__(self, message):
         super().__init__(message)
@@ -158,7 +260,104 @@ class _LabelMapper(Model):
         raise NotImplementedError(msg)
 
 
-class LabelMapperArray(_LabelMapper):
+class _RegionIndexMixin:
+    """
+    Adds a cached per-region pixel index to label mappers backed by a 2D mask.
+
+    Subclasses implement ``_label_mask`` and ``_label_mask_shape`` which return
+    the mask as an array and the shape of the mask.
+    """
+
+    _region_index = None
+
+    def _label_mask(self):
+        msg = "Subclasses should implement this method."
+        raise NotImplementedError(msg)
+
+    def _label_mask_shape(self):
+        msg = "Subclasses should implement this method."
+        raise NotImplementedError(msg)
+
+    @property
+    def region_index(self):
+        """
+        Index of the pixels in each region, in compressed sparse row form.
+
+        It is computed from the mask the first time it is used.
+
+        Returns
+        -------
+        labels : ndarray
+            The sorted labels of the regions in the mask.
+        indptr : ndarray
+            Array of length ``len(labels) + 1``. The pixels of region ``labels[k]``
+            are ``indices[indptr[k]:indptr[k + 1]]``.
+        indices : ndarray
+            Flat (C order) indices of the pixels in the mask, grouped by region.
+        """
+        if self._region_index is None:
+            flat = self._label_mask().reshape(-1)
+            positions = np.flatnonzero(flat != self._no_label)
+            labels, order, indptr = _group_by_label(flat[positions])
+            indices = positions[order].astype(
+                _min_int_dtype([0, flat.size]), copy=False
+            )
+            self._region_index = (labels, indptr, indices)
+        return self._region_index
+
+    def region_pixels(self, label):
+        """
+        Return the integer pixel coordinates of a region.
+
+        Parameters
+        ----------
+        label : int or str
+            The region label.
+
+        Returns
+        -------
+        x, y : ndarray
+            The pixel coordinates of all pixels with this label.
+        """
+        labels, indptr, indices = self.region_index
+        k = np.searchsorted(labels, label)
+        if k == labels.size or labels[k] != label:
+            msg = f"Region {label} not found"
+            raise RegionError(msg)
+        nx = self._label_mask_shape()[1]
+        y, x = np.divmod(indices[indptr[k] : indptr[k + 1]].astype(np.intp), nx)
+        return x, y
+
+    @property
+    def region_bounding_boxes(self):
+        """
+        The bounding box of each region.
+
+        Returns
+        -------
+        bounding_boxes : dict
+            {label: ((xmin, xmax), (ymin, ymax))} where the ranges are the
+            inclusive pixel index ranges of the region.
+        """
+        labels, indptr, indices = self.region_index
+        if not labels.size:
+            return {}
+        nx = self._label_mask_shape()[1]
+        y, x = np.divmod(indices.astype(np.intp), nx)
+        starts = indptr[:-1]
+        xmin = np.minimum.reduceat(x, starts)
+        xmax = np.maximum.reduceat(x, starts)
+        ymin = np.minimum.reduceat(y, starts)
+        ymax = np.maximum.reduceat(y, starts)
+        return {
+            label.item(): ((int(x0), int(x1)), (int(y0), int(y1)))
+            for label, x0, x1, y0, y1 in zip(
+                labels, xmin, xmax, ymin, ymax, strict=True
+            )
+        }
+
+
+class LabelMapperArray(_RegionIndexMixin, _LabelMapper):
     """
     Maps array locations to labels.
 
@@ -169,6 +368,11 @@ class LabelMapperArray(_LabelMapper):
         correspond to a label in `~gwcs.selector.RegionsSelector` model.
         For pixels for which the transform is not defined the value should
         be set to 0 or " ".
+        In memory integer arrays are stored using the smallest integer
+        type which holds all labels, but integer labels are returned with
+        the default integer type. Memory mapped arrays and arrays which
+        are lazily loaded from an ASDF file are stored as they are and
+        loaded the first time the mapper is used.
     inputs_mapping : `~astropy.modeling.mappings.Mapping`
         An optional Mapping model to be prepended to the LabelMapper
         with the purpose to filter the inputs or change their order
@@ -189,29 +393,49 @@ class LabelMapperArray(_LabelMapper):
     fittable = False
 
     def __init__(self, mapper, inputs_mapping=None, name=None, **kwargs):
-        if mapper.dtype.type is not np.str_:
-            mapper = np.asanyarray(mapper, dtype=int)
-            _no_label = 0
-        else:
+        if mapper.dtype.type is np.str_:
             _no_label = ""
+        else:
+            if not _is_memory_mapped(mapper):
+                mapper = np.asanyarray(mapper)
+                mapper = mapper.astype(_min_int_dtype(mapper), copy=False)
+            elif mapper.dtype.kind not in "iu":
+                mapper = np.asanyarray(mapper, dtype=int)
+            _no_label = 0
         super().__init__(mapper, _no_label, name=name, **kwargs)
         self.inputs = ("x", "y")
         self.outputs = ("label",)
 
+    @property
+    def mapper(self):
+        if not isinstance(self._mapper, np.ndarray):
+            # Load an array which is lazily loaded from an ASDF file.
+            self._mapper = np.asanyarray(self._mapper)
+        return self._mapper
+
+    def _label_mask(self):
+        return self.mapper
+
+    def _label_mask_shape(self):
+        return self._mapper.shape
+
     def evaluate(self, *args):
         args = tuple([_toindex(a) for a in args])
         try:
-            result = self._mapper[args[::-1]]
+            result = self.mapper[args[::-1]]
         except IndexError as e:
             raise LabelMapperArrayIndexingError(e) from e
-        return result
+        return result.astype(_label_dtype(result.dtype), copy=False)
 
     @classmethod
-    def from_vertices(cls, shape, regions):
+    def from_vertices(cls, shape, regions, executor=None):
         """
         Create a `~gwcs.selector.LabelMapperArray` from
         polygon vertices stores in a dict.
 
+        All polygons are rasterized together from one combined edge table.
+        Where regions overlap the region listed last takes precedence.
+
         Parameters
         ----------
         shape : tuple
@@ -224,6 +448,9 @@ class LabelMapperArray(_LabelMapper):
             counterclockwise direction, the enclosed area is the polygon.
             The last vertex must coincide with the first vertex, minimum
             4 vertices are needed to define a triangle.
+        executor : `concurrent.futures.Executor`, optional
+            If given, independent bands of rows of the mask are filled
+            in parallel using this executor.
 
         Returns
         -------
@@ -243,15 +470,393 @@ class LabelMapperArray(_LabelMapper):
 
         """  # noqa: E501
         labels = np.array(list(regions.keys()))
-        mask = np.zeros(shape, dtype=labels.dtype)
+        if labels.dtype.type is np.str_:
+            mask = np.zeros(shape, dtype=labels.dtype)
+        else:
+            mask = np.zeros(shape, dtype=_min_int_dtype(np.append(labels, 0)))
 
-        for rid, vert in regions.items():
-            pol = region.Polygon(rid, vert)
-            mask = pol.scan(mask)
+        polygons = [region.Polygon(rid, vert) for rid, vert in regions.items()]
+        region._scan_polygons(polygons, mask, executor=executor)
 
         return cls(mask)
 
 
+class LabelMapperRunLength(_RegionIndexMixin, _LabelMapper):
+    """
+    Maps array locations to labels using a run-length encoded mask.
+
+    This is a compressed alternative to `~gwcs.selector.LabelMapperArray`
+    for masks which are mostly unlabeled and where labels form long
+    horizontal runs, e.g. IFU slices or MOS shutters on a detector.
+    Only the runs of labeled pixels are stored.
+
+    Parameters
+    ----------
+    shape : tuple
+        Shape (ny, nx) of the mask.
+    starts : ndarray
+        Flat (C order) index of the first pixel of each run, in increasing order.
+        Runs do not extend past the end of a row.
+    lengths : ndarray
+        Number of pixels in each run.
+    labels : ndarray
+        The label of each run, integers or strings.
+    inputs_mapping : `~astropy.modeling.mappings.Mapping`
+        An optional Mapping model to be prepended to the LabelMapper
+        with the purpose to filter the inputs or change their order
+        so that the output of it is (x, y) values to index the mask.
+    name : str
+        The name of this transform.
+
+    Use case:
+    For an IFU observation, the mask represents the detector and its
+    values correspond to the IFU slice label.
+
+    """
+
+    n_inputs = 2
+    n_outputs = 1
+
+    linear = False
+    fittable = False
+
+    def __init__(
+        self,
+        shape,
+        starts,
+        lengths,
+        labels,
+        *,
+        inputs_mapping=None,
+        name=None,
+        **kwargs,
+    ):
+        starts = np.asarray(starts, dtype=np.int64)
+        lengths = np.asarray(lengths)
+        labels = np.asarray(labels)
+        if not starts.shape == lengths.shape == labels.shape:
+            msg = "starts, lengths and labels must have the same shape."
+            raise ValueError(msg)
+        if np.any(np.diff(starts) <= 0):
+            msg = "Runs must be sorted by their start index."
+            raise ValueError(msg)
+        if labels.dtype.type is np.str_:
+            _no_label = ""
+        else:
+            labels = labels.astype(_min_int_dtype(labels), copy=False)
+            _no_label = 0
+        self._shape = tuple(int(n) for n in shape)
+        self._starts = starts
+        self._lengths = lengths.astype(_min_int_dtype(lengths), copy=False)
+        self._labels = labels
+        mapper = {"starts": starts, "lengths": self._lengths, "labels": labels}
+        super().__init__(mapper, _no_label, inputs_mapping, name=name, **kwargs)
+        self.inputs = ("x", "y")
+        self.outputs = ("label",)
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def starts(self):
+        return self._starts
+
+    @property
+    def lengths(self):
+        return self._lengths
+
+    @property
+    def labels(self):
+        return self._labels
+
+    def evaluate(self, *args):
+        x, y = (_toindex(a) for a in args)
+        ny, nx = self._shape
+        if np.any((x < -nx) | (x >= nx) | (y < -ny) | (y >= ny)):
+            msg = f"Index out of bounds for a mask with shape {self._shape}."
+            raise LabelMapperArrayIndexingError(msg)
+        pos = (y % ny) * nx + (x % nx)
+        result = np.full(
+            pos.shape, self._no_label, dtype=_label_dtype(self._labels.dtype)
+        )
+        if not self._starts.size:
+            return result
+        # Find the last run starting at or before each position.
+        index = np.searchsorted(self._starts, pos, side="right") - 1
+        inside = index >= 0
+        inside[inside] = (
+            pos[inside] < self._starts[index[inside]] + self._lengths[index[inside]]
+        )
+        result[inside] = self._labels[index[inside]]
+        return result
+
+    def _label_mask(self):
+        return self.to_array()
+
+    def _label_mask_shape(self):
+        return self._shape
+
+    def to_array(self):
+        """
+        Decode the runs into a mask array.
+
+        Returns
+        -------
+        mask : ndarray
+            An array with the shape of the mask where the value of the elements
+            is the label. Pixels which are not within any run are set to
+            ``no_label``.
+        """
+        mask = np.full(self._shape, self._no_label, dtype=self._labels.dtype)
+        flat = mask.reshape(-1)
+        lengths = self._lengths.astype(np.intp)
+        run_index = np.repeat(np.arange(lengths.size), lengths)
+        offsets = np.arange(run_index.size) - np.repeat(
+            np.cumsum(lengths) - lengths, lengths
+        )
+        flat[self._starts[run_index] + offsets] = self._labels[run_index]
+        return mask
+
+    @classmethod
+    def from_array(cls, mask, inputs_mapping=None, name=None):
+        """
+        Create a `~gwcs.selector.LabelMapperRunLength` from a mask array.
+
+        Parameters
+        ----------
+        mask : ndarray
+            A 2D array of integers or strings where the values
+            correspond to a label in `~gwcs.selector.RegionsSelector` model.
+            Pixels which do not belong to any region should be set to 0 or "".
+
+        Returns
+        -------
+        mapper : `~gwcs.selector.LabelMapperRunLength`
+            A model which maps (x, y) locations to labels.
+        """
+        mask = np.asanyarray(mask)
+        if mask.ndim != 2:
+            msg = "GWCS currently only supports 2D masks."
+            raise NotImplementedError(msg)
+        no_label = "" if mask.dtype.type is np.str_ else 0
+        flat = mask.reshape(-1)
+        # A run starts at the beginning of each row and wherever the label changes.
+        change = np.ones(flat.shape, dtype=bool)
+        change[1:] = flat[1:] != flat[:-1]
+        change[:: mask.shape[1]] = True
+        starts = np.flatnonzero(change)
+        lengths = np.diff(np.append(starts, flat.size))
+        labels = flat[starts]
+        labeled = labels != no_label
+        return cls(
+            mask.shape,
+            starts[labeled],
+            lengths[labeled],
+            labels[labeled],
+            inputs_mapping=inputs_mapping,
+            name=name,
+        )
+
+    @classmethod
+    def from_vertices(cls, shape, regions, executor=None):
+        """
+        Create a `~gwcs.selector.LabelMapperRunLength` from
+        polygon vertices stored in a dict.
+
+        See `~gwcs.selector.LabelMapperArray.from_vertices` for a
+        description of the parameters.
+
+        Returns
+        -------
+        mapper : `~gwcs.selector.LabelMapperRunLength`
+            A model which maps (x, y) locations to labels.
+        """
+        return cls.from_array(
+            LabelMapperArray.from_vertices(shape, regions, executor=executor).mapper
+        )
+
+
+class LabelMapperPolygons(_LabelMapper):
+    """
+    Maps locations to labels using the region polygons.
+
+    This is an alternative to `~gwcs.selector.LabelMapperArray` which does
+    not rasterize the regions into a mask. The polygons are kept as given,
+    with sub-pixel vertices, and labels are found with an exact even-odd
+    containment test (see `~gwcs.region.Polygon.contains`). A uniform grid
+    over the bounding boxes of the polygons limits the test to the
+    polygons near each location.
+
+    Parameters
+    ----------
+    regions : dict
+        {region_label : list_of_polygon_vertices}
+        The keys in this dictionary should match the region labels
+        in `~gwcs.selector.RegionsSelector`. The last vertex must coincide
+        with the first vertex. Where regions overlap the region listed
+        last takes precedence.
+    inputs_mapping : `~astropy.modeling.mappings.Mapping`
+        An optional Mapping model to be prepended to the LabelMapper
+        with the purpose to filter the inputs or change their order
+        so that the output of it is (x, y) values.
+    name : str
+        The name of this transform.
+
+    """
+
+    n_inputs = 2
+    n_outputs = 1
+
+    linear = False
+    fittable = False
+
+    _chunk_size = 2**16
+
+    def __init__(self, regions, inputs_mapping=None, name=None, **kwargs):
+        polygons = [region.Polygon(rid, vert) for rid, vert in regions.items()]
+        labels = np.array(list(regions.keys()))
+        if labels.dtype.type is np.str_:
+            _no_label = ""
+        else:
+            labels = labels.astype(_min_int_dtype(np.append(labels, 0)), copy=False)
+            _no_label = 0
+        mapper = {
+            rid: pol._exact_vertices for rid, pol in zip(regions, polygons, strict=True)
+        }
+        self._labels = labels
+        self._build_index(polygons)
+        super().__init__(mapper, _no_label, inputs_mapping, name=name, **kwargs)
+        self.inputs = ("x", "y")
+        self.outputs = ("label",)
+
+    @property
+    def labels(self):
+        return self._labels
+
+    def _build_index(self, polygons):
+        """
+        Build the edge table of all polygons and the grid index.
+        """
+        edges = [pol._edges for pol in polygons]
+        self._edge_ptr = np.cumsum([0] + [len(e) for e in edges])
+        edges = np.concatenate(edges) if edges else np.zeros((0, 4))
+        self._edge_start = edges[:, :2]
+        self._edge_y2 = edges[:, 3]
+        # computed as in `~gwcs.region._even_odd`
+        self._edge_slope = (edges[:, 2] - edges[:, 0]) / (edges[:, 3] - edges[:, 1])
+        bounds = np.array(
+            [
+                np.concatenate(
+                    [pol._exact_vertices.min(axis=0), pol._exact_vertices.max(axis=0)]
+                )
+                for pol in polygons
+            ]
+        ).reshape(-1, 4)
+        self._bounds = bounds
+
+        npol = len(polygons)
+        if not npol:
+            self._grid = (0.0, 0.0, 1.0, 1.0, 0, 0)
+            self._cell_ptr = np.zeros(1, dtype=np.intp)
+            self._cell_polygons = np.zeros(0, dtype=np.intp)
+            return
+        # cells of the size of a typical polygon, limited in number
+        origin = bounds[:, :2].min(axis=0)
+        extent = bounds[:, 2:].max(axis=0) - origin
+        size = np.median(bounds[:, 2:] - bounds[:, :2], axis=0)
+        size = np.where(size > 0, size, np.maximum(extent, 1))
+        ncells = np.floor(extent / size) + 1
+        scale = np.sqrt(ncells.prod() / (4 * npol + 64))
+        if scale > 1:
+            size = size * scale
+            ncells = np.floor(extent / size) + 1
+        nx, ny = (int(n) for n in ncells)
+        self._grid = (origin[0], origin[1], size[0], size[1], nx, ny)
+
+        # all (cell, polygon) pairs, in polygon order within each cell
+        ix0, iy0 = self._cell_index(bounds[:, 0], bounds[:, 1])
+        ix1, iy1 = self._cell_index(bounds[:, 2], bounds[:, 3])
+        ix0, ix1 = ix0.clip(0, nx - 1), ix1.clip(0, nx - 1)
+        iy0, iy1 = iy0.clip(0, ny - 1), iy1.clip(0, ny - 1)
+        wx = ix1 - ix0 + 1
+        counts = wx * (iy1 - iy0 + 1)
+        pol = np.repeat(np.arange(npol), counts)
+        k = np.arange(pol.size) - np.repeat(np.cumsum(counts) - counts, counts)
+        cell = (iy0[pol] + k // wx[pol]) * nx + ix0[pol] + k % wx[pol]
+        order, self._cell_ptr = _group_by_index(cell, nx * ny)
+        self._cell_polygons = pol[order]
+
+    def _cell_index(self, x, y):
+        x0, y0, dx, dy, _, _ = self._grid
+        with np.errstate(invalid="ignore"):
+            return (
+                np.floor((x - x0) / dx).astype(np.intp),
+                np.floor((y - y0) / dy).astype(np.intp),
+            )
+
+    def _find_polygons(self, x, y):
+        """
+        Return the index of the (last) polygon containing each point, or -1.
+        """
+        result = np.full(x.shape, -1, dtype=np.intp)
+        _, _, _, _, nx, ny = self._grid
+        finite = np.isfinite(x) & np.isfinite(y)
+        ix, iy = self._cell_index(
+            np.where(finite, x, np.inf), np.where(finite, y, np.inf)
+        )
+        valid = finite & (ix >= 0) & (ix < nx) & (iy >= 0) & (iy < ny)
+        point = np.flatnonzero(valid)
+        cell = iy[point] * nx + ix[point]
+
+        # candidate (point, polygon) pairs
+        counts = self._cell_ptr[cell + 1] - self._cell_ptr[cell]
+        first = np.repeat(self._cell_ptr[cell] - (np.cumsum(counts) - counts), counts)
+        pol = self._cell_polygons[first + np.arange(first.size)]
+        point = np.repeat(point, counts)
+        px = x[point]
+        py = y[point]
+        b = self._bounds[pol]
+        inbox = (px >= b[:, 0]) & (px < b[:, 2]) & (py >= b[:, 1]) & (py < b[:, 3])
+        point, pol, px, py = point[inbox], pol[inbox], px[inbox], py[inbox]
+
+        # even-odd test of all (pair, edge) combinations
+        counts = self._edge_ptr[pol + 1] - self._edge_ptr[pol]
+        pair = np.repeat(np.arange(pol.size), counts)
+        edge = np.repeat(self._edge_ptr[pol] - (np.cumsum(counts) - counts), counts)
+        edge = edge + np.arange(edge.size)
+        ey = py[pair]
+        x1, y1 = self._edge_start[edge].T
+        crosses = (y1 > ey) != (self._edge_y2[edge] > ey)
+        xcross = x1 + (ey - y1) * self._edge_slope[edge]
+        hits = np.bincount(
+            pair, weights=crosses & (px[pair] < xcross), minlength=pol.size
+        )
+        inside = hits % 2 == 1
+        point, pol = point[inside], pol[inside]
+        # pairs are ordered by point and polygon, keep the last polygon
+        last = np.ones(point.shape, dtype=bool)
+        last[:-1] = point[1:] != point[:-1]
+        result[point[last]] = pol[last]
+        return result
+
+    def evaluate(self, *args):
+        x, y = np.broadcast_arrays(*(np.asarray(a, dtype=float) for a in args))
+        shape = x.shape
+        x = x.ravel()
+        y = y.ravel()
+        index = np.empty(x.shape, dtype=np.intp)
+        for start in range(0, x.size, self._chunk_size):
+            chunk = slice(start, start + self._chunk_size)
+            index[chunk] = self._find_polygons(x[chunk], y[chunk])
+        result = np.full(
+            x.shape, self._no_label, dtype=_label_dtype(self._labels.dtype)
+        )
+        found = index >= 0
+        result[found] = self._labels[index[found]]
+        return result.reshape(shape)
+
+
 class LabelMapperDict(_LabelMapper):
     """
     Maps a number to a transform, which when evaluated returns a label.
@@ -294,6 +899,9 @@ class LabelMapperDict(_LabelMapper):
         if not all(m.n_outputs == 1 for m in mapper.values()):
             msg = "All transforms in mapper must have one output."
             raise TypeError(msg)
+        # Sorted key index used to match inputs to keys.
+        self._sorted_keys = sorted(mapper)
+        self._key_values = np.array(self._sorted_keys)
         self._input_units_strict = {key: False for key in self._inputs}
         self._input_units_allow_dimensionless = {key: False for key in self._inputs}
         super().__init__(mapper, _no_label, inputs_mapping, name=name, **kwargs)
@@ -325,28 +933,58 @@ class LabelMapperDict(_LabelMapper):
     def atol(self, val):
         self._atol = val
 
+    def _find_keys(self, values):
+        """
+        Returns the index (in ``_sorted_keys``) of the key matching each value.
+
+        Each value is compared to its nearest key using ``np.isclose`` with
+        ``atol``, as by the lookup of keys before the index was sorted.
+
+        Parameters
+        ----------
+        values : ndarray
+            1D array of values.
+
+        Returns
+        -------
+        index : ndarray
+            Index of the key matching each value, or -1 if there is no match.
+        """
+        keys = self._key_values
+        if not keys.size:
+            return np.full(values.shape, -1)
+        if values.dtype.kind in "iu":
+            # differences of unsigned integers wrap around
+            values = values.astype(float)
+        last = keys.size - 1
+        right = np.searchsorted(keys, values).clip(max=last)
+        left = (right - 1).clip(min=0)
+        use_left = np.abs(values - keys[left]) < np.abs(keys[right] - values)
+        index = np.where(use_left, left, right)
+        index[~np.isclose(keys[index], values, atol=self._atol)] = -1
+        return index
+
     def evaluate(self, *args):
         shape = args[0].shape
-        args = [a.flatten() for a in args]
+        args = [a.ravel() for a in args]
         # if n_inputs > 1, determine which one is to be used as keys
         if self.inputs_mapping is not None:
             keys = self._inputs_mapping.evaluate(*args)
         else:
             keys = args
-        keys = keys.flatten()
+        keys = keys.ravel()
         # create an empty array for the results
         res = np.zeros(keys.shape) + self._no_label
-        # If this is part of a combined transform, some of the inputs
-        # may be NaNs.
-        # Set NaNs to the ``_no_label`` value
-        mapper_keys = list(self.mapper.keys())
-        # Loop over the keys in mapper and compare to inputs.
-        # Find the indices where they are within ``atol``
-        # and evaluate the transform to get the corresponding label.
-        for key in mapper_keys:
-            ind = np.isclose(key, keys, atol=self._atol)
-            inputs = [a[ind] for a in args]
-            res[ind] = self.mapper[key](*inputs)
+        # Find the mapper key within ``atol`` of each input. Inputs which
+        # don't match any key (including NaNs) keep the ``_no_label`` value.
+        index = self._find_keys(keys)
+        order, bounds = _group_by_index(index, len(self._sorted_keys))
+        # Evaluate the transform of each key once on all inputs matching it.
+        for i, key in enumerate(self._sorted_keys):
+            ind = order[bounds[i] : bounds[i + 1]]
+            if ind.size:
+                inputs = [a[ind] for a in args]
+                res[ind] = self.mapper[key](*inputs)
         res.shape = shape
         return res
 
@@ -388,6 +1026,10 @@ class LabelMapperRange(_LabelMapper):
         if self._has_overlapping(np.array(list(mapper.keys()))):
             msg = "Overlapping ranges of values are not supported."
             raise ValueError(msg)
+        # Sorted interval index used to look up the range of each input.
+        self._range_keys = sorted(mapper, key=lambda k: k[0])
+        self._range_starts = np.array([k[0] for k in self._range_keys], dtype=float)
+        self._range_ends = np.array([k[1] for k in self._range_keys], dtype=float)
         self._inputs = inputs
         self._n_inputs = len(inputs)
         _no_label = 0
@@ -459,6 +1101,27 @@ class LabelMapperRange(_LabelMapper):
             return None
         return ind.item()
 
+    def _find_ranges(self, keys):
+        """
+        Returns the index (in ``_range_keys``) of the range holding each key.
+
+        Parameters
+        ----------
+        keys : ndarray
+            1D array of values.
+
+        Returns
+        -------
+        index : ndarray
+            Index of the range holding each value, or -1 if the value
+            is not strictly within any range.
+        """
+        index = np.searchsorted(self._range_starts, keys, side="left") - 1
+        valid = index >= 0
+        valid[valid] = keys[valid] < self._range_ends[index[valid]]
+        index[~valid] = -1
+        return index
+
     def evaluate(self, *args):
         shape = args[0].shape
         args = [a.flatten() for a in args]
@@ -469,24 +1132,16 @@ class LabelMapperRange(_LabelMapper):
         keys = keys.flatten()
         # Define an array for the results.
         res = np.zeros(keys.shape) + self._no_label
-        nan_ind = np.isnan(keys)
-        res[nan_ind] = self._no_label
-        value_ranges = list(self.mapper.keys())
-        # For each tuple in mapper, find the indices of the inputs
-        # which fall within the range it defines.
-        for val_range in value_ranges:
-            temp = keys.copy()
-            temp[nan_ind] = np.nan
-            temp = np.where(
-                np.logical_or(temp <= val_range[0], temp >= val_range[1]), np.nan, temp
-            )
-            ind = ~np.isnan(temp)
-
-            if ind.any():
+        # Find the range each key falls in. Ranges are open intervals,
+        # keys outside all ranges and NaNs get a negative index.
+        index = self._find_ranges(keys)
+        order, bounds = _group_by_index(index, len(self._range_keys))
+        # Evaluate the transform of each range once on all inputs within it.
+        for i, val_range in enumerate(self._range_keys):
+            ind = order[bounds[i] : bounds[i + 1]]
+            if ind.size:
                 inputs = [a[ind] for a in args]
-                res[ind] = self.mapper[tuple(val_range)](*inputs)
-            else:
-                continue
+                res[ind] = self.mapper[val_range](*inputs)
         res.shape = shape
         if len(np.nonzero(res)[0]) == 0:
             warnings.warn(
@@ -518,6 +1173,18 @@ class RegionsSelector(Model):
         Value to be returned if there's no transform defined for the inputs.
     name : str
         The name of this transform.
+    executor : `concurrent.futures.Executor`, optional
+        If set, the transforms of the different regions are evaluated
+        concurrently by submitting them to this executor. The executor
+        is not saved when the model is serialized.
+    stack_transforms : bool, optional
+        If `True`, the transforms of all regions have the same structure
+        and differ only in (scalar) parameter values, not in other
+        attributes such as polynomial domains. All regions are then
+        evaluated in one call of the transform ``evaluate`` method with the
+        parameters of each input's region. This requires transforms which
+        are evaluated element-wise in their parameters and is validated
+        when it is set. It is not saved when the model is serialized.
     """
 
     standard_broadcasting = False
@@ -533,6 +1200,9 @@ class RegionsSelector(Model):
         label_mapper,
         undefined_transform_value=np.nan,
         name=None,
+        *,
+        executor=None,
+        stack_transforms=False,
         **kwargs,
     ):
         self._inputs = inputs
@@ -541,6 +1211,7 @@ class RegionsSelector(Model):
         self._n_outputs = len(outputs)
         self.label_mapper = label_mapper
         self._undefined_transform_value = undefined_transform_value
+        self._executor = executor
         self._selector = selector  # copy.deepcopy(selector)
 
         if " " in selector or 0 in selector:
@@ -551,6 +1222,8 @@ class RegionsSelector(Model):
         super().__init__(n_models=1, name=name, **kwargs)
         # Validate uses_quantity at init time for nicer error message
         _ = self.uses_quantity
+        self._stacked = None
+        self.stack_transforms = stack_transforms
 
     @property
     def uses_quantity(self):
@@ -587,9 +1260,19 @@ class RegionsSelector(Model):
                     "for RegionsSelector to have an inverse."
                 )
                 raise NotImplementedError(msg) from err
-            return self.__class__(
-                self.outputs, self.inputs, transforms_inv, self.label_mapper.inverse
+            inverse = self.__class__(
+                self.outputs,
+                self.inputs,
+                transforms_inv,
+                self.label_mapper.inverse,
+                executor=self._executor,
             )
+            if self.stack_transforms:
+                # The inverse transforms may not be evaluated element-wise
+                # in their parameters.
+                with contextlib.suppress(ValueError):
+                    inverse.stack_transforms = True
+            return inverse
         msg = (
             "The label mapper must have an inverse "
             "for RegionsSelector to have an inverse."
@@ -605,39 +1288,273 @@ class RegionsSelector(Model):
 
         """
         # Get the region labels corresponding to these inputs
-        rids = self.label_mapper(*args).flatten()
+        rids = np.asarray(self.label_mapper(*args)).ravel()
         # Raise an error if all pixels are outside regions
         if (rids == self.label_mapper.no_label).all():
             warnings.warn(
                 "The input positions are not inside any region.", stacklevel=2
             )
 
-        # Create output arrays and set any pixels not within regions to
-        # "undefined_transform_value"
-        no_trans_ind = (rids == self.label_mapper.no_label).nonzero()
-        outputs = [np.empty(rids.shape) for n in range(self.n_outputs)]
-        for out in outputs:
-            out[no_trans_ind] = self.undefined_transform_value
+        # Create output arrays and set any pixels not within regions or
+        # without a transform to "undefined_transform_value"
+        outputs = [
+            np.full(rids.shape, self.undefined_transform_value, dtype=float)
+            for n in range(self.n_outputs)
+        ]
+
+        args = [np.ravel(a) for a in args]
+        if self._stacked is not None:
+            stack_labels = self._stacked[0]
+            region = np.searchsorted(stack_labels, rids).clip(max=stack_labels.size - 1)
+            ind = np.flatnonzero(stack_labels[region] == rids)
+            self._evaluate_stacked(ind, region[ind], [a[ind] for a in args], outputs)
+            return outputs
+
+        # Group the inputs by region in a single pass and compute the
+        # transformations on the contiguous groups.
+        labels, order, bounds = _group_by_label(rids)
+
+        tasks = [
+            (self._selector[rid], order[start:stop])
+            for rid, start, stop in zip(labels, bounds[:-1], bounds[1:], strict=True)
+            if rid in self._selector
+        ]
+        self._evaluate_regions(tasks, lambda ind: [a[ind] for a in args], outputs)
+        return outputs
 
-        # Compute the transformations
-        args = [a.flatten() for a in args]
-        uniq = get_unique_regions(rids)
-
-        for rid in uniq:
-            ind = rids == rid
-            inputs = [a[ind] for a in args]
-            if rid in self._selector:
-                result = self._selector[rid](*inputs)
-            else:
-                # If there's no transform for a label, return np.nan
-                result = [
-                    np.empty(inputs[0].shape) + self._undefined_transform_value
-                    for i in range(self.n_outputs)
-                ]
+    def _evaluate_regions(self, tasks, gather, outputs):
+        """
+        Evaluate the transforms of the regions and scatter the results.
+
+        Parameters
+        ----------
+        tasks : list
+            List of (transform, ind) tuples, where ``ind`` are the positions in
+            the outputs which belong to the region.
+        gather : callable
+            Returns the inputs of the transform given ``ind``.
+        outputs : list of ndarray
+            The 1D output arrays.
+        """
+        if self._executor is None:
+            results = (transform(*gather(ind)) for transform, ind in tasks)
+        else:
+            # The regions are disjoint, so their transforms can be evaluated
+            # concurrently and the results scattered back in any order.
+            futures = [
+                self._executor.submit(transform, *gather(ind))
+                for transform, ind in tasks
+            ]
+            results = (future.result() for future in futures)
+
+        for (_, ind), result in zip(tasks, results, strict=True):
+            if self.n_outputs == 1:
+                outputs[0][ind] = result
+                continue
             for j in range(self.n_outputs):
                 outputs[j][ind] = result[j]
+
+    def _evaluate_stacked(self, ind, region, inputs, outputs):
+        """
+        Evaluate the stacked transforms and scatter the results.
+
+        Parameters
+        ----------
+        ind : ndarray
+            Positions in the outputs to be computed.
+        region : ndarray
+            Index of the region of each position in the stacked labels.
+        inputs : list of ndarray
+            The inputs at ``ind``.
+        outputs : list of ndarray
+            The 1D output arrays.
+        """
+        _, transforms, transform = self._stacked
+        # the parameters are gathered on each evaluation, so that changes to
+        # the region transforms are used
+        params = np.array([model.parameters for model in transforms])
+        result = transform.evaluate(*inputs, *params[region].T)
+        if self.n_outputs == 1:
+            outputs[0][ind] = np.ravel(result)
+            return
+        for j in range(self.n_outputs):
+            outputs[j][ind] = result[j]
+
+    def _stack(self):
+        """
+        Stack the parameters of the region transforms.
+
+        Returns
+        -------
+        labels : ndarray
+            The sorted region labels.
+        transforms : list of `~astropy.modeling.Model`
+            The transforms of the regions, in the order of ``labels``.
+        transform : `~astropy.modeling.Model`
+            The transform of the first region, used to evaluate all regions.
+        """
+
+        def structure(transform):
+            nodes = getattr(transform, "traverse_postorder", lambda: [transform])()
+            return [
+                # the inputs fixed by fix_inputs are not parameters
+                tuple((key, np.ravel(value).tolist()) for key, value in node.items())
+                if isinstance(node, dict)
+                else (
+                    type(node),
+                    getattr(node, "op", None),
+                    getattr(node, "mapping", None),
+                    node.n_inputs,
+                    node.n_outputs,
+                    _model_state(node),
+                )
+                for node in nodes
+            ]
+
+        labels = sorted(self._selector)
+        transforms = [self._selector[label] for label in labels]
+        reference = transforms[0]
+        if self.uses_quantity:
+            msg = "Transforms which use quantities can not be stacked."
+            raise ValueError(msg)
+        for transform in transforms:
+            if (
+                transform.param_names != reference.param_names
+                or transform.parameters.size != len(transform.param_names)
+                or structure(transform) != structure(reference)
+            ):
+                msg = (
+                    "Only transforms with the same structure and scalar "
+                    "parameters can be stacked."
+                )
+                raise ValueError(msg)
+        stacked = (
+            np.array(labels),
+            transforms,
+            reference,
+        )
+
+        # Check the stacked evaluation matches evaluating each region
+        # transform, which it does not if a transform is not evaluated
+        # element-wise in its parameters.
+        points = np.array([0.5, 3.25, 40.75])
+        region = np.repeat(np.arange(len(labels)), points.size)
+        region_inputs = [points + 0.25 * i for i in range(self.n_inputs)]
+        inputs = [np.tile(a, len(labels)) for a in region_inputs]
+        expected = [[] for n in range(self.n_outputs)]
+        for transform in transforms:
+            result = transform(*region_inputs)
+            if self.n_outputs == 1:
+                result = (result,)
+            for j in range(self.n_outputs):
+                expected[j].extend(result[j])
+        outputs = [np.empty(region.size) for n in range(self.n_outputs)]
+        previous, self._stacked = self._stacked, stacked
+        try:
+            self._evaluate_stacked(np.arange(region.size), region, inputs, outputs)
+        except Exception as err:
+            msg = f"The region transforms can not be evaluated stacked: {err}"
+            raise ValueError(msg) from err
+        finally:
+            self._stacked = previous
+        if not np.allclose(outputs, expected, equal_nan=True):
+            msg = (
+                "The region transforms can not be evaluated stacked, "
+                "they are not evaluated element-wise in their parameters."
+            )
+            raise ValueError(msg)
+        return stacked
+
+    @property
+    def stack_transforms(self):
+        return self._stacked is not None
+
+    @stack_transforms.setter
+    def stack_transforms(self, value):
+        self._stacked = self._stack() if value else None
+
+    def evaluate_mask(self):
+        """
+        Evaluate the transforms on every pixel of the label mapper mask.
+
+        The pixels of each region are taken from the cached
+        ``region_index`` of the label mapper, so only the pixels within
+        regions are evaluated and no label lookup is done.
+        The ``bounding_box`` of this model is not applied.
+
+        Returns
+        -------
+        outputs : ndarray or tuple of ndarray
+            The outputs with the shape of the mask. Pixels which are not
+            within a region are set to ``undefined_transform_value``.
+        """
+        if not isinstance(self.label_mapper, _RegionIndexMixin):
+            msg = (
+                "evaluate_mask requires a label mapper which is "
+                "backed by a mask, e.g. LabelMapperArray."
+            )
+            raise TypeError(msg)
+        if self.n_inputs != 2:
+            msg = "evaluate_mask requires a RegionsSelector with two inputs (x, y)."
+            raise TypeError(msg)
+        shape = self.label_mapper._label_mask_shape()
+        labels, indptr, indices = self.label_mapper.region_index
+        outputs = [
+            np.full(np.prod(shape), self.undefined_transform_value, dtype=float)
+            for n in range(self.n_outputs)
+        ]
+
+        def gather(ind):
+            y, x = np.divmod(ind.astype(np.intp), shape[1])
+            return x.astype(float), y.astype(float)
+
+        if self._stacked is not None:
+            stack_labels = self._stacked[0]
+            label_region = np.searchsorted(stack_labels, labels).clip(
+                max=stack_labels.size - 1
+            )
+            counts = np.diff(indptr)
+            region = np.repeat(label_region, counts)
+            keep = np.repeat(stack_labels[label_region] == labels, counts)
+            ind = indices[keep]
+            self._evaluate_stacked(ind, region[keep], gather(ind), outputs)
+        else:
+            tasks = [
+                (self._selector[rid], indices[start:stop])
+                for rid, start, stop in zip(
+                    labels, indptr[:-1], indptr[1:], strict=True
+                )
+                if rid in self._selector
+            ]
+            self._evaluate_regions(tasks, gather, outputs)
+        outputs = tuple(out.reshape(shape) for out in outputs)
+        if self.n_outputs == 1:
+            return outputs[0]
         return outputs
 
+    def __getstate__(self):
+        # Executors can not be pickled.
+        state = self.__dict__.copy()
+        state["_executor"] = None
+        return state
+
+    def __deepcopy__(self, memo):
+        # Executors can not be copied, the copy shares the same executor.
+        memo[id(self._executor)] = self._executor
+        new = self.__class__.__new__(self.__class__)
+        memo[id(self)] = new
+        for key, value in self.__dict__.items():
+            new.__dict__[key] = copy.deepcopy(value, memo)
+        return new
+
+    @property
+    def executor(self):
+        return self._executor
+
+    @executor.setter
+    def executor(self, value):
+        self._executor = value
+
     @property
     def undefined_transform_value(self):
         return self._undefined_transform_value
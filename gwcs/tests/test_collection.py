@@ -0,0 +1,234 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import numpy as np
+import pytest
+from astropy import coordinates as coord
+from astropy import units as u
+from astropy.modeling import models
+from numpy.testing import assert_allclose, assert_equal
+
+from gwcs import coordinate_frames as cf
+from gwcs import wcs
+from gwcs.collection import StackedWCS, WCSCollection
+from gwcs.wcstools import wcs_from_fiducial
+
+
+def _detector_wcs(shift, angle):
+    forward = (models.Shift(shift) & models.Shift(-shift)) | models.Rotation2D(angle)
+    w = wcs.WCS(
+        forward,
+        input_frame=cf.Frame2D(name="detector"),
+        output_frame=cf.Frame2D(name="focal"),
+    )
+    w.bounding_box = ((0, 100), (0, 50))
+    return w
+
+
+@pytest.fixture
+def detectors():
+    return {f"det{k}": _detector_wcs(10 * k, 30 * k) for k in range(1, 5)}
+
+
+@pytest.mark.parametrize("max_workers", [None, 3])
+def test_pixel_to_world(detectors, max_workers):
+    collection = WCSCollection(detectors, max_workers=max_workers)
+    assert len(collection) == 4
+    assert collection.detector_ids == ["det1", "det2", "det3", "det4"]
+    assert collection["det2"] is detectors["det2"]
+
+    rng = np.random.default_rng(0)
+    det_id = rng.choice(["det1", "det3", "det4"], (20, 30))
+    x, y = rng.uniform(-10, 110, (2, 20, 30))
+    result = collection.pixel_to_world(det_id, x, y)
+
+    expected = np.full((2, 20, 30), np.inf)
+    for name, w in detectors.items():
+        mask = det_id == name
+        expected[:, mask] = w(x[mask], y[mask])
+    assert np.isnan(expected).any()
+    assert_equal(result, expected)
+
+    pixel = collection.world_to_pixel(det_id, *result, with_bounding_box=False)
+    mask = np.isfinite(result[0])
+    assert_allclose(np.array(pixel)[:, mask], np.array([x, y])[:, mask])
+
+    # scalars and broadcasting
+    assert_equal(collection.pixel_to_world("det2", 3, 4), detectors["det2"](3, 4))
+    result = collection.pixel_to_world(["det1", "det2"], 3, [[4], [5]])
+    assert result[0].shape == (2, 2)
+    assert_equal(result[0][1, 0], detectors["det1"](3, 5)[0])
+
+
+def test_sequence_and_quantities(gwcs_2d_quantity_shift):
+    collection = WCSCollection([gwcs_2d_quantity_shift, gwcs_2d_quantity_shift])
+    assert collection.detector_ids == [0, 1]
+    x = np.arange(4) * u.pix
+    result = collection.pixel_to_world([0, 1, 1, 0], x, x)
+    assert_equal(result, gwcs_2d_quantity_shift(x, x))
+
+
+def test_quantity_inputs_keep_units():
+    frame = cf.Frame2D(name="detector", unit=(u.km, u.km))
+    w = wcs.WCS(
+        models.Shift(1 * u.km) & models.Shift(2 * u.km),
+        input_frame=frame,
+        output_frame=cf.Frame2D(name="shifted", unit=(u.km, u.km)),
+    )
+    collection = WCSCollection([w, w])
+    x = np.arange(4) * u.m
+    result = collection.pixel_to_world([0, 1, 1, 0], x, x)
+    assert_allclose(result[0], w(x, x)[0])
+    assert_allclose(result[1], [2, 2.001, 2.002, 2.003] * u.km)
+
+
+def test_errors(detectors, gwcs_1d_freq):
+    collection = WCSCollection(detectors)
+    with pytest.raises(KeyError, match="det7"):
+        collection.pixel_to_world(["det1", "det7"], 1, 2)
+    with pytest.raises(KeyError, match="det0"):
+        collection["det0"]
+    with pytest.raises(ValueError, match="Expected 2 coordinate arrays"):
+        collection.world_to_pixel("det1", 1)
+    with pytest.raises(ValueError, match="same numbers of pixel and world axes"):
+        WCSCollection([detectors["det1"], gwcs_1d_freq])
+    with pytest.raises(ValueError, match="at least one WCS"):
+        WCSCollection({})
+
+
+def _exposure_wcs(lon, lat, angle, scale, matrix=None):
+    if matrix is None:
+        distortion = models.Rotation2D(angle)
+    else:
+        distortion = models.AffineTransformation2D(matrix, translation=[0, 0])
+    forward = (
+        (models.Shift(-50) & models.Shift(-50))
+        | (models.Scale(scale * 1e-3) & models.Scale(scale * 1e-3))
+        | distortion
+        | models.Pix2Sky_TAN()
+        | models.RotateNative2Celestial(lon, lat, 180)
+    )
+    w = wcs.WCS(
+        forward,
+        input_frame=cf.Frame2D(name="detector"),
+        output_frame=cf.CelestialFrame(reference_frame=coord.ICRS(), name="icrs"),
+    )
+    w.bounding_box = ((0, 100), (0, 120))
+    return w
+
+
+def _assert_sky_close(result, expected):
+    assert_equal(np.isnan(result), np.isnan(expected))
+    difference = np.abs(np.subtract(result, expected))
+    difference[0] = np.minimum(difference[0], 360 - difference[0])
+    assert np.nanmax(difference) < 1e-10
+
+
+@pytest.mark.parametrize("affine", [False, True])
+def test_stacked_wcs(affine):
+    rng = np.random.default_rng(1)
+    n = 20
+    wcs_objects = [
+        _exposure_wcs(
+            *args, matrix=rng.normal(0, 1, (2, 2)) + 2 * np.eye(2) if affine else None
+        )
+        for args in zip(
+            rng.uniform(0, 360, n),
+            rng.uniform(-80, 80, n),
+            rng.uniform(0, 360, n),
+            rng.uniform(0.99, 1.01, n),
+            strict=True,
+        )
+    ]
+    stacked = StackedWCS(wcs_objects)
+    assert len(stacked) == n
+    assert stacked[3] is wcs_objects[3]
+
+    exposure = rng.integers(0, n, (30, 40))
+    x, y = rng.uniform(-5, 125, (2, 30, 40))
+    result = stacked.pixel_to_world(exposure, x, y)
+    expected = np.empty((2, 30, 40))
+    for k, w in enumerate(wcs_objects):
+        mask = exposure == k
+        expected[:, mask] = w(x[mask], y[mask])
+    assert np.isnan(expected).any()
+    _assert_sky_close(result, expected)
+
+    pixel = stacked.world_to_pixel(exposure, *result)
+    assert_allclose(np.array(pixel), np.where(np.isnan(result), np.nan, [x, y]))
+    assert_allclose(stacked.world_to_pixel(4, *wcs_objects[4](10, 20)), (10, 20))
+
+
+def test_stacked_wcs_user_inverse():
+    wcs_objects = []
+    for offset in (1, 2, 3):
+        distortion = models.Shift(offset) & models.Shift(-offset)
+        distortion.inverse = models.Shift(-offset + 0.1) & models.Shift(offset)
+        wcs_objects.append(
+            wcs.WCS(
+                distortion | models.Rotation2D(10 * offset),
+                input_frame=cf.Frame2D(name="detector"),
+                output_frame=cf.Frame2D(name="focal"),
+            )
+        )
+    stacked = StackedWCS(wcs_objects)
+    exposure = np.array([2, 0, 1, 2])
+    x = np.arange(4.0)
+    expected = [wcs_objects[k].invert(x[i], x[i]) for i, k in enumerate(exposure)]
+    assert_allclose(np.array(stacked.world_to_pixel(exposure, x, x)).T, expected)
+
+
+def test_stacked_wcs_from_fiducials():
+    rng = np.random.default_rng(2)
+    fiducials = coord.SkyCoord(
+        rng.uniform(0, 360, 10) * u.deg, rng.uniform(-80, 80, 10) * u.deg
+    )
+    kwargs = {
+        "projection": models.Pix2Sky_TAN(),
+        "transform": (models.Shift(-50) & models.Shift(-50))
+        | (models.Scale(1e-3) & models.Scale(1e-3)),
+        "bounding_box": ((0, 100), (0, 100)),
+    }
+    stacked = StackedWCS.from_fiducials(fiducials, **kwargs)
+    assert len(stacked) == 10
+
+    exposure = rng.integers(0, 10, 200)
+    x, y = rng.uniform(-5, 105, (2, 200))
+    result = stacked.pixel_to_world(exposure, x, y)
+    expected = np.empty((2, 200))
+    for k, fiducial in enumerate(fiducials):
+        mask = exposure == k
+        w = wcs_from_fiducial(fiducial, **kwargs)
+        expected[:, mask] = w(x[mask], y[mask])
+        _assert_sky_close(stacked[k](x, y), w(x, y))
+    _assert_sky_close(result, expected)
+
+
+def test_stacked_wcs_errors(gwcs_2d_shift_scale):
+    stacked = StackedWCS([gwcs_2d_shift_scale] * 3)
+    with pytest.raises(IndexError, match=r"in the range \[0, 3\)"):
+        stacked.pixel_to_world([0, 3], 1, 2)
+    with pytest.raises(TypeError, match="must be integers"):
+        stacked.pixel_to_world(1.0, 1, 2)
+    with pytest.raises(ValueError, match="Expected 2 coordinate arrays"):
+        stacked.pixel_to_world(1, 2)
+    with pytest.raises(ValueError, match="made of the same models"):
+        StackedWCS([gwcs_2d_shift_scale, _exposure_wcs(0, 0, 0, 1)])
+    with pytest.raises(ValueError, match="at least one WCS"):
+        StackedWCS([])
+
+
+def test_stacked_wcs_polynomial_domains():
+    wcs_objects = [
+        wcs.WCS(
+            models.Chebyshev1D(1, c0=1, c1=1, domain=domain),
+            input_frame=cf.CoordinateFrame(
+                name="detector", axes_order=(0,), naxes=1, axes_type="detector"
+            ),
+            output_frame=cf.SpectralFrame(name="wave", unit=u.um, axes_order=(0,)),
+        )
+        for domain in [(0, 10), (0, 100)]
+    ]
+    assert_allclose([w(5) for w in wcs_objects], [1, 0.1])
+    with pytest.raises(ValueError, match="made of the same models"):
+        StackedWCS(wcs_objects)
+    stacked = StackedWCS([wcs_objects[1]] * 2)
+    assert_allclose(stacked.pixel_to_world([0, 1], 5), [0.1, 0.1])
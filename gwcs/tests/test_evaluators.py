@@ -0,0 +1,245 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import asyncio
+
+import numpy as np
+import pytest
+from astropy import coordinates as coord
+from astropy import units as u
+from astropy.modeling import Fittable1DModel, Parameter, models
+from numpy.testing import assert_allclose, assert_equal
+
+from gwcs import coordinate_frames as cf
+from gwcs import wcs
+from gwcs.evaluators import AsyncWCSEvaluator, PreparedWCSEvaluator
+
+
+def _count_calls(monkeypatch, wcs, method):
+    calls = []
+    function = getattr(wcs, method)
+
+    def _counted(*args, **kwargs):
+        calls.append(np.size(args[0]))
+        return function(*args, **kwargs)
+
+    monkeypatch.setattr(wcs, method, _counted)
+    return calls
+
+
+def test_async_evaluator(monkeypatch, gwcs_2d_shift_scale):
+    w = gwcs_2d_shift_scale
+    calls = _count_calls(monkeypatch, w, "pixel_to_world_values")
+    evaluator = AsyncWCSEvaluator(w, window=0.01)
+    pixel = np.random.default_rng(0).uniform(0, 100, (100, 2))
+
+    async def _requests():
+        return await asyncio.gather(
+            *(evaluator.pixel_to_world_values(x, y) for x, y in pixel),
+            evaluator.pixel_to_world_values([[1, 2], [3, 4]], 5),
+            evaluator.world_to_pixel_values(10, [20, 30]),
+        )
+
+    *results, array_result, inverse_result = asyncio.run(_requests())
+    assert calls == [104]
+    assert_allclose(results, [w.pixel_to_world_values(x, y) for x, y in pixel])
+    assert np.isscalar(results[0][0])
+    assert_allclose(
+        array_result,
+        w.pixel_to_world_values(*np.broadcast_arrays([[1, 2], [3, 4]], 5)),
+    )
+    assert_allclose(inverse_result, w.world_to_pixel_values([10, 10], [20, 30]))
+
+
+def test_async_evaluator_batches(monkeypatch, gwcs_2d_shift_scale):
+    w = gwcs_2d_shift_scale
+    calls = _count_calls(monkeypatch, w, "pixel_to_world_values")
+    # batches are evaluated when they are full, or flushed, not after the window
+    evaluator = AsyncWCSEvaluator(w, window=1e3, max_batch_size=4)
+
+    async def _requests():
+        tasks = [
+            asyncio.ensure_future(evaluator.pixel_to_world_values(x, x))
+            for x in range(10)
+        ]
+        await asyncio.sleep(0)
+        evaluator.flush()
+        return await asyncio.wait_for(asyncio.gather(*tasks), 10)
+
+    results = asyncio.run(_requests())
+    assert calls == [4, 4, 2]
+    assert_allclose(results, [w.pixel_to_world_values(x, x) for x in range(10)])
+
+
+def test_async_evaluator_errors(monkeypatch, gwcs_2d_shift_scale):
+    w = gwcs_2d_shift_scale
+
+    def _fail(*args):
+        msg = "no inverse"
+        raise NotImplementedError(msg)
+
+    monkeypatch.setattr(w, "world_to_pixel_values", _fail)
+    evaluator = AsyncWCSEvaluator(w, window=0)
+
+    async def _requests():
+        return await asyncio.gather(
+            evaluator.world_to_pixel_values(1, 2),
+            evaluator.world_to_pixel_values(3, 4),
+            return_exceptions=True,
+        )
+
+    results = asyncio.run(_requests())
+    assert all(isinstance(result, NotImplementedError) for result in results)
+    with pytest.raises(ValueError, match="Expected 2 coordinate arrays"):
+        asyncio.run(evaluator.pixel_to_world_values(1))
+    with pytest.raises(ValueError, match="window"):
+        AsyncWCSEvaluator(w, window=-1)
+    with pytest.raises(ValueError, match="max_batch_size"):
+        AsyncWCSEvaluator(w, max_batch_size=0)
+
+
+@pytest.fixture
+def imaging_wcs():
+    forward = (
+        (models.Shift(-50) & models.Shift(-50))
+        | (models.Scale(1e-3) & models.Scale(1e-3))
+        | models.Rotation2D(30)
+        | models.Pix2Sky_TAN()
+        | models.RotateNative2Celestial(5.5, -72, 180)
+    )
+    w = wcs.WCS(
+        forward,
+        input_frame=cf.Frame2D(name="detector"),
+        output_frame=cf.CelestialFrame(reference_frame=coord.ICRS(), name="icrs"),
+    )
+    w.bounding_box = ((-0.5, 99.5), (-0.5, 119.5))
+    return w
+
+
+@pytest.mark.parametrize("with_bounding_box", [True, False])
+def test_prepared_evaluator(imaging_wcs, with_bounding_box):
+    w = imaging_wcs
+    evaluator = w.prepare(with_bounding_box=with_bounding_box, fill_value=-1)
+    assert isinstance(evaluator, PreparedWCSEvaluator)
+    kwargs = {"with_bounding_box": with_bounding_box, "fill_value": -1}
+
+    result = evaluator.pixel_to_world_values(10, 20)
+    assert np.isscalar(result[0])
+    assert_allclose(result, w.pixel_to_world_values(10, 20), rtol=1e-14)
+    assert_allclose(evaluator.world_to_pixel_values(*result), (10, 20))
+
+    x, y = np.random.default_rng(0).uniform(-20, 140, (2, 3, 4))
+    result = evaluator.pixel_to_world_values(x, y)
+    expected = w(x, y, **kwargs)
+    assert (np.array(expected) == -1).any() == with_bounding_box
+    assert_allclose(result, expected, rtol=1e-14)
+    assert_allclose(
+        evaluator.world_to_pixel_values(*result),
+        w.invert(*result, **kwargs),
+        atol=1e-9,
+    )
+
+    # broadcasting and points outside of the footprint
+    result = evaluator.pixel_to_world_values([10, 20], 5)
+    assert_allclose(result, w.pixel_to_world_values([10, 20], [5, 5]), rtol=1e-14)
+    assert_allclose(
+        evaluator.world_to_pixel_values(180, [-72, 0]),
+        w.invert([180, 180], [-72, 0], **kwargs),
+        rtol=1e-12,
+    )
+
+
+def _spectral_wcs():
+    # a dispersion in microns, with world coordinates in nanometers
+    forward = (
+        models.Shift(-10 * u.pix)
+        | models.Multiply(2e-3 * u.um / u.pix)
+        | models.Shift(1.5 * u.um)
+    )
+    return wcs.WCS(
+        forward,
+        input_frame=cf.CoordinateFrame(
+            1, ["PIXEL"], [0], unit=[u.pix], name="detector"
+        ),
+        output_frame=cf.SpectralFrame(unit=u.nm, name="spectral"),
+    )
+
+
+@pytest.mark.parametrize(
+    "name",
+    [
+        "gwcs_simple_imaging_units",
+        "gwcs_2d_shift_scale_quantity",
+        "gwcs_3d_identity_units",
+        "gwcs_stokes_lookup",
+        "spectral",
+    ],
+)
+def test_prepared_evaluator_units(monkeypatch, request, name):
+    w = _spectral_wcs() if name == "spectral" else request.getfixturevalue(name)
+    assert w.forward_transform.uses_quantity
+    evaluator = w.prepare()
+    rng = np.random.default_rng(0)
+    pixel = [rng.uniform(0, 3, (2, 3)) for _ in range(w.pixel_n_dim)]
+    scalar_pixel = [values[0, 0] for values in pixel]
+    world = w.pixel_to_world_values(*pixel)
+    scalar_world = w.pixel_to_world_values(*scalar_pixel)
+    world_arrays = (world,) if w.world_n_dim == 1 else world
+    expected = w.world_to_pixel_values(*world_arrays)
+
+    # the results are identical, without evaluating the transforms of the WCS
+    forward_calls = _count_calls(monkeypatch, w, "_call_forward")
+    backward_calls = _count_calls(monkeypatch, w, "_call_backward")
+    assert_equal(evaluator.pixel_to_world_values(*pixel), world)
+    assert_equal(evaluator.pixel_to_world_values(*scalar_pixel), scalar_world)
+    assert_equal(evaluator.world_to_pixel_values(*world_arrays), expected)
+    assert forward_calls == backward_calls == []
+
+
+def test_prepared_evaluator_fallback(monkeypatch):
+    # models which fail on the test values are evaluated by the WCS
+    w = wcs.WCS(
+        models.Tabular1D([2, 3, 4] * u.pix, [1, 2, 4] * u.um),
+        input_frame=cf.CoordinateFrame(
+            1, ["PIXEL"], [0], unit=[u.pix], name="detector"
+        ),
+        output_frame=cf.SpectralFrame(unit=u.um, name="spectral"),
+    )
+    evaluator = w.prepare(with_bounding_box=False)
+    expected = w.pixel_to_world_values([2.5, 3.5])
+    calls = _count_calls(monkeypatch, w, "_call_forward")
+    assert_equal(evaluator.pixel_to_world_values([2.5, 3.5]), expected)
+    assert calls == [2]
+
+
+class _Turn(Fittable1DModel):
+    # evaluated with the internal value of the angle, in radians
+    angle = Parameter(default=0, getter=np.rad2deg, setter=np.deg2rad)
+
+    @staticmethod
+    def evaluate(x, angle):
+        return x + angle
+
+
+def test_prepared_evaluator_non_finite_test_values():
+    # models after a model which fails on the test values are not verified
+    # on its NaN outputs
+    w = wcs.WCS(
+        models.Tabular1D([2, 3, 4], [1, 2, 4], bounds_error=True) | _Turn(90),
+        input_frame=cf.CoordinateFrame(
+            1, ["PIXEL"], [0], unit=[u.pix], name="detector"
+        ),
+        output_frame=cf.SpectralFrame(unit=u.um, name="spectral"),
+    )
+    evaluator = w.prepare(with_bounding_box=False)
+    assert_allclose(evaluator.pixel_to_world_values(2.5), 1.5 + np.pi / 2)
+    assert_allclose(
+        evaluator.pixel_to_world_values([2.5, 3.5]),
+        w.pixel_to_world_values([2.5, 3.5]),
+    )
+
+
+def test_prepared_evaluator_errors(imaging_wcs):
+    evaluator = imaging_wcs.prepare()
+    with pytest.raises(ValueError, match="Expected 2 pixel arrays"):
+        evaluator.pixel_to_world_values(1)
+    with pytest.raises(ValueError, match="Expected 2 world arrays"):
+        evaluator.world_to_pixel_values(1, 2, 3)
@@ -0,0 +1,166 @@
+# Licensed under a 3-clause BSD style license - see LICENSE.rst
+import numpy as np
+import pytest
+from astropy import coordinates as coord
+from astropy import units as u
+from astropy.modeling import models
+
+from gwcs import coordinate_frames as cf
+from gwcs import wcs
+from gwcs.footprints import WCSFootprintIndex
+
+_SIZE = 100
+
+
+def _imaging_wcs(lon, lat, angle):
+    forward = (
+        (models.Shift(-_SIZE / 2) & models.Shift(-_SIZE / 2))
+        | (models.Scale(1e-3) & models.Scale(1e-3))
+        | models.Rotation2D(angle)
+        | models.Pix2Sky_TAN()
+        | models.RotateNative2Celestial(lon, lat, 180)
+    )
+    w = wcs.WCS(
+        forward,
+        input_frame=cf.Frame2D(name="detector"),
+        output_frame=cf.CelestialFrame(reference_frame=coord.ICRS(), name="icrs"),
+    )
+    w.bounding_box = ((-0.5, _SIZE - 0.5), (-0.5, _SIZE - 0.5))
+    return w
+
+
+def _random_positions(rng, n):
+    # around the origin of longitudes and close to the pole
+    lon = rng.uniform(-0.3, 0.3, n) % 360
+    lat = rng.uniform(-0.3, 0.3, n)
+    lat[: n // 4] = rng.uniform(89.8, 90, n // 4)
+    return lon, lat
+
+
+@pytest.fixture(scope="module")
+def wcs_objects():
+    rng = np.random.default_rng(1)
+    lon, lat = _random_positions(rng, 100)
+    return [
+        _imaging_wcs(*args)
+        for args in zip(lon, lat, rng.uniform(0, 360, len(lon)), strict=True)
+    ]
+
+
+def _contains(w, lon, lat):
+    x, y = w.invert(lon, lat, with_bounding_box=False)
+    return (
+        (x >= -0.5) & (x <= _SIZE - 0.5) & (y >= -0.5) & (y <= _SIZE - 0.5)
+    ) & np.isfinite(x)
+
+
+@pytest.mark.parametrize("level", [None, 0, 5])
+def test_query_points(wcs_objects, level):
+    index = WCSFootprintIndex(wcs_objects, level=level)
+    lon, lat = _random_positions(np.random.default_rng(2), 1000)
+    points, indices = index.query_points(lon, lat)
+    assert np.all(np.diff(points) >= 0)
+
+    expected = np.zeros((len(lon), len(wcs_objects)), dtype=bool)
+    for i, w in enumerate(wcs_objects):
+        expected[:, i] = _contains(w, lon, lat)
+    assert expected.any()
+    result = np.zeros_like(expected)
+    result[points, indices] = True
+    np.testing.assert_array_equal(result, expected)
+
+    points, indices = index.query_points(lon[:10] * u.deg, lat[:10] * u.deg)
+    assert points.max() < 10
+    np.testing.assert_array_equal(result[points, indices], True)
+
+
+def test_query_cone(wcs_objects):
+    index = WCSFootprintIndex(wcs_objects)
+    rng = np.random.default_rng(3)
+    # the distance from the cone centers to the footprints, from the distance
+    # to points along their edges
+    lon, lat = _random_positions(rng, 20)
+    edge = np.linspace(-0.5, _SIZE - 0.5, 400)
+    low, high = np.full_like(edge, -0.5), np.full_like(edge, _SIZE - 0.5)
+    x = np.concatenate([edge, high, edge, low])
+    y = np.concatenate([low, edge, high, edge])
+    distance = np.zeros((len(lon), len(wcs_objects)))
+    for i, w in enumerate(wcs_objects):
+        edge_lon, edge_lat = w(x, y, with_bounding_box=False)
+        separation = coord.angular_separation(
+            np.deg2rad(lon[:, None]),
+            np.deg2rad(lat[:, None]),
+            np.deg2rad(edge_lon),
+            np.deg2rad(edge_lat),
+        )
+        distance[:, i] = np.where(
+            _contains(w, lon, lat), 0, np.rad2deg(separation.min(axis=1))
+        )
+    for k, radius in enumerate(rng.uniform(0, 0.3, len(lon))):
+        expected = distance[k] <= radius
+        # skip the cones which touch a footprint within the sampling error
+        if np.any(np.abs(distance[k] - radius) < 1e-5):
+            continue
+        result = np.zeros_like(expected)
+        result[index.query_cone(lon[k], lat[k], radius)] = True
+        np.testing.assert_array_equal(result, expected)
+
+    result = index.query_cone(lon[0] * u.deg, lat[0] * u.deg, 1 * u.arcmin)
+    np.testing.assert_array_equal(result, index.query_cone(lon[0], lat[0], 1 / 60))
+
+
+def _separated(polygon, other):
+    """
+    Return whether an edge of a convex polygon separates another polygon.
+    """
+    for start, end in zip(polygon, np.roll(polygon, -1, axis=0), strict=True):
+        normal = np.array([start[1] - end[1], end[0] - start[0]])
+        inside = np.sign(np.dot(polygon - start, normal).sum())
+        if np.all(inside * np.dot(other - start, normal) < 0):
+            return True
+    return False
+
+
+@pytest.fixture(scope="module")
+def expected_overlaps(wcs_objects):
+    # the edges of the footprints are straight lines in the pixel coordinates
+    # of any gnomonic projection
+    corners = np.array([[-0.5, -0.5], [-0.5, 99.5], [99.5, 99.5], [99.5, -0.5]])
+    centers = np.deg2rad([w(49.5, 49.5) for w in wcs_objects]).T
+    separation = coord.angular_separation(*centers[:, :, None], *centers[:, None, :])
+    expected = set()
+    for i, j in zip(*np.nonzero(separation < np.deg2rad(0.15)), strict=True):
+        if i >= j:
+            continue
+        other = wcs_objects[j](*corners.T, with_bounding_box=False)
+        other = np.array(wcs_objects[i].invert(*other, with_bounding_box=False)).T
+        if not _separated(corners, other) and not _separated(other, corners):
+            expected.add((i, j))
+    return expected
+
+
+@pytest.mark.parametrize("level", [None, 0, 5])
+def test_overlaps(wcs_objects, expected_overlaps, level):
+    index = WCSFootprintIndex(wcs_objects, level=level)
+    first, second = index.overlaps()
+    assert np.all(first < second)
+    assert len(first)
+    assert set(zip(first.tolist(), second.tolist(), strict=True)) == expected_overlaps
+
+
+def test_empty_and_invalid():
+    index = WCSFootprintIndex([])
+    assert len(index) == 0
+    points, indices = index.query_points([1, 2], [3, 4])
+    assert len(points) == len(indices) == 0
+    assert len(index.query_cone(1, 2, 3)) == 0
+    assert all(len(pairs) == 0 for pairs in index.overlaps())
+
+    w = wcs.WCS(
+        models.Shift(np.nan) & models.Shift(1),
+        input_frame=cf.Frame2D(name="detector"),
+        output_frame=cf.Frame2D(name="world"),
+    )
+    w.bounding_box = ((0, 10), (0, 10))
+    with pytest.raises(ValueError, match="WCS 1 is not a valid celestial polygon"):
+        WCSFootprintIndex([_imaging_wcs(0, 0, 0), w])
@@ -3,7 +3,9 @@
 Test regions
 """
 
+import pickle
 import warnings
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
 import numpy as np
 import pytest
@@ -88,6 +90,66 @@ def test_polygon_zero_width_bbox():
     assert not np.any(mask)
 
 
+def test_polygon_outside_image():
+    # spans of the polygon left of the image are clipped
+    vert = [(-2, 1), (-1, 5), (2, 6), (-1, 8), (-4, 4), (-2, 1)]
+    pol = region.Polygon("1", vert)
+    mask = np.zeros((9, 9), dtype=int)
+    mask = pol.scan(mask)
+    expected = np.zeros((9, 9), dtype=int)
+    expected[:, :5] = polygon1()[:, 4:]
+    assert_equal(mask, expected)
+
+
+def test_polygon_spans():
+    vert = [(2, 1), (3, 5), (6, 6), (3, 8), (0, 4), (2, 1)]
+    pol = region.Polygon(1, vert)
+    y, xstart, xend = pol._spans()
+    mask = np.zeros((9, 9), dtype=int)
+    for row, x0, x1 in zip(y, xstart, xend, strict=True):
+        mask[row, x0 : x1 + 1] = 1
+    assert_equal(mask, polygon1())
+    mask = region.Polygon("S1", vert).scan(np.zeros((9, 9), dtype="<U2"))
+    assert_equal(mask == "S1", polygon1() == 1)
+
+
+def test_polygon_contains():
+    # a concave "L" shaped polygon with sub-pixel vertices
+    vert = [(0, 0), (4.5, 0), (4.5, 1.5), (1.5, 1.5), (1.5, 4), (0, 4), (0, 0)]
+    pol = region.Polygon("1", vert)
+    x = np.array([0.5, 3, 3, 1, 1, 4.5, 0, -0.1, 2])
+    y = np.array([0.5, 1, 2, 3, 4, 1, 0, 1, 1.5])
+    expected = [True, True, False, True, False, False, True, False, False]
+    assert_equal(pol.contains(x, y), expected)
+    assert_equal(pol.contains(x.reshape(3, 3), y.reshape(3, 3)).shape, (3, 3))
+    assert (3, 1) in pol
+    assert (3, 2) not in pol
+    assert pol.contains(np.nan, 1) is False
+
+
+def test_polygon_contains_shared_edge():
+    # points on a shared edge belong to exactly one polygon
+    left = region.Polygon(1, [(0, 0), (1, 0), (1, 1), (0, 1), (0, 0)])
+    right = region.Polygon(2, [(1, 0), (2, 0), (2, 1), (1, 1), (1, 0)])
+    y = np.linspace(0, 0.99, 10)
+    assert_equal(left.contains(1, y) ^ right.contains(1, y), True)
+
+
+def test_region_contains_not_implemented():
+    # subclasses written before Region.contains existed still work
+    class Box(region.Region):
+        def __contains__(self, px):
+            return True
+
+        def scan(self, mask):
+            return mask
+
+    box = Box(1, None)
+    assert (0, 0) in box
+    with pytest.raises(NotImplementedError, match="Box"):
+        box.contains(0, 0)
+
+
 def test_create_mask_two_polygons():
     vertices = {
         1: [[2, 1], [3, 5], [6, 6], [3, 8], [0, 4], [2, 1]],
@@ -98,6 +160,45 @@ def test_create_mask_two_polygons():
     assert_equal(mask.mapper, pol2)
 
 
+@pytest.mark.parametrize("values", [np.arange(1, 201), np.arange(1, 201).astype(str)])
+def test_fill_spans(values):
+    # later spans take precedence where spans overlap
+    rng = np.random.default_rng(0)
+    y = rng.integers(-2, 12, 200)
+    xstart = rng.integers(-5, 15, 200)
+    xend = xstart + rng.integers(-1, 8, 200)
+    data = np.zeros((10, 12), dtype=values.dtype)
+    expected = data.copy()
+    for row, x0, x1, value in zip(y, xstart, xend, values, strict=True):
+        if 0 <= row < 10 and x1 >= 0:
+            expected[row, max(x0, 0) : x1 + 1] = value
+    region._fill_spans(data, y, xstart, xend, values)
+    assert_equal(data, expected)
+
+
+def test_from_vertices_overlap():
+    # later regions take precedence where regions overlap
+    vertices = {
+        2: [[10, 0], [30, 0], [30, 30], [10, 30], [10, 0]],
+        1: [[2, 1], [3, 5], [6, 6], [3, 8], [0, 4], [2, 1]],
+        3: [[-5, 20], [15, 20], [15, 40], [-5, 40], [-5, 20]],
+    }
+    mask = selector.LabelMapperArray.from_vertices((50, 50), vertices)
+    expected = np.zeros((50, 50), dtype=int)
+    for rid, vert in vertices.items():
+        region.Polygon(rid, vert).scan(expected)
+    assert_equal(mask.mapper, expected)
+    assert_equal(mask.mapper[25, 12], 3)
+
+    polygons = [region.Polygon(rid, vert) for rid, vert in vertices.items()]
+    for executor_class in (ThreadPoolExecutor, ProcessPoolExecutor):
+        with executor_class(max_workers=2) as executor:
+            banded = region._scan_polygons(
+                polygons, np.zeros((50, 50), dtype=int), executor=executor, band_rows=7
+            )
+        assert_equal(banded, expected)
+
+
 def create_range_mapper():
     m = []
     for i in np.arange(1, 10) * 0.1:
@@ -153,6 +254,55 @@ def test_LabelMapperDict():
         )
 
 
+def test_LabelMapperDict_grouped_evaluation():
+    dmapper = create_scalar_mapper()
+    sel = selector.LabelMapperDict(
+        ("x", "y"),
+        dmapper,
+        atol=10**-3,
+        inputs_mapping=models.Mapping((0,), n_inputs=2),
+    )
+    rng = np.random.default_rng(2)
+    keys = np.array(list(dmapper))
+    x = rng.choice(keys, size=(15, 20)) + rng.uniform(-2e-3, 2e-3, size=(15, 20))
+    x[0, 0] = np.nan
+    y = rng.uniform(0, 5, size=x.shape)
+    expected = np.zeros(x.shape)
+    for key, transform in dmapper.items():
+        ind = np.isclose(key, x, atol=10**-3)
+        expected[ind] = transform(x[ind], y[ind])
+    result = sel(x, y)
+    assert result.shape == x.shape
+    assert_equal(result, expected)
+    assert result[0, 0] == 0
+
+
+def test_LabelMapperDict_int_keys():
+    dmapper = {1: models.Const1D(10), 3: models.Const1D(30), 7: models.Const1D(70)}
+    sel = selector.LabelMapperDict(
+        ("x",), dmapper, inputs_mapping=models.Mapping((0,), n_inputs=1)
+    )
+    x = np.array([0, 1, 2, 3, 7, 8, 3, 1])
+    assert_equal(sel(x), [0, 10, 0, 30, 70, 0, 30, 10])
+    assert_equal(sel(x.astype(float)), [0, 10, 0, 30, 70, 0, 30, 10])
+    assert_equal(sel(x.astype(np.uint8)), [0, 10, 0, 30, 70, 0, 30, 10])
+
+    # integers are matched with the tolerance of np.isclose, as floats
+    dmapper = {200000: models.Const1D(10), 3: models.Const1D(30)}
+    sel = selector.LabelMapperDict(
+        ("x",), dmapper, inputs_mapping=models.Mapping((0,), n_inputs=1)
+    )
+    x = np.array([200001, 3, 4])
+    assert_equal(sel(x), [10, 30, 0])
+    assert_equal(sel(x), sel(x.astype(float)))
+
+    # a mapper without keys returns no_label
+    sel = selector.LabelMapperDict(
+        ("x",), {}, inputs_mapping=models.Mapping((0,), n_inputs=1)
+    )
+    assert_equal(sel(x), [0, 0, 0])
+
+
 def test_LabelMapperRange():
     sel = create_range_mapper()
     assert sel(6, 2) == 4.2
@@ -163,6 +313,23 @@ def test_LabelMapperRange():
         )
 
 
+def test_LabelMapperRange_grouped_evaluation():
+    lmr = create_range_mapper()
+    rng = np.random.default_rng(1)
+    x = rng.uniform(4, 19, size=(20, 30))
+    # include NaNs and values on the range boundaries
+    x[0, :3] = [np.nan, 4.88, 5.64]
+    y = rng.uniform(0, 5, size=x.shape)
+    expected = np.zeros(x.shape)
+    for (start, end), transform in lmr.mapper.items():
+        ind = (x > start) & (x < end)
+        expected[ind] = transform(x[ind], y[ind])
+    result = lmr(x, y)
+    assert result.shape == x.shape
+    assert_equal(result, expected)
+    assert_equal(result[0, :3], 0)
+
+
 def test_LabelMapper():
     transform = models.Const1D(12.3)
     lm = selector.LabelMapper(inputs=("x", "y"), mapper=transform, inputs_mapping=(1,))
@@ -181,6 +348,92 @@ def test_LabelMapperArray():
     assert_equal(array_mapper(-1, -1), 24)
 
 
+def test_LabelMapperArray_compact_dtype():
+    labels = np.zeros((20, 20), dtype=np.int64)
+    labels[:, 5:10] = 200
+    mapper = selector.LabelMapperArray(labels)
+    assert mapper.mapper.dtype == np.uint8
+    assert_equal(mapper.mapper, labels)
+    assert mapper(7, 3) == 200
+    # labels are returned with the default integer type
+    assert mapper([7, 1], [3, 3]).dtype == int
+    assert mapper.evaluate(np.array(7), np.array(3)).dtype == int
+    for compact in (
+        selector.LabelMapperRunLength.from_array(labels),
+        selector.LabelMapperPolygons({200: [[5, 0], [9, 0], [9, 19], [5, 19], [5, 0]]}),
+    ):
+        assert compact([7, 1], [3, 3]).dtype == int
+        assert_equal(compact([7, 1], [3, 3]), [200, 0])
+
+    mapper = selector.LabelMapperArray(np.array([[-1.0, 0], [300, 2]]))
+    assert mapper.mapper.dtype == np.int32
+    assert_equal(mapper.mapper, [[-1, 0], [300, 2]])
+
+
+def test_LabelMapperArray_memmap(tmp_path):
+    path = tmp_path / "mask.dat"
+    labels = np.memmap(path, dtype=np.int64, mode="w+", shape=(20, 20))
+    labels[:, 5:10] = 2
+    mapper = selector.LabelMapperArray(labels)
+    # Memory mapped masks are not loaded or converted
+    assert mapper.mapper is labels
+    assert mapper(7, 3) == 2
+
+
+def test_LabelMapperRunLength():
+    regions = {
+        1: [[2, 1], [3, 5], [6, 6], [3, 8], [0, 4], [2, 1]],
+        2: [[10, 0], [30, 0], [30, 30], [10, 30], [10, 0]],
+    }
+    array_mapper = selector.LabelMapperArray.from_vertices((301, 301), regions)
+    rle_mapper = selector.LabelMapperRunLength.from_vertices((301, 301), regions)
+    assert_equal(rle_mapper.to_array(), array_mapper.mapper)
+    assert rle_mapper.starts.size == 39
+
+    rng = np.random.default_rng(3)
+    x = rng.uniform(-0.5, 40, size=1000)
+    y = rng.uniform(-0.5, 40, size=1000)
+    assert_equal(rle_mapper(x, y), array_mapper(x, y))
+    assert_equal(rle_mapper(-1, -1), 0)
+    with pytest.raises(selector.LabelMapperArrayIndexingError):
+        rle_mapper(301, 1)
+
+    labels = np.array([["", "a", "a"], ["b", "", "a"]])
+    rle_mapper = selector.LabelMapperRunLength.from_array(labels)
+    assert rle_mapper.no_label == ""
+    assert_equal(rle_mapper.to_array(), labels)
+    assert_equal(rle_mapper([0, 1, 2], [1, 1, 1]), ["b", "", "a"])
+
+
+def test_LabelMapperPolygons():
+    regions = {
+        1: [[0.5, 0.5], [10.2, 0.5], [10.2, 4.7], [0.5, 4.7], [0.5, 0.5]],
+        2: [[2, 6], [12, 6], [7, 15], [2, 6]],
+        # overlaps region 1, listed last so it takes precedence
+        3: [[8, 2], [20, 2], [20, 3], [8, 3], [8, 2]],
+    }
+    mapper = selector.LabelMapperPolygons(regions)
+    x = np.array([0.4, 0.5, 10.1, 10.2, 7, 7, 9, 15, np.nan, 100])
+    y = np.array([1, 1, 4.6, 1, 7, 15, 2.5, 2.5, 1, 1])
+    assert_equal(mapper(x, y), [0, 1, 1, 0, 2, 0, 3, 3, 0, 0])
+
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(-1, 21, (2, 1000))
+    expected = np.zeros(x.shape, dtype=int)
+    for rid, vert in regions.items():
+        expected[region.Polygon(rid, vert).contains(x, y)] = rid
+    assert_equal(mapper(x, y), expected)
+    assert_equal(mapper(x.reshape(20, 50), y.reshape(20, 50)).shape, (20, 50))
+
+    sel = {1: models.Shift(1) & models.Shift(2), 2: models.Scale(2) & models.Scale(3)}
+    rs = selector.RegionsSelector(
+        inputs=("x", "y"), outputs=("a", "b"), selector=sel, label_mapper=mapper
+    )
+    assert_allclose(rs(5, 2), (6, 4))
+    assert_allclose(rs(7, 7), (14, 21))
+    assert_equal(rs(15, 2.5), (np.nan, np.nan))
+
+
 @pytest.mark.filterwarnings("ignore:The input positions are not")
 def test_RegionsSelector():
     labels = np.zeros((10, 10))
@@ -246,6 +499,166 @@ def test_RegionsSelector():
     assert out == (-100, -100)
 
 
+def test_RegionsSelector_grouped_evaluation():
+    labels = np.zeros((40, 50), dtype=int)
+    for i in range(1, 6):
+        labels[:, i * 8 : i * 8 + 5] = i
+    # label 6 has no transform
+    labels[:5, :5] = 6
+    mapper = selector.LabelMapperArray(labels)
+    sel = {
+        i: models.Shift(i) & models.Scale(i) | models.Mapping((0, 1, 0))
+        for i in range(1, 6)
+    }
+    reg_selector = selector.RegionsSelector(
+        inputs=("x", "y"), outputs=("a", "b", "c"), label_mapper=mapper, selector=sel
+    )
+    y, x = np.mgrid[:40, :50]
+    result = reg_selector(x, y)
+    expected = np.full((3, *x.shape), np.nan)
+    for rid, transform in sel.items():
+        ind = labels == rid
+        expected[:, ind] = transform(x[ind], y[ind])
+    assert_equal(result, expected)
+
+
+def test_RegionsSelector_executor():
+    labels = np.zeros((30, 30), dtype=int)
+    for i in range(1, 5):
+        labels[:, i * 6 : i * 6 + 4] = i
+    mapper = selector.LabelMapperArray(labels)
+    sel = {i: models.Shift(i) & models.Scale(i) for i in range(1, 5)}
+    reg_selector = selector.RegionsSelector(
+        inputs=("x", "y"), outputs=("x", "y"), label_mapper=mapper, selector=sel
+    )
+    y, x = np.mgrid[:30, :30]
+    expected = reg_selector(x, y)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        reg_selector.executor = executor
+        assert_equal(reg_selector(x, y), expected)
+
+        # Copies share the executor, pickles drop it.
+        assert reg_selector.copy().executor is executor
+        unpickled = pickle.loads(pickle.dumps(reg_selector))  # noqa: S301
+        assert unpickled.executor is None
+
+        wcs = WCS(forward_transform=reg_selector, output_frame=cf.Frame2D())
+        assert_equal(wcs(x, y), expected)
+
+
+@pytest.mark.parametrize(
+    "mapper_class", [selector.LabelMapperArray, selector.LabelMapperRunLength]
+)
+def test_RegionsSelector_evaluate_mask(mapper_class):
+    labels = np.zeros((30, 40), dtype=int)
+    labels[2:10, 5:30] = 1
+    labels[12:20, 8:35] = 2
+    # label 3 has no transform
+    labels[25:, :3] = 3
+    if mapper_class is selector.LabelMapperArray:
+        mapper = mapper_class(labels)
+    else:
+        mapper = mapper_class.from_array(labels)
+
+    assert_equal(mapper.region_index[0], [1, 2, 3])
+    assert mapper.region_bounding_boxes == {
+        1: ((5, 29), (2, 9)),
+        2: ((8, 34), (12, 19)),
+        3: ((0, 2), (25, 29)),
+    }
+    x, y = mapper.region_pixels(2)
+    assert x.size == 8 * 27
+    assert (labels[y, x] == 2).all()
+    with pytest.raises(gwutils.RegionError):
+        mapper.region_pixels(4)
+
+    sel = {1: models.Shift(1) & models.Scale(2), 2: models.Scale(3) & models.Shift(4)}
+    reg_selector = selector.RegionsSelector(
+        inputs=("x", "y"), outputs=("x", "y"), label_mapper=mapper, selector=sel
+    )
+    y, x = np.mgrid[:30, :40]
+    assert_equal(reg_selector.evaluate_mask(), reg_selector(x, y))
+
+
+def test_RegionsSelector_stack_transforms():
+    labels = np.zeros((30, 40), dtype=int)
+    for i in range(1, 6):
+        labels[i * 5 : i * 5 + 4, 2:38] = i
+    # label 6 has no transform
+    labels[:2, :2] = 6
+    mapper = selector.LabelMapperArray(labels)
+    sel = {
+        i: models.Mapping((0, 1, 0))
+        | models.Shift(i) & models.Scale(i + 1) & models.Polynomial1D(2, c0=i, c2=1)
+        for i in range(1, 6)
+    }
+    reg_selector = selector.RegionsSelector(
+        inputs=("x", "y"), outputs=("a", "b", "c"), label_mapper=mapper, selector=sel
+    )
+    stacked = selector.RegionsSelector(
+        inputs=("x", "y"),
+        outputs=("a", "b", "c"),
+        label_mapper=mapper,
+        selector=sel,
+        stack_transforms=True,
+    )
+    assert stacked.stack_transforms
+    y, x = np.mgrid[:30, :40]
+    assert_allclose(stacked(x, y), reg_selector(x, y))
+    assert_allclose(stacked.evaluate_mask(), reg_selector.evaluate_mask())
+
+    # changes to the parameters of the region transforms are used
+    sel[2][1].offset = 100
+    assert_allclose(stacked(x, y), reg_selector(x, y))
+    assert_allclose(stacked.evaluate_mask(), reg_selector.evaluate_mask())
+
+    sel_inv = {i: models.Shift(i) & models.Scale(i + 1) for i in range(1, 6)}
+    stacked = selector.RegionsSelector(
+        inputs=("x", "y"),
+        outputs=("x", "y"),
+        label_mapper=mapper,
+        selector=sel_inv,
+        stack_transforms=True,
+    )
+    mapper.inverse = mapper.copy()
+    assert stacked.inverse.stack_transforms
+
+    # Different structure
+    sel[5] = models.Mapping((0, 1, 1)) | (
+        models.Shift(1) & models.Scale(1) & models.Polynomial1D(2)
+    )
+    with pytest.raises(ValueError, match="same structure"):
+        reg_selector.stack_transforms = True
+
+    # Differ in attributes which are not parameters
+    for sel in (
+        {
+            i: models.Chebyshev1D(1, c0=0, c1=1, domain=(0, 10 * i)) & models.Shift(i)
+            for i in range(1, 6)
+        },
+        {
+            i: models.fix_inputs(models.Polynomial2D(1, c0_0=i, c1_0=1), {"x": i})
+            & models.Shift(i)
+            for i in range(1, 6)
+        },
+    ):
+        reg_selector = selector.RegionsSelector(
+            inputs=("x", "y"), outputs=("x", "y"), label_mapper=mapper, selector=sel
+        )
+        with pytest.raises(ValueError, match="same structure"):
+            reg_selector.stack_transforms = True
+
+    # Not evaluated element-wise in the parameters
+    sel = {i: models.Rotation2D(i) for i in range(1, 6)}
+    reg_selector = selector.RegionsSelector(
+        inputs=("x", "y"), outputs=("x", "y"), label_mapper=mapper, selector=sel
+    )
+    with pytest.raises(ValueError, match="can not be evaluated stacked"):
+        reg_selector.stack_transforms = True
+    assert not reg_selector.stack_transforms
+
+
 def test_overalpping_ranges():
     """
     Initializing a ``LabelMapperRange`` with overlapping ranges should raise an error.
@@ -9,7 +9,7 @@ from astropy import coordinates as coord
 from astropy import units as u
 from astropy import wcs as astwcs
 from astropy.io import fits
-from astropy.modeling import bind_compound_bounding_box, models
+from astropy.modeling import bind_compound_bounding_box, fitting, models
 from astropy.modeling.bounding_box import ModelBoundingBox
 from astropy.time import Time
 from astropy.utils.introspection import minversion
@@ -22,7 +22,13 @@ from gwcs.examples import gwcs_2d_bad_bounding_box_order
 from gwcs.tests import data
 from gwcs.tests.utils import _gwcs_from_hst_fits_wcs
 from gwcs.utils import CoordinateFrameError
-from gwcs.wcstools import grid_from_bounding_box, wcs_from_fiducial, wcs_from_points
+from gwcs.wcstools import (
+    grid_from_bounding_box,
+    iter_grid_from_bounding_box,
+    pixel_to_pixel,
+    wcs_from_fiducial,
+    wcs_from_points,
+)
 
 data_path = Path(data.__file__).parent.absolute()
 
@@ -439,6 +445,56 @@ def test_grid_from_compound_bounding_box():
         grid_from_bounding_box(model.bounding_box)
 
 
+@pytest.mark.parametrize(
+    ("bbox", "step", "tile_shape"),
+    [
+        ((-0.5, 9.5), 1, 4),
+        (((-1, 9.9), (6.5, 15)), (0.1, 0.5), (5, 30)),
+        (((-0.5, 5.5), (-0.5, 4.5), (0, 3)), 1, (2, 3, 4)),
+    ],
+)
+def test_iter_grid_from_bounding_box(bbox, step, tile_shape):
+    grid = grid_from_bounding_box(bbox, step=step)
+    result = np.full_like(grid, np.nan)
+    for slices, tile in iter_grid_from_bounding_box(bbox, tile_shape, step=step):
+        assert tile.dtype == grid.dtype
+        result[(Ellipsis, *slices)] = tile
+    assert_equal(result, grid)
+
+
+def test_iter_grid_from_compound_bounding_box():
+    model = models.Const2D() & models.Const1D()
+    model.inputs = ("x", "y", "slit_name")
+    bind_compound_bounding_box(
+        model,
+        {(200,): {"x": (-1, 1), "y": (0, 1)}, (300,): {"x": (-2, 2), "y": (0, 2)}},
+        [("slit_name",)],
+        order="F",
+    )
+    grid = grid_from_bounding_box(model.bounding_box, selector=(300,))
+    tiles = list(
+        iter_grid_from_bounding_box(
+            model.bounding_box, 2, selector=(300,), dtype=np.int32
+        )
+    )
+    assert len(tiles) == 6
+    for slices, tile in tiles:
+        assert tile.dtype == np.int32
+        assert_equal(tile, grid[(slice(None), *slices)])
+
+    grid = grid_from_bounding_box(((0, 1), (0, 1)), step=0.5)
+    ((_, tile),) = iter_grid_from_bounding_box(
+        ((0, 1), (0, 1)), 3, step=0.5, dtype=np.float32
+    )
+    assert tile.dtype == np.float32
+    assert_equal(tile, grid)
+
+    with pytest.raises(ValueError, match="not all integers"):
+        next(iter_grid_from_bounding_box(((0, 1), (0, 1)), 3, step=0.5, dtype=int))
+    with pytest.raises(ValueError, match="Invalid tile_shape"):
+        next(iter_grid_from_bounding_box(((0, 1), (0, 1)), (1, 2, 3)))
+
+
 def test_wcs_from_points():
     rng = np.random.default_rng(0)
     hdr = fits.Header.fromtextfile(data_path / "acs.hdr", endcard=False)
@@ -479,6 +535,61 @@ def test_wcs_from_points():
     assert_allclose(newsky.data.lat.deg, dec, atol=10**-6)
 
 
+@pytest.mark.parametrize("polynomial_type", ["polynomial", "chebyshev", "legendre"])
+def test_wcs_from_points_clipping(gwcs_simple_imaging, polynomial_type):
+    rng = np.random.default_rng(1)
+    w = gwcs_simple_imaging
+    y, x = np.mgrid[:2046:30j, :4023:30j]
+    world_coords = w.pixel_to_world(x, y)
+    ra, dec = world_coords.ra.deg, world_coords.dec.deg
+
+    # a few grossly wrong positions
+    bad = rng.random(x.shape) < 0.05
+    x_bad = np.where(bad, x + rng.normal(0, 20, x.shape), x)
+    fit = wcs_from_points(
+        (x_bad, y), world_coords, polynomial_type=polynomial_type, poly_degree=3
+    )
+    assert np.abs(fit(x, y)[0] - ra).max() > 1e-5
+
+    fit = wcs_from_points(
+        (x_bad, y),
+        world_coords,
+        polynomial_type=polynomial_type,
+        poly_degree=3,
+        sigma_clip=3,
+    )
+    assert_allclose(fit(x, y), (ra, dec), atol=1e-8)
+    assert_allclose(fit.invert(ra, dec), (x, y), atol=1e-3)
+
+    # zero weights exclude the points
+    fit = wcs_from_points(
+        (x_bad, y),
+        world_coords,
+        polynomial_type=polynomial_type,
+        poly_degree=3,
+        weights=np.where(bad, 0, 1),
+    )
+    assert_allclose(fit(x, y), (ra, dec), atol=1e-8)
+
+
+def test_wcs_from_points_unscaled(gwcs_simple_imaging):
+    w = gwcs_simple_imaging
+    y, x = np.mgrid[:2046:30j, :4023:30j]
+    world_coords = w.pixel_to_world(x, y)
+
+    # without weights and clipping the coefficients apply to the pixel values
+    fit = wcs_from_points((x, y), world_coords, poly_degree=3)
+    poly_x = fit.forward_transform[1]
+    assert poly_x.x_domain == poly_x.x_window
+    assert poly_x.y_domain == poly_x.y_window
+    projected = (fit.forward_transform[:3] | models.Mapping((0,), n_inputs=2))(x, y)
+    expected = fitting.LinearLSQFitter()(models.Polynomial2D(3), x, y, projected)
+    assert_allclose(poly_x.parameters, expected.parameters, rtol=1e-6, atol=1e-12)
+
+    fit = wcs_from_points((x, y), world_coords, poly_degree=3, weights=1)
+    assert fit.forward_transform[1].x_domain == (0, 4023)
+
+
 def test_grid_from_bounding_box_2():
     bb = ((-0.5, 5.5), (-0.5, 4.5))
     x, y = grid_from_bounding_box(bb)
@@ -1735,3 +1846,347 @@ def test_high_level_objects_in_pipeline_backward(gwcs_with_pipeline_celestial):
         with_units=True,
     )
     assert isinstance(intermediate_world, coord.SkyCoord)
+
+
+@pytest.mark.parametrize(
+    "item",
+    [
+        10,
+        (slice(None), 5),
+        (Ellipsis, 3),
+        (slice(2, 8), slice(3, None), slice(None, 6)),
+        (slice(2, 8), 4, 1),
+        (27, slice(None), slice(1, -1)),
+    ],
+)
+def test_slice(gwcs_3d_galactic_spectral, item):
+    w = gwcs_3d_galactic_spectral
+    sliced = w[item]
+    expected = wcsapi.SlicedLowLevelWCS(w, item)
+    assert sliced.pixel_n_dim == expected.pixel_n_dim
+    assert sliced.pixel_shape == expected.pixel_shape
+
+    pixel = [np.linspace(lower, upper, 5) for lower, upper in sliced.pixel_bounds]
+    world = sliced.pixel_to_world_values(*pixel)
+    assert_allclose(world, expected.pixel_to_world_values(*pixel))
+    assert_allclose(
+        sliced.invert(*np.atleast_1d(world), with_bounding_box=False),
+        np.squeeze(pixel),
+        atol=1e-10,
+    )
+
+
+def test_slice_removes_world_axes(gwcs_spec_cel_time_4d):
+    w = gwcs_spec_cel_time_4d
+    sliced = w[2]
+    assert sliced.pixel_n_dim == 3
+    assert sliced.world_n_dim == 3
+    assert "time" not in sliced.world_axis_physical_types
+    assert_equal(sliced.axis_correlation_matrix, w.axis_correlation_matrix[:3, :3])
+
+    pixel = (1.0, 2.0, 3.0)
+    world = sliced.pixel_to_world_values(*pixel)
+    assert_allclose(world, w.pixel_to_world_values(*pixel, 2.0)[:3])
+    assert_allclose(sliced.world_to_pixel_values(*world), pixel)
+
+    # the celestial axes are only removed together
+    sliced = w[:, :, 5]
+    assert sliced.world_n_dim == 4
+    assert isinstance(sliced.pixel_to_world(1, 2, 3)[1], coord.SkyCoord)
+
+
+def test_slice_bounding_box(gwcs_3d_galactic_spectral):
+    sliced = gwcs_3d_galactic_spectral[10:20, 3:, 3]
+    assert sliced.pixel_shape == (17, 10)
+    assert_equal(sliced.pixel_bounds, ((-0.5, 16.5), (-0.5, 9.5)))
+    assert np.isnan(sliced.pixel_to_world_values(17, 0)).all()
+
+    # negative indices are relative to the pixel shape
+    assert_allclose(
+        gwcs_3d_galactic_spectral[-3, 1:-1].pixel_to_world_values(3, 4),
+        gwcs_3d_galactic_spectral[27, 1:19].pixel_to_world_values(3, 4),
+    )
+
+
+def test_slice_errors(gwcs_3d_galactic_spectral):
+    w = gwcs_3d_galactic_spectral
+    with pytest.raises(ValueError, match="step"):
+        w[::2]
+    with pytest.raises(ValueError, match="all pixel axes"):
+        w[10, 3, 3]
+    with pytest.raises(IndexError, match="out of range"):
+        w[100]
+    with pytest.raises(IndexError, match="Too many indices"):
+        w[1, 1, 1, 1]
+    with pytest.raises(IndexError, match="outside of the bounding box"):
+        w[1]
+
+    w.pixel_shape = None
+    with pytest.raises(IndexError, match="pixel_shape"):
+        w[-1]
+
+
+def test_slice_unsupported_inputs(gwcs_3spectral_orders):
+    # the first transform has an input for the spectral order
+    with pytest.raises(NotImplementedError, match="3 inputs for 2 pixel axes"):
+        gwcs_3spectral_orders[5]
+
+
+@pytest.mark.parametrize("celestial", [True, False])
+def test_slice_without_bounds(celestial):
+    forward = models.Shift(1) & models.Shift(2)
+    output_frame = cf.Frame2D(name="shifted")
+    if celestial:
+        forward |= models.Scale(1e-3) & models.Scale(1e-3)
+        forward |= models.Pix2Sky_TAN() | models.RotateNative2Celestial(5, -72, 180)
+        output_frame = cf.CelestialFrame(reference_frame=coord.ICRS(), name="icrs")
+    w = wcs.WCS(
+        forward, input_frame=cf.Frame2D(name="detector"), output_frame=output_frame
+    )
+    sliced = w[2:8]
+    assert sliced.bounding_box is None
+    world = sliced(3, 4)
+    assert_allclose(world, w(3, 6))
+    assert_allclose(sliced.invert(*world), (3, 4), atol=1e-6)
+
+
+def test_slice_not_iterable(gwcs_3d_galactic_spectral):
+    w = gwcs_3d_galactic_spectral
+    w.pixel_shape = None
+    with pytest.raises(TypeError):
+        iter(w)
+    assert not np.iterable(w)
+
+
+@pytest.mark.parametrize(
+    "example",
+    [
+        "gwcs_2d_spatial_shift",
+        "gwcs_1d_freq",
+        "gwcs_3d_galactic_spectral",
+        "gwcs_spec_cel_time_4d",
+        "gwcs_3d_identity_units",
+    ],
+)
+def test_evaluate_axes(example, request):
+    w = request.getfixturevalue(example)
+    axes = [np.arange(-2.0, 7.0) * (k + 1) for k in range(w.pixel_n_dim)]
+    grid = np.meshgrid(*axes[::-1], indexing="ij")[::-1]
+    assert_equal(w.evaluate_axes(*axes), w(*grid))
+    assert_equal(
+        w.evaluate_axes(*axes, with_bounding_box=False),
+        w(*grid, with_bounding_box=False),
+    )
+
+
+def test_evaluate_axes_separable(gwcs_cube_with_separable_spectral):
+    w, _ = gwcs_cube_with_separable_spectral
+    axes = [np.arange(n) for n in w.pixel_shape]
+    world = w.evaluate_axes(*axes)
+    assert_equal(world, w(*grid_from_bounding_box(w.bounding_box)))
+    # the celestial axes are only computed on the (x, y) plane
+    for value, depends_on_spectral in zip(
+        world, w.axis_correlation_matrix[:, 2], strict=True
+    ):
+        assert (value.strides[0] == 0) != depends_on_spectral
+
+    with pytest.raises(ValueError, match="Expected 3 pixel axes"):
+        w.evaluate_axes(*axes[:2])
+    with pytest.raises(ValueError, match="one dimensional"):
+        w.evaluate_axes(axes[0][None], *axes[1:])
+
+
+def test_evaluate_grid(gwcs_3d_galactic_spectral):
+    w = gwcs_3d_galactic_spectral
+    expected = w(*grid_from_bounding_box(w.bounding_box, step=(1, 2, 3)))
+    assert_equal(w.evaluate_grid(step=(1, 2, 3)), expected)
+
+    result = [np.zeros_like(value) for value in expected]
+    for slices, tile in w.evaluate_grid(step=(1, 2, 3), tile_shape=(4, 5, 6)):
+        assert all(
+            slc.stop - slc.start <= n for slc, n in zip(slices, (4, 5, 6), strict=True)
+        )
+        for value, tile_value in zip(result, tile, strict=True):
+            value[slices] = tile_value
+    assert_equal(result, expected)
+
+    # the grid of the whole data array
+    w.bounding_box = None
+    expected = w(
+        *np.mgrid[: w.pixel_shape[2], : w.pixel_shape[1], : w.pixel_shape[0]][::-1]
+    )
+    assert_equal(w.evaluate_grid(), expected)
+    assert_equal(w.evaluate_grid(shape=w.array_shape), expected)
+
+    w.pixel_shape = None
+    with pytest.raises(ValueError, match="bounding_box or shape"):
+        w.evaluate_grid()
+    with pytest.raises(ValueError, match="Only one of"):
+        w.evaluate_grid(((0, 1), (0, 1), (0, 1)), shape=(2, 2, 2))
+
+
+def test_evaluate_grid_affine_prefix():
+    # the leading shifts and scales are computed on the axes only
+    forward = (models.Shift(1) & models.Shift(2)) | (models.Scale(2) & models.Scale(3))
+    w = wcs.WCS(forward, input_frame="detector", output_frame="world")
+    x, y = w.evaluate_grid(shape=(3, 4))
+    assert x.strides[0] == 0
+    assert y.strides[1] == 0
+    assert_equal((x, y), forward(*np.mgrid[:3, :4][::-1]))
+
+
+def _sky_wcs(lon, lat, angle):
+    forward = (
+        (models.Shift(-30) & models.Shift(-20))
+        | (models.Scale(0.05) & models.Scale(0.05))
+        | models.Rotation2D(angle)
+        | models.Pix2Sky_TAN()
+        | models.RotateNative2Celestial(lon, lat, 180)
+    )
+    return wcs.WCS(
+        forward,
+        input_frame=cf.Frame2D(name="detector"),
+        output_frame=cf.CelestialFrame(reference_frame=coord.ICRS(), name="icrs"),
+    )
+
+
+@pytest.mark.parametrize("max_error", [1e-2, 1e-4, 0])
+def test_pixel_to_pixel(max_error):
+    w_in = _sky_wcs(10, 40, 0)
+    w_out = _sky_wcs(11, 41, 30)
+    w_in.bounding_box = ((4.5, 60), (-0.5, 37.2))
+    expected = w_out.invert(*w_in(*np.mgrid[:50, :70][::-1]))
+
+    result = pixel_to_pixel(w_in, w_out, (50, 70), max_error=max_error, step=16)
+    assert_allclose(result, expected, rtol=0, atol=max_error)
+    assert_equal(np.isnan(result), np.isnan(expected))
+
+    tiles = np.full_like(expected, np.inf)
+    for slices, tile in pixel_to_pixel(
+        w_in, w_out, (50, 70), max_error=max_error, step=16, tile_shape=(20, 32)
+    ):
+        tiles[(slice(None), *slices)] = tile
+    assert_allclose(tiles, expected, rtol=0, atol=max_error)
+
+
+def test_pixel_to_pixel_output_bounding_box():
+    w_in = _sky_wcs(10, 40, 0)
+    w_out = _sky_wcs(11, 41, 30)
+    w_in.bounding_box = ((4.5, 60), (-0.5, 37.2))
+    w_out.bounding_box = ((-0.5, 45), (10, 50))
+    expected = w_out.invert(*w_in(*np.mgrid[:50, :70][::-1]))
+    assert np.isnan(expected).any()
+
+    result = pixel_to_pixel(w_in, w_out, (50, 70), max_error=0, step=16)
+    assert_equal(result, expected)
+
+
+def test_pixel_to_pixel_errors(gwcs_simple_imaging):
+    with pytest.raises(ValueError, match="does not match"):
+        pixel_to_pixel(gwcs_simple_imaging, gwcs_simple_imaging, (10, 10, 10))
+    with pytest.raises(ValueError, match="positive integer"):
+        pixel_to_pixel(gwcs_simple_imaging, gwcs_simple_imaging, (10, 10), step=0.5)
+
+
+def _pointed_wcs(lon, lat, angle):
+    distortion = models.Mapping((0, 1, 0, 1)) | (
+        models.Polynomial2D(2, c1_0=1, c2_0=1e-5, c0_1=1e-3)
+        & models.Polynomial2D(2, c0_1=1, c1_1=-2e-5)
+    )
+    distortion.inverse = models.Mapping((0, 1, 0, 1)) | (
+        models.Polynomial2D(2, c1_0=1, c2_0=-1e-5, c0_1=-1e-3)
+        & models.Polynomial2D(2, c0_1=1, c1_1=2e-5)
+    )
+    pointing = (
+        (models.Scale(1 / 3600) & models.Scale(1 / 3600))
+        | models.Rotation2D(angle)
+        | models.Pix2Sky_TAN()
+        | models.RotateNative2Celestial(lon, lat, 180)
+    )
+    return wcs.WCS(
+        [
+            (cf.Frame2D(name="detector"), distortion),
+            (cf.Frame2D(name="v2v3"), pointing),
+            (cf.CelestialFrame(reference_frame=coord.ICRS(), name="world"), None),
+        ]
+    )
+
+
+@pytest.mark.parametrize(
+    ("pointing", "expected"),
+    [
+        # the sky rotations are combined
+        (
+            (10.01, 40.01, 25),
+            [
+                models.Mapping,
+                models.Polynomial2D,
+                models.Polynomial2D,
+                models.Scale,
+                models.Scale,
+                models.Rotation2D,
+                models.Pix2Sky_TAN,
+                models.RotateNative2Celestial,
+                models.Sky2Pix_TAN,
+                models.Rotation2D,
+                models.Scale,
+                models.Scale,
+                models.Mapping,
+                models.Polynomial2D,
+                models.Polynomial2D,
+            ],
+        ),
+        # the sky rotations and projections cancel, the 2D rotations combine
+        (
+            (10, 40, 30),
+            [
+                models.Mapping,
+                models.Polynomial2D,
+                models.Polynomial2D,
+                models.Scale,
+                models.Scale,
+                models.Rotation2D,
+                models.Scale,
+                models.Scale,
+                models.Mapping,
+                models.Polynomial2D,
+                models.Polynomial2D,
+            ],
+        ),
+    ],
+)
+def test_get_pixel_transform(pointing, expected):
+    w_in = _pointed_wcs(10, 40, 20)
+    w_out = _pointed_wcs(*pointing)
+    transform = w_in.get_pixel_transform(w_out)
+    assert [type(model) for model in transform] == expected
+
+    x, y = np.mgrid[:50:7, :60:9]
+    assert_allclose(
+        transform(x, y),
+        (w_in.forward_transform | w_out.backward_transform)(x, y),
+        atol=1e-8,
+    )
+
+
+def test_get_pixel_transform_common_frames():
+    # everything cancels, and the steps from the common frame to the world are
+    # skipped even when they are not invertible
+    w_in = _pointed_wcs(10, 40, 20)
+    w_out = _pointed_wcs(10, 40, 20)
+    tabular = models.Tabular1D(lookup_table=[0.0, 1.0, 0.0])
+    w_in.insert_frame("world", models.Identity(1) & tabular, cf.Frame2D(name="other"))
+    w_out.insert_frame("world", models.Identity(1) & tabular, cf.Frame2D(name="other"))
+    transform = w_in.get_pixel_transform(w_out)
+    assert isinstance(transform, models.Identity)
+    assert transform.n_inputs == 2
+
+    w_out = _pointed_wcs(10, 40, 20)
+    tabular = models.Tabular1D(lookup_table=[0.0, 1.0, 0.0])
+    w_out.insert_frame("world", models.Identity(1) & tabular, cf.Frame2D(name="other"))
+    with pytest.raises(NotImplementedError, match="backward transform"):
+        w_in.get_pixel_transform(w_out)
+
+    w_out = wcs.WCS(models.Shift(1), input_frame="detector", output_frame="world")
+    with pytest.raises(ValueError, match="numbers of world axes"):
+        w_in.get_pixel_transform(w_out)
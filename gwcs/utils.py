@@ -71,6 +71,23 @@ def _toindex(value):
     return np.asarray(np.floor(np.asarray(value) + 0.5), dtype=int)
 
 
+def _model_state(model):
+    """
+    Return what defines a model besides its type and parameter values.
+
+    These are the units of the parameters and the domains and windows of
+    polynomials, which are not parameters.
+    """
+    ranges = []
+    for name in ("domain", "window", "x_domain", "x_window", "y_domain", "y_window"):
+        value = getattr(model, name, None)
+        ranges.append(None if value is None else tuple(np.ravel(value).tolist()))
+    return (
+        tuple(getattr(model, name).unit for name in model.param_names),
+        tuple(ranges),
+    )
+
+
 def get_values(units, *args):
     """
     Return the values of Quantity objects after optionally converting to units.
@@ -1,6 +1,8 @@
 # Licensed under a 3-clause BSD style license - see LICENSE.rst
+import copy
 import functools
 import itertools
+import numbers
 import sys
 import warnings
 
@@ -12,13 +14,20 @@ from astropy.io import fits
 from astropy.modeling import fix_inputs, projections
 from astropy.modeling.bounding_box import CompoundBoundingBox
 from astropy.modeling.bounding_box import ModelBoundingBox as Bbox
-from astropy.modeling.core import Model
+from astropy.modeling.core import CompoundModel, Model
 from astropy.modeling.models import (
+    AffineTransformation2D,
     Const1D,
+    EulerAngleRotation,
     Identity,
+    Linear1D,
     Mapping,
+    Multiply,
     Polynomial2D,
     RotateCelestial2Native,
+    RotateNative2Celestial,
+    Rotation2D,
+    Scale,
     Shift,
     Sky2Pix_TAN,
 )
@@ -33,8 +42,15 @@ from scipy import linalg, optimize
 from . import coordinate_frames as cf
 from . import utils
 from .api import GWCSAPIMixin
-from .utils import CoordinateFrameError
-from .wcstools import grid_from_bounding_box
+from .utils import CoordinateFrameError, _model_state
+from .wcstools import (
+    _grid_axes,
+    _grid_slices,
+    _tile_slices,
+    _unit_vectors,
+    _vector_to_lonlat,
+    grid_from_bounding_box,
+)
 
 __all__ = ["WCS", "NoConvergence", "Step"]
 
@@ -248,6 +264,67 @@ class WCS(GWCSAPIMixin):
             transforms = [step.transform for step in self._pipeline[from_ind:to_ind]]
         return functools.reduce(lambda x, y: x | y, transforms)
 
+    def get_pixel_transform(self, other):
+        """
+        Return the transform from the input frame of this WCS to that of another.
+
+        The transform is the shortest equivalent of
+        ``self.forward_transform | other.backward_transform``. The steps of
+        both pipelines from a common frame to the world are skipped when their
+        transforms are the same, and where the pipelines differ, a transform
+        followed by the inverse of the same transform is removed and
+        consecutive rotations are combined into one. For example, for two
+        WCSs which differ only in pointing, the result is the distortion of
+        the first WCS, a single sky rotation and the inverse distortion of
+        the second WCS.
+
+        The world coordinates of this WCS are passed to ``other`` as values,
+        so both must use the same world frame. The bounding boxes are not
+        part of the transform.
+
+        Parameters
+        ----------
+        other : `~gwcs.wcs.WCS`
+            The WCS of the output pixel coordinates.
+
+        Returns
+        -------
+        transform : `~astropy.modeling.Model`
+            Transform between the input frames of both WCSs.
+        """
+        if self.forward_transform.n_outputs != other.forward_transform.n_outputs:
+            msg = "The WCS objects have different numbers of world axes."
+            raise ValueError(msg)
+        steps = self._pipeline[:-1]
+        other_steps = other.pipeline[:-1]
+        while (
+            steps
+            and other_steps
+            and steps[-1].frame_name == other_steps[-1].frame_name
+            and _same_model(steps[-1].transform, other_steps[-1].transform)
+        ):
+            steps = steps[:-1]
+            other_steps = other_steps[:-1]
+
+        transforms = []
+        for step in steps:
+            for model in _chain_operands(step.transform):
+                _push_transform(transforms, model)
+        for step in other_steps[::-1]:
+            for model in _chain_operands(step.transform)[::-1]:
+                if transforms and _same_model(transforms[-1], model):
+                    transforms.pop()
+                    continue
+                try:
+                    inverse = model.inverse
+                except NotImplementedError as err:
+                    msg = f"Could not construct backward transform. \n{err}"
+                    raise NotImplementedError(msg) from err
+                _push_transform(transforms, inverse)
+        if not transforms:
+            return Identity(self.forward_transform.n_inputs)
+        return functools.reduce(lambda x, y: x | y, transforms)
+
     def set_transform(self, from_frame, to_frame, transform):
         """
         Set/replace the transform between two coordinate frames.
@@ -437,6 +514,218 @@ class WCS(GWCSAPIMixin):
             return high_level
         return results
 
+    def evaluate_axes(self, *axes, with_bounding_box=True, fill_value=np.nan):
+        """
+        Evaluate the forward transform on the grid spanned by pixel axis values.
+
+        The result is the same as evaluating the WCS on the full grid
+        ``np.meshgrid(*axes[::-1], indexing="ij")[::-1]``, which has the layout
+        of the grids returned by `~gwcs.wcstools.grid_from_bounding_box`.
+        However, world axes which are separable (see `axis_correlation_matrix`)
+        are computed only on the sub-grid of the pixel axes they depend on and
+        broadcast to the full grid. For example, the celestial axes of a cube
+        with an independent spectral axis are computed once for all planes
+        of the cube.
+
+        Parameters
+        ----------
+        axes : 1D array-like
+            The values of each pixel axis, in ``x, y[, z]`` order.
+        with_bounding_box : bool, optional
+             If True(default) values in the result which correspond to
+             any of the inputs being outside the bounding_box are set
+             to ``fill_value``.
+        fill_value : float, optional
+            Output value for inputs outside the bounding_box
+            (default is np.nan).
+
+        Returns
+        -------
+        result : ndarray or tuple of ndarray
+            The world coordinates on the grid, with shape
+            ``(len(axes[-1]), ..., len(axes[0]))``. The arrays are read-only
+            broadcast views unless values had to be set to ``fill_value``.
+        """
+        n_pixel = self.pixel_n_dim
+        if len(axes) != n_pixel:
+            msg = f"Expected {n_pixel} pixel axes, got {len(axes)}."
+            raise ValueError(msg)
+        axes = [np.asanyarray(axis) for axis in axes]
+        if any(axis.ndim != 1 for axis in axes):
+            msg = "The pixel axes must be one dimensional."
+            raise ValueError(msg)
+        shape = tuple(len(axis) for axis in axes[::-1])
+
+        def _along(values, k):
+            # view of 1D values of pixel axis k which broadcasts to the grid
+            return values.reshape(
+                [-1 if i == n_pixel - 1 - k else 1 for i in range(n_pixel)]
+            )
+
+        bounding_box = self.bounding_box
+        if isinstance(bounding_box, CompoundBoundingBox) or 0 in shape:
+            grid = np.meshgrid(*axes[::-1], indexing="ij")[::-1]
+            return self(
+                *grid, with_bounding_box=with_bounding_box, fill_value=fill_value
+            )
+
+        transform = self.forward_transform
+        corr_mat = self.axis_correlation_matrix
+        groups = [
+            (np.flatnonzero(corr_mat[sorted(world_axes)].any(axis=0)), world_axes)
+            for world_axes in _separable_axes_sets(corr_mat)
+        ]
+        # world axes which do not depend on any pixel axis
+        constant = set(range(self.world_n_dim)).difference(*(w for _, w in groups))
+        if constant:
+            groups.append(([], constant))
+
+        world = [None] * self.world_n_dim
+        for pixel_axes, world_axes in groups:
+            # the axes outside the group do not change the outputs of the group
+            sub_shape = [1] * n_pixel
+            for axis in pixel_axes:
+                sub_shape[n_pixel - 1 - axis] = shape[n_pixel - 1 - axis]
+            inputs = [
+                _along(axis, k) if k in pixel_axes else axis[len(axis) // 2]
+                for k, axis in enumerate(axes)
+            ]
+            if transform.uses_quantity or any(
+                isinstance(value, u.Quantity) for value in inputs
+            ):
+                inputs = [np.broadcast_to(v, sub_shape, subok=True) for v in inputs]
+                result = self._call_forward(*inputs, with_bounding_box=False)
+            else:
+                result = _evaluate_broadcast(transform, inputs, sub_shape)
+            if self.world_n_dim == 1:
+                result = (result,)
+            for axis in world_axes:
+                world[axis] = np.broadcast_to(result[axis], shape, subok=True)
+
+        if with_bounding_box and bounding_box is not None:
+            outside = False
+            for k, (axis, (lower, upper)) in enumerate(
+                zip(axes, self.pixel_bounds, strict=True)
+            ):
+                values = axis.value if isinstance(axis, u.Quantity) else axis
+                axis_outside = (values < lower) | (values > upper)
+                if axis_outside.any():
+                    outside = outside | _along(axis_outside, k)
+            if outside is not False:
+                world = [np.where(outside, fill_value, value) for value in world]
+
+        if self.world_n_dim == 1:
+            return world[0]
+        return tuple(world)
+
+    def evaluate_grid(
+        self,
+        bounding_box=None,
+        step=1,
+        *,
+        shape=None,
+        selector=None,
+        tile_shape=None,
+        with_bounding_box=True,
+        fill_value=np.nan,
+    ):
+        """
+        Evaluate the forward transform on a regular grid of pixels.
+
+        The result is the same as ``self(*grid_from_bounding_box(bounding_box,
+        step))`` but the full input grids are never created: the grid is
+        evaluated with `evaluate_axes` from the values along each axis.
+
+        Parameters
+        ----------
+        bounding_box : tuple or `~astropy.modeling.bounding_box.ModelBoundingBox`, optional
+            The pixel region to evaluate, see
+            `~gwcs.wcstools.grid_from_bounding_box`. Defaults to the
+            bounding box of the WCS.
+        step : scalar or tuple
+            Step size for grid in each dimension.  Scalar applies to all dimensions.
+        shape : tuple, optional
+            The shape of the data array, in numpy order. The grid covers all
+            pixels of the data. Used instead of ``bounding_box``, and defaults
+            to the ``array_shape`` if the WCS has no bounding box.
+        selector : tuple, optional
+            The selector of a `~astropy.modeling.bounding_box.CompoundBoundingBox`.
+        tile_shape : tuple, optional
+            If given, the grid is evaluated lazily in tiles of at most this
+            shape (in numpy order), see Returns.
+        with_bounding_box : bool, optional
+             If True(default) values in the result which correspond to
+             any of the inputs being outside the bounding_box are set
+             to ``fill_value``.
+        fill_value : float, optional
+            Output value for inputs outside the bounding_box
+            (default is np.nan).
+
+        Returns
+        -------
+        result : ndarray, tuple of ndarray or generator
+            The world coordinates on the grid. With ``tile_shape``, a generator
+            of ``(slices, result)`` pairs, where ``slices`` is the position of
+            the tile in the full result, in numpy order.
+        """  # noqa: E501
+        if shape is not None:
+            if bounding_box is not None:
+                msg = "Only one of bounding_box and shape can be given."
+                raise ValueError(msg)
+            bounding_box = tuple((-0.5, n - 0.5) for n in shape[::-1])
+        elif bounding_box is None:
+            bounding_box = self.bounding_box
+            if bounding_box is None and self.pixel_shape is not None:
+                bounding_box = tuple((-0.5, n - 0.5) for n in self.pixel_shape)
+            if bounding_box is None:
+                msg = "A bounding_box or shape is needed to evaluate the grid."
+                raise ValueError(msg)
+        axes = _grid_axes(_grid_slices(bounding_box, step, selector=selector))
+        kwargs = {"with_bounding_box": with_bounding_box, "fill_value": fill_value}
+        if tile_shape is None:
+            return self.evaluate_axes(*axes, **kwargs)
+
+        tiles = _tile_slices(tuple(len(axis) for axis in axes[::-1]), tile_shape)
+
+        def _tiles():
+            for slices in tiles:
+                tile = [axis[slc] for axis, slc in zip(axes, slices[::-1], strict=True)]
+                yield slices, self.evaluate_axes(*tile, **kwargs)
+
+        return _tiles()
+
+    def prepare(self, with_bounding_box=True, fill_value=np.nan):
+        """
+        Prepare the WCS for the repeated evaluation of scalars and small arrays.
+
+        The structure of the transforms, the bounding box and the footprint
+        are resolved once, so each evaluation with the returned evaluator only
+        calls the ``evaluate`` methods of the models. The evaluator must be
+        prepared again if the WCS is modified.
+
+        Parameters
+        ----------
+        with_bounding_box : bool, optional
+             If True(default) values in the result which correspond to
+             any of the inputs being outside the bounding_box are set
+             to ``fill_value``.
+        fill_value : float, optional
+            Output value for inputs outside the bounding_box
+            (default is np.nan).
+
+        Returns
+        -------
+        evaluator : `~gwcs.evaluators.PreparedWCSEvaluator`
+            An evaluator with ``pixel_to_world_values`` and
+            ``world_to_pixel_values`` methods.
+        """
+        # evaluators imports this module
+        from .evaluators import PreparedWCSEvaluator  # noqa: PLC0415
+
+        return PreparedWCSEvaluator(
+            self, with_bounding_box=with_bounding_box, fill_value=fill_value
+        )
+
     def _call_forward(
         self,
         *args,
@@ -617,53 +906,59 @@ class WCS(GWCSAPIMixin):
     def outside_footprint(self, world_arrays):
         world_arrays = list(world_arrays)
 
-        axes_types = set(self.output_frame.axes_type)
-        axes_phys_types = self.world_axis_physical_types
-        footprint = self.footprint()
         not_numerical = False
         if utils.is_high_level(world_arrays[0], low_level_wcs=self):
             not_numerical = True
             world_arrays = high_level_objects_to_values(
                 *world_arrays, low_level_wcs=self
             )
-        for axtyp in axes_types:
-            ind = np.asarray(np.asarray(self.output_frame.axes_type) == axtyp)
-
-            for idim, (coordinate, phys) in enumerate(
-                zip(world_arrays, axes_phys_types, strict=False)
-            ):
-                coord = _tofloat(coordinate)
-                if np.asarray(ind).sum() > 1:
-                    axis_range = footprint[:, idim]
+        for idim, min_ax, max_ax, wrapped in self._footprint_ranges():
+            if idim >= len(world_arrays):
+                continue
+            coord = _tofloat(world_arrays[idim])
+            outside = _outside_range(coord, min_ax, max_ax, wrapped)
+            if np.any(outside):
+                if np.isscalar(coord):
+                    coord = np.nan
                 else:
-                    axis_range = footprint
+                    coord[outside] = np.nan
+                world_arrays[idim] = coord
+        if not_numerical:
+            world_arrays = values_to_high_level_objects(
+                *world_arrays, low_level_wcs=self
+            )
+        return world_arrays
+
+    def _footprint_ranges(self):
+        """
+        Return the world ranges of the footprint tested by `outside_footprint`.
+
+        They are the world axis, the bounds of the range, and whether the
+        range wraps at 360 degrees, in the order of the tests.
+        """
+        axes_type = np.asarray(self.output_frame.axes_type)
+        axes_phys_types = self.world_axis_physical_types
+        footprint = self.footprint()
+        ranges = []
+        for axtyp in set(self.output_frame.axes_type):
+            several = (axes_type == axtyp).sum() > 1
+            for idim, phys in enumerate(axes_phys_types):
+                axis_range = footprint[:, idim] if several else footprint
                 min_ax = axis_range.min()
                 max_ax = axis_range.max()
-
-                if (
+                wrapped = (
                     axtyp == "SPATIAL"
                     and str(phys).endswith((".ra", ".lon"))
                     and (max_ax - min_ax) > 180
-                ):
+                )
+                if wrapped:
                     # most likely this coordinate is wrapped at 360
                     d = 0.5 * (min_ax + max_ax)
                     m = axis_range <= d
                     min_ax = axis_range[m].max()
                     max_ax = axis_range[~m].min()
-                    outside = (coord > min_ax) & (coord < max_ax)
-                else:
-                    outside = (coord < min_ax) | (coord > max_ax)
-                if np.any(outside):
-                    if np.isscalar(coord):
-                        coord = np.nan
-                    else:
-                        coord[outside] = np.nan
-                    world_arrays[idim] = coord
-        if not_numerical:
-            world_arrays = values_to_high_level_objects(
-                *world_arrays, low_level_wcs=self
-            )
-        return world_arrays
+                ranges.append((idim, min_ax, max_ax, wrapped))
+        return ranges
 
     def out_of_bounds(self, pixel_arrays, fill_value=np.nan):
         if np.isscalar(pixel_arrays) or self.input_frame.naxes == 1:
@@ -1658,7 +1953,7 @@ class WCS(GWCSAPIMixin):
             bb = bounding_box
 
         all_spatial = all(t.lower() == "spatial" for t in self.output_frame.axes_type)
-        if self.output_frame.naxes == 1:
+        if self.output_frame.naxes == 1 or self.pixel_n_dim == 1:
             if isinstance(bb[0], u.Quantity):
                 bb = np.asarray([b.value for b in bb]) * bb[0].unit
             vertices = (bb,)
@@ -1726,6 +2021,177 @@ class WCS(GWCSAPIMixin):
         new_pipeline.extend(self.pipeline[1:])
         return self.__class__(new_pipeline)
 
+    def __getitem__(self, item):
+        return self.slice(item)
+
+    # indexing slices the WCS, it does not make it a sequence
+    __iter__ = None
+
+    def slice(self, item):
+        """
+        Return a new WCS with a slicing of the pixel axes built into the pipeline.
+
+        Unlike wrapping the WCS in `~astropy.wcs.wcsapi.SlicedLowLevelWCS`,
+        the new WCS evaluates only what the sliced data needs:
+
+        - pixel axes indexed with an integer are dropped and fixed to that
+          value with `~astropy.modeling.fix_inputs`,
+        - pixel axes indexed with a range are shifted by the start of the
+          range with a `~astropy.modeling.models.Shift` and the bounding box
+          is restricted to the range, if all its bounds are then known,
+        - world frames which do not depend on any remaining pixel axis are
+          removed from the output.
+
+        Parameters
+        ----------
+        item : int, slice, Ellipsis or tuple of those
+            The slicing in array (numpy) order, i.e. the reverse of the
+            pixel axes order. Slices must not have a step other than 1.
+            Negative indices require the ``pixel_shape`` to be known, and
+            integer indices must be within the bounding box.
+
+        Returns
+        -------
+        new_wcs : `WCS`
+            The sliced WCS.
+
+        Examples
+        --------
+        >>> from gwcs import examples
+        >>> cube = examples.gwcs_3d_galactic_spectral()
+        >>> image = cube[10]  # fix the third pixel axis
+        >>> image.pixel_n_dim, image.world_n_dim
+        (2, 3)
+        """
+        n_pixel = self.pixel_n_dim
+        item = _sanitize_slices(item, n_pixel)[::-1]
+        pixel_shape = self.pixel_shape
+
+        fixed = {}
+        starts = []
+        ranges = []
+        for axis, slc in enumerate(item):
+            size = None if pixel_shape is None else pixel_shape[axis]
+            if isinstance(slc, slice):
+                start, stop = _slice_limits(slc, size)
+                starts.append(start)
+                ranges.append((slc.start is not None or slc.stop is not None, stop))
+            else:
+                fixed[axis] = _slice_limits(slc, size)
+        kept = [axis for axis in range(n_pixel) if axis not in fixed]
+        if not kept:
+            msg = "Slicing would remove all pixel axes of the WCS."
+            raise ValueError(msg)
+        transform = self.pipeline[0].transform
+        if transform.n_inputs != n_pixel:
+            msg = (
+                f"Slicing is not supported for a WCS whose first transform has "
+                f"{transform.n_inputs} inputs for {n_pixel} pixel axes."
+            )
+            raise NotImplementedError(msg)
+        bounding_box = self.bounding_box
+        if isinstance(bounding_box, CompoundBoundingBox):
+            msg = "Slicing a WCS with a CompoundBoundingBox is not supported."
+            raise NotImplementedError(msg)
+        pixel_bounds = self.pixel_bounds
+        if pixel_bounds is not None:
+            # the sliced WCS could not mark its values as outside of the
+            # bounding box, so the slice is refused
+            for axis, value in fixed.items():
+                lower, upper = pixel_bounds[axis]
+                if not lower <= value <= upper:
+                    msg = (
+                        f"Pixel axis {axis} is fixed to {value}, outside of the "
+                        f"bounding box ({lower}, {upper})."
+                    )
+                    raise IndexError(msg)
+
+        # the input frame and the first transform
+        units = [None] * n_pixel
+        if transform.uses_quantity and not isinstance(self.pipeline[0].frame, str):
+            units = list(self.input_frame.unit)
+
+        def _with_unit(value, axis):
+            return value if units[axis] is None else value * units[axis]
+
+        # fix_inputs does not broadcast the fixed values to the shape of the
+        # other inputs, see _fix_transform_inputs
+        first = _fix_transform_inputs(
+            transform.copy(), {k: _with_unit(v, k) for k, v in fixed.items()}
+        )
+        if any(starts):
+            shifts = [
+                Shift(_with_unit(start, axis)) if start else Identity(1)
+                for start, axis in zip(starts, kept, strict=True)
+            ]
+            first = functools.reduce(lambda x, y: x & y, shifts) | first
+        try:
+            inverse = transform.inverse
+        except NotImplementedError:
+            pass
+        else:
+            if fixed:
+                inverse |= Mapping(tuple(kept), n_inputs=n_pixel)
+            if any(starts):
+                shifts = [
+                    Shift(-_with_unit(start, axis)) if start else Identity(1)
+                    for start, axis in zip(starts, kept, strict=True)
+                ]
+                inverse |= functools.reduce(lambda x, y: x & y, shifts)
+            first.inverse = inverse
+        steps = [Step(_select_frame_axes(self.pipeline[0].frame, kept), first)]
+        steps.extend(Step(step.frame, step.transform) for step in self.pipeline[1:])
+
+        # remove the output frames which do not depend on the remaining pixel axes
+        output_frame = self.pipeline[-1].frame
+        world = _sliced_world_axes(
+            output_frame, self.axis_correlation_matrix[:, kept].any(axis=1)
+        )
+        if len(world) < self.world_n_dim:
+            # the removed world axes only depend on the fixed pixel axes
+            pixel = [fixed.get(axis, 0) for axis in range(n_pixel)]
+            values = self._call_forward(
+                *(_with_unit(v, k) for k, v in enumerate(pixel)),
+                with_bounding_box=False,
+            )
+            last = steps[-2].transform
+            pruned = last | Mapping(tuple(world), n_inputs=last.n_outputs)
+            try:
+                inverse = last.inverse
+            except NotImplementedError:
+                pass
+            else:
+                pruned.inverse = _fix_transform_inputs(
+                    inverse,
+                    {k: v for k, v in enumerate(values) if k not in world},
+                )
+            steps[-2].transform = pruned
+            steps[-1] = Step(_slice_output_frame(output_frame, world), None)
+
+        new_wcs = self.__class__(steps, name=self.name)
+
+        # the bounding box of the remaining pixel axes
+        intervals = []
+        for axis, start, (limited, stop) in zip(kept, starts, ranges, strict=True):
+            lower, upper = -np.inf, np.inf
+            if pixel_bounds is not None:
+                lower, upper = (b - start for b in pixel_bounds[axis])
+            if limited:
+                lower = max(lower, -0.5)
+                if stop is not None:
+                    upper = min(upper, stop - start - 0.5)
+            intervals.append((lower, upper))
+        # astropy does not evaluate a bounding box with quantity inputs, and
+        # the footprint of an unbounded box is not defined
+        if not transform.uses_quantity and np.isfinite(intervals).all():
+            new_wcs.bounding_box = intervals[0] if len(kept) == 1 else tuple(intervals)
+        if pixel_shape is not None:
+            new_wcs.pixel_shape = tuple(
+                len(range(start, pixel_shape[axis] if stop is None else stop))
+                for axis, start, (_, stop) in zip(kept, starts, ranges, strict=True)
+            )
+        return new_wcs
+
     def to_fits_sip(
         self,
         bounding_box=None,
@@ -2326,16 +2792,7 @@ class WCS(GWCSAPIMixin):
 
         # use correlation matrix to find separable axes:
         corr_mat = self.axis_correlation_matrix
-        axes_sets = [set(np.flatnonzero(r)) for r in corr_mat.T]
-
-        k = 0
-        while len(axes_sets) - 1 > k:
-            for m in range(len(axes_sets) - 1, k, -1):
-                if axes_sets[k].isdisjoint(axes_sets[m]):
-                    continue
-                axes_sets[k] = axes_sets[k].union(axes_sets[m])
-                del axes_sets[m]
-            k += 1
+        axes_sets = _separable_axes_sets(corr_mat)
 
         # create a mapping of output axes to input/image axes groups:
         mapping = {k: tuple(np.flatnonzero(r)) for k, r in enumerate(corr_mat)}
@@ -3389,6 +3846,372 @@ def _store_2D_coefficients(hdr, poly_model, coeff_prefix, keeplinear=False):
                 hdr[f"{coeff_prefix}_{i}_{j}"] = getattr(poly_model, f"c{i}_{j}").value
 
 
+def _sanitize_slices(item, ndim):
+    """
+    Expand ``item`` to a list of ``ndim`` integers and slices.
+    """
+    if not isinstance(item, tuple):
+        item = (item,)
+    if sum(slc is Ellipsis for slc in item) > 1:
+        msg = "An index can only have a single ellipsis ('...')."
+        raise IndexError(msg)
+    if Ellipsis in item:
+        ind = item.index(Ellipsis)
+        fill = (slice(None),) * (ndim - len(item) + 1)
+        item = item[:ind] + fill + item[ind + 1 :]
+    if len(item) > ndim:
+        msg = f"Too many indices for a WCS with {ndim} pixel axes."
+        raise IndexError(msg)
+    item = list(item) + [slice(None)] * (ndim - len(item))
+    for slc in item:
+        if isinstance(slc, slice):
+            if slc.step not in (None, 1):
+                msg = "Slicing a WCS with a step other than 1 is not supported."
+                raise ValueError(msg)
+        elif not isinstance(slc, numbers.Integral):
+            msg = f"A WCS can only be sliced with integers and slices, got {slc!r}."
+            raise IndexError(msg)
+    return item
+
+
+def _slice_limits(slc, size):
+    """
+    Resolve an integer index or the start and stop of a slice on an axis.
+
+    ``size`` is the length of the axis, or None if it is not known.
+    A slice stop of None is returned when the size is not known.
+    """
+
+    def _resolve(index):
+        if index >= 0:
+            return index
+        if size is None:
+            msg = "Negative indices require the pixel_shape of the WCS to be known."
+            raise IndexError(msg)
+        return index + size
+
+    if not isinstance(slc, slice):
+        index = _resolve(int(slc))
+        if index < 0 or (size is not None and index >= size):
+            msg = f"Index {slc} is out of range for an axis of size {size}."
+            raise IndexError(msg)
+        return index
+    if size is not None:
+        start, stop, _ = slc.indices(size)
+        return start, max(start, stop)
+    start = 0 if slc.start is None else max(_resolve(slc.start), 0)
+    stop = None if slc.stop is None else max(_resolve(slc.stop), start)
+    return start, stop
+
+
+def _select_frame_axes(frame, axes):
+    """
+    Return a frame with only some of the axes of a frame.
+
+    Parameters
+    ----------
+    frame : `~gwcs.coordinate_frames.CoordinateFrame` or str
+        The frame.
+    axes : list of int
+        The sorted transform axes to keep. Axes of ``frame`` not in ``axes``
+        are removed and the remaining axes are renumbered.
+
+    Returns
+    -------
+    frame : `~gwcs.coordinate_frames.CoordinateFrame` or str or None
+        The frame, or None if it has no axes left. A frame which keeps all its
+        axes is returned with only the axes order changed. Otherwise a
+        `~gwcs.coordinate_frames.CoordinateFrame` with the remaining
+        axes is returned.
+    """
+    if frame is None or isinstance(frame, str):
+        return frame
+    renumber = {axis: k for k, axis in enumerate(axes)}
+    keep = [i for i, axis in enumerate(frame.axes_order) if axis in renumber]
+    if not keep:
+        return None
+    axes_order = tuple(renumber[frame.axes_order[i]] for i in keep)
+    if len(keep) == frame.naxes:
+        if axes_order == frame.axes_order:
+            return frame
+        frame = copy.deepcopy(frame)
+        frame._axes_order = axes_order
+        return frame
+
+    def _select(values):
+        return None if values is None else tuple(values[i] for i in keep)
+
+    prop = frame._prop
+    return cf.CoordinateFrame(
+        naxes=len(keep),
+        axes_type=_select(prop.axes_type),
+        axes_order=axes_order,
+        reference_frame=frame.reference_frame,
+        unit=_select(prop.unit),
+        axes_names=_select(prop.axes_names),
+        name=frame.name,
+        axis_physical_types=_select(prop.axis_physical_types),
+    )
+
+
+def _sliced_world_axes(frame, used):
+    """
+    Return the world axes to keep when the world axes ``used`` remain.
+
+    The axes of a celestial frame can only be kept together, so all of them
+    are kept if any of them is used.
+    """
+    keep = np.asarray(used, dtype=bool).copy()
+    frames = frame.frames if isinstance(frame, cf.CompositeFrame) else [frame]
+    for component in frames:
+        if isinstance(component, cf.CelestialFrame):
+            order = list(component.axes_order)
+            keep[order] = keep[order].any()
+    return [int(axis) for axis in np.flatnonzero(keep)]
+
+
+def _slice_output_frame(frame, world):
+    """
+    Return the output frame with only the axes in ``world``.
+    """
+    if not isinstance(frame, cf.CompositeFrame):
+        return _select_frame_axes(frame, world)
+    frames = [_select_frame_axes(component, world) for component in frame.frames]
+    frames = [component for component in frames if component is not None]
+    if len(frames) == 1:
+        return frames[0]
+    return cf.CompositeFrame(frames, name=frame.name)
+
+
+def _separable_axes_sets(corr_mat):
+    """
+    Group the world axes of an axis correlation matrix into separable sets.
+
+    World axes in a set depend on some common pixel axes (directly or through
+    other world axes of the set), while world axes from different sets depend
+    on disjoint pixel axes. World axes which do not depend on any pixel axis
+    are not in any set.
+
+    Parameters
+    ----------
+    corr_mat : ndarray of bool
+        The ``(world_n_dim, pixel_n_dim)`` axis correlation matrix.
+
+    Returns
+    -------
+    axes_sets : list of set of int
+        The sets of world axes.
+    """
+    axes_sets = [set(np.flatnonzero(r)) for r in corr_mat.T]
+
+    k = 0
+    while len(axes_sets) - 1 > k:
+        for m in range(len(axes_sets) - 1, k, -1):
+            if axes_sets[k].isdisjoint(axes_sets[m]):
+                continue
+            axes_sets[k] = axes_sets[k].union(axes_sets[m])
+            del axes_sets[m]
+        k += 1
+    return axes_sets
+
+
+# Models whose outputs are affine functions of their inputs
+_AFFINE_MODELS = (
+    AffineTransformation2D,
+    Identity,
+    Linear1D,
+    Mapping,
+    Multiply,
+    Rotation2D,
+    Scale,
+    Shift,
+)
+
+
+def _is_affine(model):
+    if isinstance(model, CompoundModel):
+        return (
+            model.op in ("&", "|")
+            and _is_affine(model.left)
+            and _is_affine(model.right)
+        )
+    return isinstance(model, _AFFINE_MODELS) and len(model) == 1
+
+
+_SKY_ROTATIONS = (EulerAngleRotation, RotateCelestial2Native, RotateNative2Celestial)
+def _outside_range(values, low, high, wrapped):
+    """
+    Return where values are outside of a world range of the footprint.
+
+    A wrapped range covers the values below ``low`` and above ``high``.
+    """
+    if wrapped:
+        return (values > low) & (values < high)
+    return (values < low) | (values > high)
+
+
+_STATELESS_MODELS = (Identity, projections.Projection)
+
+
+def _same_model(model, other):
+    """
+    Return whether two models are known to compute the same function.
+
+    Models which are not compared by their parameters, such as lookup tables,
+    are only the same if they are the same object.
+    """
+    if model is other:
+        return True
+    if (
+        type(model) is not type(other)
+        or model.n_inputs != other.n_inputs
+        or model.n_outputs != other.n_outputs
+    ):
+        return False
+    if isinstance(model, CompoundModel):
+        return (
+            model.op != "fix_inputs"
+            and model.op == other.op
+            and _same_model(model.left, other.left)
+            and _same_model(model.right, other.right)
+        )
+    if isinstance(model, Mapping):
+        return model.mapping == other.mapping
+    if not model.param_names:
+        return isinstance(model, _STATELESS_MODELS)
+    return _same_parameters(model, other)
+
+
+def _same_parameters(model, other):
+    """
+    Return whether two models of the same type have the same parameters.
+    """
+    return (
+        model.param_names == other.param_names
+        and np.array_equal(model.parameters, other.parameters)
+        and _model_state(model) == _model_state(other)
+    )
+
+
+def _chain_operands(model):
+    """
+    Return the models chained with ``|`` in ``model``, in evaluation order.
+
+    Unlike `_pipe_operands`, models with a user-supplied inverse are kept
+    whole, so that their inverse is used.
+    """
+    if (
+        isinstance(model, CompoundModel)
+        and model.op == "|"
+        and not model.has_user_inverse
+    ):
+        return _chain_operands(model.left) + _chain_operands(model.right)
+    return [model]
+
+
+def _push_transform(transforms, model):
+    """
+    Append ``model`` to a list of chained ``transforms``.
+
+    A rotation following another rotation is combined with it, and identity
+    transforms are dropped.
+    """
+    if transforms:
+        combined = _combine_rotations(transforms[-1], model)
+        if combined is not None:
+            transforms.pop()
+            model = combined
+    if not isinstance(model, Identity):
+        transforms.append(model)
+
+
+def _combine_rotations(model, other):
+    """
+    Return a single rotation equivalent to ``model | other``, or None.
+    """
+    if (
+        len(model) != 1
+        or len(other) != 1
+        or any(getattr(model, name).unit for name in model.param_names)
+        or any(getattr(other, name).unit for name in other.param_names)
+    ):
+        return None
+    if isinstance(model, Rotation2D) and isinstance(other, Rotation2D):
+        angle = (model.angle.value + other.angle.value) % 360
+        return Identity(2) if angle == 0 else Rotation2D(angle)
+    if isinstance(model, _SKY_ROTATIONS) and isinstance(other, _SKY_ROTATIONS):
+        matrix = _sky_rotation_matrix(other) @ _sky_rotation_matrix(model)
+        if np.allclose(matrix, np.eye(3), rtol=0, atol=1e-12):
+            return Identity(2)
+        # the native pole maps to (lon, lat), the celestial pole has the
+        # native longitude lon_pole
+        lon, lat = _vector_to_lonlat(matrix[:, 2])
+        lon_pole, _ = _vector_to_lonlat(matrix[2])
+        combined = RotateNative2Celestial(lon, lat, lon_pole)
+        if np.allclose(_sky_rotation_matrix(combined), matrix, rtol=0, atol=1e-10):
+            return combined
+    return None
+
+
+def _sky_rotation_matrix(model):
+    """
+    Return the rotation matrix of a rotation of spherical coordinates.
+    """
+    lon, lat = model(np.array([0.0, 90.0, 0.0]), np.array([0.0, 0.0, 90.0]))
+    return _unit_vectors(lon, lat)
+
+
+def _pipe_operands(model):
+    """
+    Return the models chained with ``|`` in ``model``, in evaluation order.
+    """
+    if isinstance(model, CompoundModel) and model.op == "|":
+        return _pipe_operands(model.left) + _pipe_operands(model.right)
+    return [model]
+
+
+def _evaluate_separate(model, inputs):
+    """
+    Evaluate a model made of ``&`` and ``|`` of simple models, leaf by leaf.
+
+    The inputs of each leaf are broadcast against each other only, so an output
+    which depends on a single input keeps the shape of that input.
+    """
+    if isinstance(model, CompoundModel):
+        if model.op == "|":
+            return _evaluate_separate(
+                model.right, _evaluate_separate(model.left, inputs)
+            )
+        n_left = model.left.n_inputs
+        return _evaluate_separate(model.left, inputs[:n_left]) + _evaluate_separate(
+            model.right, inputs[n_left:]
+        )
+    outputs = model(*np.broadcast_arrays(*inputs), with_bounding_box=False)
+    return tuple(outputs) if model.n_outputs > 1 else (outputs,)
+
+
+def _evaluate_broadcast(transform, inputs, shape):
+    """
+    Evaluate a transform on inputs which broadcast to ``shape``.
+
+    The leading affine steps of the transform are evaluated on the inputs as
+    given, so inputs which vary along different axes are only expanded to
+    ``shape`` when they are combined. The rest of the transform is evaluated
+    on read-only views of the results broadcast to ``shape``.
+    """
+    operands = _pipe_operands(transform)
+    n_affine = 0
+    while n_affine < len(operands) and _is_affine(operands[n_affine]):
+        inputs = _evaluate_separate(operands[n_affine], inputs)
+        n_affine += 1
+    inputs = [np.broadcast_to(value, shape) for value in inputs]
+    if n_affine == len(operands):
+        return tuple(inputs) if len(inputs) > 1 else inputs[0]
+    if n_affine:
+        transform = functools.reduce(lambda x, y: x | y, operands[n_affine:])
+    return transform(*inputs, with_bounding_box=False)
+
+
 def _fix_transform_inputs(transform, inputs):
     # This is a workaround to the bug in https://github.com/astropy/astropy/issues/11360
     # Once that bug is fixed, the code below can be replaced with fix_inputs
@@ -1,13 +1,15 @@
 # Licensed under a 3-clause BSD style license - see LICENSE.rst
 import functools
-import warnings
+import itertools
 
 import numpy as np
 from astropy import coordinates as coord
 from astropy import units as u
-from astropy.modeling import fitting, models, projections
+from astropy.modeling import models, projections
 from astropy.modeling.bounding_box import CompoundBoundingBox, ModelBoundingBox
 from astropy.modeling.core import Model
+from astropy.modeling.polynomial import poly_map_domain
+from scipy import linalg
 
 from .coordinate_frames import CelestialFrame, CompositeFrame, Frame2D, SpectralFrame
 from .utils import (
@@ -16,7 +18,13 @@ from .utils import (
     _compute_lon_pole,
 )
 
-__all__ = ["grid_from_bounding_box", "wcs_from_fiducial", "wcs_from_points"]
+__all__ = [
+    "grid_from_bounding_box",
+    "iter_grid_from_bounding_box",
+    "pixel_to_pixel",
+    "wcs_from_fiducial",
+    "wcs_from_points",
+]
 
 
 def wcs_from_fiducial(
@@ -211,6 +219,102 @@ def grid_from_bounding_box(bounding_box, step=1, center=True, selector=None):
     x, y [, z]: ndarray
         Grid of points.
     """  # noqa: E501
+    slices = _grid_slices(bounding_box, step, center, selector)
+    grid = np.mgrid[slices[::-1]][::-1]
+    if len(slices) == 1:
+        return grid[0]
+    return grid
+
+
+def iter_grid_from_bounding_box(
+    bounding_box, tile_shape, step=1, *, center=True, selector=None, dtype=None
+):
+    """
+    Iterate over tiles of the grid of input points from the WCS bounding_box.
+
+    The tiles together make up the grid returned by `grid_from_bounding_box`,
+    but only one tile is in memory at a time.
+
+    Parameters
+    ----------
+    bounding_box : tuple | ~astropy.modeling.bounding_box.ModelBoundingBox | ~astropy.modeling.bounding_box.CompoundBoundingBox
+        The bounding_box of a WCS object, `~gwcs.wcs.WCS.bounding_box`.
+    tile_shape : int or tuple
+        The maximum shape of a tile, in numpy order (the reverse of the
+        bounding box order). An integer applies to all dimensions.
+    step : scalar or tuple
+        Step size for grid in each dimension.  Scalar applies to all dimensions.
+    center : bool
+    selector : tuple | None
+        If selector is set then it must be a selector tuple and bounding_box must
+        be a CompoundBoundingBox.
+    dtype : data-type, optional
+        The data type of the grid points, e.g. ``np.int32`` or ``np.float32``.
+        Defaults to the data type of `grid_from_bounding_box`. An integer type
+        requires all grid points to be integers.
+
+    Yields
+    ------
+    slices : tuple of slice
+        The position of the tile in the grid of `grid_from_bounding_box`, in
+        numpy order: the tile is ``grid[(slice(None), *slices)]``.
+    tile : ndarray
+        The grid points of the tile, in the same layout as
+        `grid_from_bounding_box`.
+
+    Examples
+    --------
+    >>> bb = ((-1, 2.9), (6, 7.5))
+    >>> for slices, tile in iter_grid_from_bounding_box(bb, (2, 3), dtype=int):
+    ...     print(slices, tile[0].tolist(), tile[1].tolist())
+    (slice(0, 2, None), slice(0, 3, None)) [[-1, 0, 1], [-1, 0, 1]] [[6, 6, 6], [7, 7, 7]]
+    (slice(0, 2, None), slice(3, 5, None)) [[2, 3], [2, 3]] [[6, 6], [7, 7]]
+    """  # noqa: E501
+    axes = _grid_axes(_grid_slices(bounding_box, step, center, selector))
+    if dtype is not None:
+        converted = [axis.astype(dtype) for axis in axes]
+        if np.issubdtype(dtype, np.integer) and not all(
+            np.array_equal(axis, value)
+            for axis, value in zip(axes, converted, strict=True)
+        ):
+            msg = f"The grid points are not all integers, cannot use dtype {dtype}."
+            raise ValueError(msg)
+        axes = converted
+    shape = tuple(len(axis) for axis in axes[::-1])
+    for slices in _tile_slices(shape, tile_shape):
+        tile = [axis[slc] for axis, slc in zip(axes, slices[::-1], strict=True)]
+        grid = np.stack(np.meshgrid(*tile[::-1], indexing="ij")[::-1])
+        yield slices, grid[0] if len(axes) == 1 else grid
+
+
+def _tile_slices(shape, tile_shape):
+    """
+    Return an iterator over the slices of the tiles of an array of ``shape``.
+
+    The tiles are in C order and have at most ``tile_shape``, an integer or a
+    tuple with one size per dimension.
+    """
+    if np.isscalar(tile_shape):
+        tile_shape = (tile_shape,) * len(shape)
+    tile_shape = tuple(tile_shape)
+    if len(tile_shape) != len(shape) or min(tile_shape) < 1:
+        msg = f"Invalid tile_shape {tile_shape} for an array of shape {shape}."
+        raise ValueError(msg)
+    return itertools.product(
+        *(
+            [slice(i, min(i + size, n)) for i in range(0, n, size)]
+            for n, size in zip(shape, tile_shape, strict=True)
+        )
+    )
+
+
+def _grid_slices(bounding_box, step=1, center=True, selector=None):
+    """
+    Return the slices which define the grid of `grid_from_bounding_box`.
+
+    The slices are in ``x, y [, z]`` order, with ``np.mgrid`` semantics.
+    See `grid_from_bounding_box` for the parameters.
+    """
 
     def _bbox_to_pixel(bbox):
         return (np.floor(bbox[0] + 0.5), np.ceil(bbox[1] - 0.5))
@@ -255,10 +359,175 @@ def grid_from_bounding_box(bounding_box, step=1, center=True, selector=None):
     slices = []
     for d, s in zip(bb, step, strict=False):
         slices.append(slice(d[0], d[1] + s, s))
-    grid = np.mgrid[slices[::-1]][::-1]
-    if ndim == 1:
-        return grid[0]
-    return grid
+    return slices
+
+
+def _grid_axes(slices):
+    """
+    Return the values along each axis of the grid defined by ``slices``.
+
+    The values are identical to those in the full ``np.mgrid`` of the slices.
+    """
+    return [np.ravel(axis) for axis in np.ogrid[tuple(slices[::-1])][::-1]]
+
+
+def pixel_to_pixel(
+    wcs_in,
+    wcs_out,
+    shape,
+    *,
+    max_error=0.01,
+    step=32,
+    tile_shape=None,
+    with_bounding_box=True,
+):
+    """
+    Compute the pixel coordinates in one WCS of all pixels of an array in another.
+
+    The result is the same as ``wcs_out.invert(*wcs_in(x, y))`` for all pixels
+    ``x, y`` of an array of ``shape``, to within ``max_error``, but the exact
+    mapping is only evaluated on a lattice of nodes ``step`` pixels apart.
+    The pixels in each cell of the lattice are filled by bilinear (multilinear
+    in general) interpolation of the nodes at its corners. The interpolation
+    is verified at the midpoints of the cells and of their edges: the pixels
+    of cells where it is off by more than ``max_error``, or where the mapping
+    is not defined, are computed exactly.
+
+    The world coordinates of ``wcs_in`` are passed to ``wcs_out`` as values,
+    so both must use the same world frame.
+
+    Parameters
+    ----------
+    wcs_in : `~gwcs.wcs.WCS`
+        The WCS of the array.
+    wcs_out : `~gwcs.wcs.WCS`
+        The WCS of the computed pixel coordinates.
+    shape : tuple
+        The shape of the array, in numpy order.
+    max_error : float, optional
+        The maximum error of the interpolated pixel coordinates, in pixels
+        of ``wcs_out``.
+    step : int, optional
+        The spacing of the nodes of the lattice, in pixels of the array.
+    tile_shape : tuple, optional
+        If given, the pixel coordinates are computed lazily in tiles of at
+        most this shape (in numpy order), see Returns.
+    with_bounding_box : bool, optional
+        If True (default) pixels outside the bounding box of ``wcs_in``, or
+        which map outside the bounding box of ``wcs_out``, are set to NaN.
+
+    Returns
+    -------
+    result : ndarray, tuple of ndarray or generator
+        The pixel coordinates in ``wcs_out``, in ``x, y[, z]`` order, each of
+        ``shape``. With ``tile_shape``, a generator of ``(slices, result)``
+        pairs, where ``slices`` is the position of the tile in the full
+        result, in numpy order.
+    """
+    shape = tuple(shape)
+    if len(shape) != wcs_in.pixel_n_dim:
+        msg = (
+            f"The shape {shape} does not match the {wcs_in.pixel_n_dim} pixel "
+            "axes of wcs_in."
+        )
+        raise ValueError(msg)
+    if step < 1 or int(step) != step:
+        msg = f"step must be a positive integer, got {step}."
+        raise ValueError(msg)
+
+    def _mapping(*pixel):
+        world = wcs_in(*pixel, with_bounding_box=with_bounding_box)
+        if not isinstance(world, tuple):
+            world = (world,)
+        result = wcs_out.invert(*world, with_bounding_box=with_bounding_box)
+        result = tuple(result) if isinstance(result, (list, tuple)) else (result,)
+        return np.array([getattr(r, "value", r) for r in result], dtype=float)
+
+    def _tile(slices):
+        result = _interpolate_mapping(_mapping, slices, int(step), max_error)
+        return result[0] if len(result) == 1 else tuple(result)
+
+    if tile_shape is None:
+        return _tile(tuple(slice(0, n) for n in shape))
+    return ((slices, _tile(slices)) for slices in _tile_slices(shape, tile_shape))
+
+
+def _interpolate_mapping(mapping, slices, step, max_error):
+    """
+    Evaluate ``mapping`` on the pixels of ``slices`` by verified interpolation.
+
+    ``mapping`` takes pixel coordinates in ``x, y[, z]`` order and returns an
+    array with the outputs along its first axis. ``slices`` (in numpy order)
+    must have unit steps. See `pixel_to_pixel`.
+    """
+    pixels = [np.arange(slc.start, slc.stop) for slc in slices]
+    if step == 1 or min(len(p) for p in pixels) < 3:
+        return mapping(*np.meshgrid(*pixels, indexing="ij")[::-1])
+
+    # the nodes of the lattice, interleaved with the midpoints of the cells
+    nodes = [np.unique(np.r_[p[:-1:step], p[-1]]) for p in pixels]
+    fine = []
+    for node in nodes:
+        axis = np.empty(2 * len(node) - 1, dtype=node.dtype)
+        axis[::2] = node
+        axis[1::2] = (node[:-1] + node[1:]) // 2
+        fine.append(axis)
+    exact = mapping(*np.meshgrid(*fine, indexing="ij")[::-1])
+    values = exact[(slice(None), *(slice(None, None, 2),) * len(nodes))]
+
+    # interpolate the midpoints, keeping the nodes as they are
+    approx = values
+    for ax, (node, axis) in enumerate(zip(nodes, fine, strict=True), start=1):
+        weight = _axis_shape((axis[1::2] - node[:-1]) / np.diff(node), ax, approx)
+        lower = np.take(approx, range(len(node) - 1), axis=ax)
+        upper = np.take(approx, range(1, len(node)), axis=ax)
+        refined = np.empty(
+            (*approx.shape[:ax], len(axis), *approx.shape[ax + 1 :]), dtype=float
+        )
+        refined[(slice(None),) * ax + (slice(None, None, 2),)] = approx
+        refined[(slice(None),) * ax + (slice(1, None, 2),)] = (
+            lower + (upper - lower) * weight
+        )
+        approx = refined
+
+    # the error of a cell is the largest error of the points on its boundary
+    # or at its center
+    with np.errstate(invalid="ignore"):
+        error = np.max(np.abs(approx - exact), axis=0)
+    error[np.isnan(error)] = np.inf
+    for ax in range(error.ndim):
+        error = np.maximum.reduce(
+            [
+                np.take(error, range(start, error.shape[ax] - 2 + start, 2), axis=ax)
+                for start in range(3)
+            ]
+        )
+    bad_cells = error > max_error
+
+    cells = [
+        np.clip(np.searchsorted(node, p, side="right") - 1, 0, len(node) - 2)
+        for node, p in zip(nodes, pixels, strict=True)
+    ]
+    result = values
+    for ax, (node, cell, p) in enumerate(zip(nodes, cells, pixels, strict=True), 1):
+        weight = _axis_shape((p - node[cell]) / np.diff(node)[cell], ax, result)
+        lower = np.take(result, cell, axis=ax)
+        result = lower + (np.take(result, cell + 1, axis=ax) - lower) * weight
+
+    bad = np.nonzero(bad_cells[np.ix_(*cells)])
+    if len(bad[0]):
+        index = [p[i] for p, i in zip(pixels, bad, strict=True)]
+        result[(slice(None), *bad)] = mapping(*index[::-1])
+    return result
+
+
+def _axis_shape(values, axis, array):
+    """
+    Reshape 1D ``values`` to broadcast along ``axis`` of ``array``.
+    """
+    shape = [1] * array.ndim
+    shape[axis] = len(values)
+    return values.reshape(shape)
 
 
 def wcs_from_points(
@@ -268,6 +537,10 @@ def wcs_from_points(
     projection=None,
     poly_degree=4,
     polynomial_type="polynomial",
+    *,
+    weights=None,
+    sigma_clip=None,
+    clip_iterations=5,
 ):
     """
     Given two matching sets of coordinates on detector and sky, compute the WCS.
@@ -282,6 +555,14 @@ def wcs_from_points(
     ``detector``. The output coordinate frame is initialized based on the frame
     in the fiducial.
 
+    The polynomials are fit by weighted linear least squares. When
+    ``sigma_clip`` is set, points whose residuals in the projection plane
+    exceed ``sigma_clip`` times the root mean square residual are rejected
+    iteratively, and the inverse polynomials are fit to the remaining points.
+    The domain of each polynomial is set to the range of its inputs, except
+    for a "polynomial" fit without ``weights`` and ``sigma_clip``, which keeps
+    the default domain so that its coefficients apply to the unscaled inputs.
+
 
     Parameters
     ----------
@@ -305,6 +586,13 @@ def wcs_from_points(
         Degree of polynomial model to be fit to data. Defaults to 4.
     polynomial_type : str
         one of "polynomial", "chebyshev", "legendre". Defaults to "polynomial".
+    weights : ndarray, optional
+        Weight of each point, e.g. the inverse variance of its position.
+    sigma_clip : float, optional
+        Rejection threshold of the iterative sigma clipping, in units of the
+        root mean square (weighted) residual. No clipping by default.
+    clip_iterations : int
+        Maximum number of sigma clipping iterations. Defaults to 5.
 
     Returns
     -------
@@ -321,7 +609,7 @@ def wcs_from_points(
         "legendre": models.Legendre2D,
     }
 
-    x, y = xy
+    x, y = (np.ravel(c).astype(float) for c in xy)
 
     if not isinstance(world_coords, coord.SkyCoord):
         msg = "`world_coords` must be an `~astropy.coordinates.SkyCoord`"
@@ -331,6 +619,7 @@ def wcs_from_points(
     except AttributeError:
         unit_sph = world_coords.unit_spherical
         lon, lat = unit_sph.lon.deg, unit_sph.lat.deg
+    lon, lat = np.ravel(lon), np.ravel(lat)
 
     if isinstance(proj_point, coord.SkyCoord):
         if proj_point.size != 1:
@@ -340,13 +629,13 @@ def wcs_from_points(
         crval = (proj_point.data.lon, proj_point.data.lat)
         frame = proj_point.frame
     elif proj_point == "center":  # use center of input points
-        sc1 = coord.SkyCoord(lon.min() * u.deg, lat.max() * u.deg)
-        sc2 = coord.SkyCoord(lon.max() * u.deg, lat.min() * u.deg)
-        pa = sc1.position_angle(sc2)
-        sep = sc1.separation(sc2)
-        midpoint_sc = sc1.directional_offset_by(pa, sep / 2)
-        crval = (midpoint_sc.data.lon, midpoint_sc.data.lat)
-        frame = sc1.frame
+        # midpoint of the great circle arc between the corners of the points
+        corners = _unit_vectors(
+            np.array([lon.min(), lon.max()]), np.array([lat.max(), lat.min()])
+        )
+        mid_lon, mid_lat = _vector_to_lonlat(corners.sum(axis=1))
+        crval = (mid_lon * u.deg, mid_lat * u.deg)
+        frame = coord.ICRS()
     else:
         msg = (
             "`proj_point` must be set to 'center', or an"
@@ -366,26 +655,53 @@ def wcs_from_points(
         )
         raise ValueError(msg)
 
+    # a plain power series fit keeps coefficients in the unscaled inputs,
+    # orthogonal polynomials degenerate without a domain matching the inputs
+    scale_domain = (
+        polynomial_type != "polynomial" or weights is not None or sigma_clip is not None
+    )
+    if weights is None:
+        weights = np.ones_like(x)
+    else:
+        weights = np.ravel(np.broadcast_to(weights, np.shape(xy[0]))).astype(float)
+
     skyrot = models.RotateCelestial2Native(
         crval[0].to_value(u.deg), crval[1].to_value(u.deg), 180
     )
     trans = skyrot | projection
     projection_x, projection_y = trans(lon, lat)
-    poly = supported_poly_types[polynomial_type](poly_degree)
-
-    fitter = fitting.LevMarLSQFitter()
-    with warnings.catch_warnings():
-        warnings.simplefilter("ignore")
-        poly_x = fitter(poly, x, y, projection_x)
-        poly_y = fitter(poly, x, y, projection_y)
-        distortion = models.Mapping((0, 1, 0, 1)) | poly_x & poly_y
-
-        poly_x_inverse = fitter(poly, projection_x, projection_y, x)
-        poly_y_inverse = fitter(poly, projection_x, projection_y, y)
-        distortion.inverse = (
-            models.Mapping((0, 1, 0, 1)) | poly_x_inverse & poly_y_inverse
+
+    def _polynomial(x, y):
+        degree = (
+            (poly_degree,) if polynomial_type == "polynomial" else (poly_degree,) * 2
+        )
+        if not scale_domain:
+            return supported_poly_types[polynomial_type](*degree)
+        return supported_poly_types[polynomial_type](
+            *degree, x_domain=_fit_domain(x), y_domain=_fit_domain(y)
         )
 
+    (poly_x, poly_y), used = _fit_polynomials(
+        _polynomial(x, y),
+        x,
+        y,
+        (projection_x, projection_y),
+        weights,
+        sigma_clip=sigma_clip,
+        clip_iterations=clip_iterations,
+    )
+    distortion = models.Mapping((0, 1, 0, 1)) | poly_x & poly_y
+
+    projection_x, projection_y = projection_x[used], projection_y[used]
+    (poly_x_inverse, poly_y_inverse), _ = _fit_polynomials(
+        _polynomial(projection_x, projection_y),
+        projection_x,
+        projection_y,
+        (x[used], y[used]),
+        weights[used],
+    )
+    distortion.inverse = models.Mapping((0, 1, 0, 1)) | poly_x_inverse & poly_y_inverse
+
     transform = distortion | projection.inverse | skyrot.inverse
 
     skyframe = CelestialFrame(reference_frame=frame)
@@ -393,3 +709,112 @@ def wcs_from_points(
     pipeline = [(detector, transform), (skyframe, None)]
 
     return WCS(pipeline)
+
+
+def _fit_domain(values):
+    """
+    Return a polynomial domain covering ``values``.
+    """
+    lower, upper = float(np.min(values)), float(np.max(values))
+    if lower == upper:
+        lower, upper = lower - 1, upper + 1
+    return lower, upper
+
+
+def _fit_polynomials(
+    model, x, y, values, weights, *, sigma_clip=None, clip_iterations=5
+):
+    """
+    Fit copies of a linear 2D model to several sets of values.
+
+    The model is fit by weighted linear least squares through its normal
+    equations, which are built once from the design matrix for all sets of
+    values. The columns of the design matrix are normalized, so that models
+    without a scaled domain remain well conditioned. Each sigma clipping
+    iteration removes the rejected points from the normal equations (a
+    downdate) instead of refitting all the points.
+
+    Parameters
+    ----------
+    model : `~astropy.modeling.polynomial.PolynomialBase`
+        A 2D polynomial model, linear in its parameters.
+    x, y : ndarray
+        The inputs of the model.
+    values : tuple of ndarray
+        The sets of values to fit.
+    weights : ndarray
+        The weight of each point.
+    sigma_clip : float, optional
+        Rejection threshold of the sigma clipping, in units of the root mean
+        square of the weighted residuals. The residuals of a point in all the
+        sets of values are combined. No clipping if None.
+    clip_iterations : int
+        Maximum number of sigma clipping iterations.
+
+    Returns
+    -------
+    fitted : list of `~astropy.modeling.Model`
+        A fitted copy of ``model`` for each set of values.
+    used : ndarray of bool
+        The points which were not rejected.
+    """
+    if model.x_domain is not None:
+        x = poly_map_domain(x, model.x_domain, model.x_window)
+    if model.y_domain is not None:
+        y = poly_map_domain(y, model.y_domain, model.y_window)
+    design = np.asarray(model.fit_deriv(x, y, *model.parameters))
+    column_norm = np.linalg.norm(design, axis=0)
+    column_norm[column_norm == 0] = 1
+    design = design / column_norm
+    values = np.column_stack(values)
+    weighted = design * weights[:, None]
+    normal = design.T @ weighted
+    rhs = weighted.T @ values
+
+    used = np.ones(len(x), dtype=bool)
+    for iteration in itertools.count():
+        if used.sum() < design.shape[1]:
+            msg = "Not enough points left to fit the polynomial."
+            raise ValueError(msg)
+        factor = linalg.cho_factor(normal)
+        coeffs = linalg.cho_solve(factor, rhs)
+        residuals = values - design @ coeffs
+        if sigma_clip is None or iteration == clip_iterations:
+            break
+        distance = np.sqrt(weights * (residuals**2).sum(axis=1))
+        rms = np.sqrt(np.mean(distance[used] ** 2))
+        rejected = used & (distance > sigma_clip * rms)
+        if not rejected.any():
+            break
+        used &= ~rejected
+        normal -= design[rejected].T @ weighted[rejected]
+        rhs -= weighted[rejected].T @ values[rejected]
+
+    # one step of iterative refinement to recover the accuracy lost in
+    # forming the normal equations
+    coeffs += linalg.cho_solve(factor, weighted[used].T @ residuals[used])
+
+    fitted = []
+    for column in (coeffs / column_norm[:, None]).T:
+        fit = model.copy()
+        fit.parameters = column
+        fitted.append(fit)
+    return fitted, used
+
+
+def _unit_vectors(lon, lat):
+    """
+    Return the unit vectors of spherical coordinates in degrees, as columns.
+    """
+    lon, lat = np.deg2rad(lon), np.deg2rad(lat)
+    return np.array([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def _vector_to_lonlat(vector):
+    """
+    Return the spherical coordinates in degrees of a vector.
+    """
+    x, y, z = vector
+    lon = np.rad2deg(np.arctan2(y, x)) % 360
+    lat = np.rad2deg(np.arctan2(z, np.hypot(x, y)))
+    return lon, lat